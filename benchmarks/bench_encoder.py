@@ -0,0 +1,71 @@
+"""
+Micro-benchmark of command frame encoding.
+
+Compares the original frame building (bytearray, copy to bytes and checksum
+of the whole frame) with :class:`pypdm.pdm.FrameEncoder`, without cache,
+with cache misses and with cache hits. Run with:
+
+    PYTHONPATH=. python benchmarks/bench_encoder.py
+"""
+
+import struct
+import timeit
+from pypdm.pdm import Command, FrameEncoder, Instruction, INSTRUCTION_IDS
+
+
+def legacy_encode(address: int, command: Command, data: bytes) -> bytearray:
+    length = 4 + len(data)
+    frame = bytearray([length, address, command.value]) + data
+    val = 0
+    for byte in bytes(frame):
+        val ^= byte
+    frame.append((val - 1) % 256)
+    return frame
+
+
+def main():
+    number = 100000
+    values = [struct.pack(">I", i) for i in range(number)]
+    encoder = FrameEncoder(cache_size=0)
+    missed = FrameEncoder()
+    cached = FrameEncoder()
+
+    def run_legacy():
+        for value in values:
+            legacy_encode(
+                1,
+                Command.WRITE_INSTRUCTION,
+                Instruction.DELAY.value.to_bytes(2, "big", signed=False) + value,
+            )
+
+    def run_uncached():
+        for value in values:
+            encoder.encode(
+                1, Command.WRITE_INSTRUCTION, INSTRUCTION_IDS[Instruction.DELAY] + value
+            )
+
+    def run_missed():
+        # Distinct values, as in a sweep: every lookup misses.
+        for value in values:
+            missed.encode(
+                1, Command.WRITE_INSTRUCTION, INSTRUCTION_IDS[Instruction.DELAY] + value
+            )
+
+    data = INSTRUCTION_IDS[Instruction.DELAY] + values[0]
+
+    def run_cached():
+        for _ in values:
+            cached.encode(1, Command.WRITE_INSTRUCTION, data)
+
+    for name, function in (
+        ("legacy", run_legacy),
+        ("encoder", run_uncached),
+        ("encoder, cache miss", run_missed),
+        ("encoder, cache hit", run_cached),
+    ):
+        duration = min(timeit.repeat(function, number=1, repeat=5))
+        print("{0:20} {1:8.3f} us/frame".format(name, duration / number * 1e6))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,352 @@
+"""
+Benchmark suite of the protocol stack, running offline against the in-memory
+devices of :mod:`loopback`. Measures frame encoding and parsing, link round
+trips, PDM property accesses, and round trips over a simulated 125 kbaud
+wire. Run with:
+
+    PYTHONPATH=. python benchmarks/bench_suite.py
+
+Results are printed as a table, and can be saved as JSON with ``--json``.
+With ``--compare``, results are compared to a previously saved JSON file and
+the exit status is 1 if any benchmark got slower than the ``--threshold``
+ratio, so that hot path regressions can be caught in CI.
+"""
+
+import argparse
+import json
+import platform
+import struct
+import sys
+import timeit
+from typing import Any, Callable, Dict, List, Optional
+from loopback import LoopbackSerial, loopback, response
+import pypdm
+from pypdm.pdm import (
+    Command,
+    FrameEncoder,
+    FrameParser,
+    INSTRUCTION_IDS,
+    Instruction,
+    Link,
+    PDM,
+    Status,
+)
+
+# Benchmark function: runs the benchmarked operation `number` times.
+Benchmark = Callable[[int], None]
+
+BENCHMARKS: List[Dict[str, Any]] = []
+
+
+def benchmark(name: str, number: int, wire: bool = False):
+    """
+    Register a benchmark. The decorated function is called once to build the
+    benchmark function, with the loopback installed.
+
+    :param name: Benchmark name, used in the results.
+    :param number: Number of operations per run.
+    :param wire: If True, the loopback simulates the wire timing.
+    """
+
+    def decorator(setup: Callable[[], Benchmark]):
+        BENCHMARKS.append(
+            {"name": name, "number": number, "wire": wire, "setup": setup}
+        )
+        return setup
+
+    return decorator
+
+
+DELAY_ID = INSTRUCTION_IDS[Instruction.DELAY]
+FREQUENCY_ID = INSTRUCTION_IDS[Instruction.FREQUENCY]
+
+
+@benchmark("encode.uncached", 100000)
+def encode_uncached() -> Benchmark:
+    encoder = FrameEncoder(cache_size=0)
+    data = [DELAY_ID + struct.pack(">I", i) for i in range(256)]
+
+    def run(number: int):
+        encode = encoder.encode
+        for i in range(number):
+            encode(1, Command.WRITE_INSTRUCTION, data[i & 0xFF])
+
+    return run
+
+
+@benchmark("encode.cached", 100000)
+def encode_cached() -> Benchmark:
+    encoder = FrameEncoder()
+    data = DELAY_ID + struct.pack(">I", 1000)
+
+    def run(number: int):
+        encode = encoder.encode
+        for _ in range(number):
+            encode(1, Command.WRITE_INSTRUCTION, data)
+
+    return run
+
+
+@benchmark("decode.frames", 100000)
+def decode_frames() -> Benchmark:
+    chunk = response(Status.OK, struct.pack(">f", 25.0)) * 100
+    parser = FrameParser(size=4096)
+
+    def run(number: int):
+        next_frame = parser.next_frame
+        for _ in range(number // 100):
+            parser.feed(chunk)
+            while next_frame() is not None:
+                pass
+
+    return run
+
+
+@benchmark("link.command", 20000)
+def link_command() -> Benchmark:
+    link = Link("loop://")
+
+    def run(number: int):
+        command = link.command
+        for _ in range(number):
+            command(1, Command.READ_INSTRUCTION, FREQUENCY_ID)
+
+    return run
+
+
+@benchmark("link.command_many.10", 20000)
+def link_command_many() -> Benchmark:
+    link = Link("loop://")
+    requests = [(1, Command.READ_INSTRUCTION, FREQUENCY_ID)] * 10
+
+    def run(number: int):
+        for _ in range(number // 10):
+            link.command_many(requests)
+
+    return run
+
+
+def open_pdm(**kwargs) -> PDM:
+    return PDM(1, Link("loop://"), **kwargs)
+
+
+@benchmark("pdm.get.frequency", 20000)
+def pdm_get() -> Benchmark:
+    pdm = open_pdm()
+
+    def run(number: int):
+        for _ in range(number):
+            pdm.frequency
+
+    return run
+
+
+@benchmark("pdm.get.frequency.cached", 100000)
+def pdm_get_cached() -> Benchmark:
+    pdm = open_pdm(cache=True)
+
+    def run(number: int):
+        for _ in range(number):
+            pdm.frequency
+
+    return run
+
+
+@benchmark("pdm.set.delay", 20000)
+def pdm_set() -> Benchmark:
+    pdm = open_pdm()
+
+    def run(number: int):
+        for i in range(number):
+            pdm.delay = i % 1000
+
+    return run
+
+
+@benchmark("pdm.set.current_percentage", 20000)
+def pdm_set_float() -> Benchmark:
+    pdm = open_pdm()
+
+    def run(number: int):
+        for i in range(number):
+            pdm.current_percentage = i % 100
+
+    return run
+
+
+@benchmark("pdm.registers.write.delay", 20000)
+def pdm_registers_write() -> Benchmark:
+    pdm = open_pdm()
+    registers = pdm.registers
+
+    def run(number: int):
+        write = registers.write
+        for i in range(number):
+            write(Instruction.DELAY, i % 1000)
+
+    return run
+
+
+@benchmark("pdm.registers.array.delay", 20000)
+def pdm_registers_array() -> Benchmark:
+    pdm = open_pdm()
+    delays = pdm.registers.array(Instruction.DELAY, range(1000))
+
+    def run(number: int):
+        write = delays.write
+        for i in range(number):
+            write(i % 1000)
+
+    return run
+
+
+@benchmark("pdm.apply", 20000)
+def pdm_apply() -> Benchmark:
+    pdm = open_pdm()
+
+    def run(number: int):
+        for _ in range(number):
+            pdm.apply()
+
+    return run
+
+
+@benchmark("pdm.configure.4", 5000)
+def pdm_configure() -> Benchmark:
+    pdm = open_pdm()
+
+    def run(number: int):
+        for i in range(number):
+            pdm.configure(
+                delay=i % 1000, pulse_width=5000, frequency=10000, activation=True
+            )
+
+    return run
+
+
+@benchmark("wire.command", 500, wire=True)
+def wire_command() -> Benchmark:
+    link = Link("loop://")
+
+    def run(number: int):
+        for _ in range(number):
+            link.command(1, Command.READ_INSTRUCTION, FREQUENCY_ID)
+
+    return run
+
+
+@benchmark("wire.configure.4", 200, wire=True)
+def wire_configure() -> Benchmark:
+    pdm = open_pdm()
+
+    def run(number: int):
+        for i in range(number):
+            pdm.configure(
+                delay=i % 1000, pulse_width=5000, frequency=10000, activation=True
+            )
+
+    return run
+
+
+def run_benchmarks(
+    repeat: int, scale: float, selected: Optional[List[str]] = None
+) -> List[Dict[str, Any]]:
+    """
+    Run the registered benchmarks.
+
+    :param repeat: Number of runs of each benchmark. The fastest is kept.
+    :param scale: Multiplier of the number of operations per run.
+    :param selected: Name prefixes of the benchmarks to run. All by default.
+    :return: Results.
+    """
+    results = []
+    for bench in BENCHMARKS:
+        name = bench["name"]
+        if selected and not any(name.startswith(s) for s in selected):
+            continue
+        number = max(1, int(bench["number"] * scale))
+        with loopback(wire=bench["wire"]):
+            run = bench["setup"]()
+        with loopback(wire=bench["wire"]):
+            best = min(timeit.repeat(lambda: run(number), number=1, repeat=repeat))
+        results.append(
+            {
+                "name": name,
+                "operations": number,
+                "seconds": best,
+                "us_per_op": best / number * 1e6,
+                "ops_per_s": number / best,
+            }
+        )
+    return results
+
+
+def compare(
+    results: List[Dict[str, Any]], baseline: Dict[str, Any], threshold: float
+) -> List[str]:
+    """
+    :param results: Current results.
+    :param baseline: Previously saved JSON document.
+    :param threshold: Maximum accepted slowdown ratio.
+    :return: Names of the regressed benchmarks.
+    """
+    reference = {r["name"]: r["us_per_op"] for r in baseline["results"]}
+    regressions = []
+    for result in results:
+        before = reference.get(result["name"])
+        if before is None:
+            continue
+        result["baseline_us_per_op"] = before
+        result["ratio"] = result["us_per_op"] / before
+        if result["ratio"] > threshold:
+            regressions.append(result["name"])
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--json", help="Save results to this JSON file.")
+    parser.add_argument("--compare", help="Baseline JSON file to compare with.")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=1.25,
+        help="Slowdown ratio reported as a regression (default: 1.25).",
+    )
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "--quick", action="store_true", help="Run 10 times less operations."
+    )
+    parser.add_argument("names", nargs="*", help="Benchmark name prefixes.")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.repeat, 0.1 if args.quick else 1.0, args.names)
+    regressions: List[str] = []
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+    for result in results:
+        line = "{name:30} {us_per_op:10.3f} us/op {ops_per_s:12.0f} op/s".format(
+            **result
+        )
+        if "ratio" in result:
+            line += " {0:6.2f}x".format(result["ratio"])
+            if result["name"] in regressions:
+                line += " REGRESSION"
+        print(line)
+    if args.json:
+        document = {
+            "pypdm": getattr(pypdm, "__version__", None),
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "machine": platform.machine(),
+            "baudrate": LoopbackSerial().baudrate,
+            "results": results,
+        }
+        with open(args.json, "w") as f:
+            json.dump(document, f, indent=2)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
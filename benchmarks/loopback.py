@@ -0,0 +1,145 @@
+"""
+In-memory stand-in for a serial port with PDM devices behind it, used by the
+benchmarks. Every command frame written is answered immediately with a valid
+response frame, so that the measured time is spent in pypdm only.
+
+With ``wire`` set, the loopback also models the serial wire: a response
+becomes readable only once the request and the response would have been
+transmitted at that rate (10 bits per byte, 8N1).
+"""
+
+from contextlib import contextmanager
+import struct
+import time
+from typing import Dict, Iterator, Optional
+from pypdm.pdm import Command, Instruction, INSTRUCTION_FORMATS, Status, checksum
+from pypdm.transport import BAUDRATE, TRANSPORTS, register_transport
+
+
+def response(status: Status, data: bytes = bytes()) -> bytes:
+    """
+    :return: Response frame bytes.
+    """
+    frame = bytes([3 + len(data), status.value]) + data
+    return frame + bytes([checksum(frame)])
+
+
+class LoopbackSerial:
+    """
+    Fake serial port answering like PDM devices with protocol version 3.7.
+    Instruction writes are stored, and returned by instruction reads.
+    """
+
+    def __init__(
+        self,
+        dev: str = "loop://",
+        baudrate: int = 125000,
+        timeout: Optional[float] = None,
+        write_timeout: Optional[float] = None,
+        wire: bool = False,
+    ):
+        """
+        :param dev: Transport name.
+        :param baudrate: Simulated baudrate, when `wire` is True.
+        :param timeout: Ignored.
+        :param write_timeout: Ignored.
+        :param wire: If True, simulate the transmission time of the frames.
+        """
+        self.port = dev
+        self.baudrate = baudrate
+        self.timeout = timeout
+        self.write_timeout = write_timeout
+        self.wire = wire
+        # Raw instruction values, by instruction identifier.
+        self.registers: Dict[bytes, bytes] = {
+            instruction.value.to_bytes(2, "big"): struct.pack(fmt, 0)
+            for instruction, fmt in INSTRUCTION_FORMATS.items()
+        }
+        self.registers[Instruction.TEMPERATURE.value.to_bytes(2, "big")] = struct.pack(
+            ">f", 25.0
+        )
+        self.__rx = bytearray()
+        # Time at which the pending response is completely received.
+        self.__ready = 0.0
+        # Responses of read commands, by request frame.
+        self.__responses: Dict[bytes, bytes] = {}
+
+    @property
+    def in_waiting(self) -> int:
+        if self.wire and time.perf_counter() < self.__ready:
+            return 0
+        return len(self.__rx)
+
+    def respond(self, frame: bytes) -> bytes:
+        """
+        :param frame: Request frame.
+        :return: Response frame.
+        """
+        cached = self.__responses.get(frame)
+        if cached is not None:
+            return cached
+        address, command, data = frame[1], frame[2], frame[3:-1]
+        if command == Command.WRITE_INSTRUCTION.value:
+            self.registers[data[:2]] = data[2:]
+            self.__responses.clear()
+            return response(Status.OK)
+        if command == Command.READ_PROTOCOL_VERSION.value:
+            result = response(Status.OK, bytes([3, 7]))
+        elif command == Command.READ_ADDRESS.value:
+            result = response(Status.OK, bytes([address]))
+        elif command == Command.READ_INSTRUCTION.value:
+            result = response(Status.OK, self.registers[data[:2]])
+        elif command == Command.READ_CW_PULSE.value:
+            result = response(Status.OK, bytes([0]))
+        else:
+            return response(Status.OK)
+        self.__responses[frame] = result
+        return result
+
+    def write(self, data: bytes) -> int:
+        data = bytes(data)
+        received = 0
+        offset = 0
+        while offset < len(data):
+            length = data[offset]
+            answer = self.respond(data[offset : offset + length])
+            self.__rx += answer
+            received += len(answer)
+            offset += length
+        if self.wire:
+            start = max(time.perf_counter(), self.__ready)
+            self.__ready = start + (len(data) + received) * 10 / self.baudrate
+        return len(data)
+
+    def read(self, n: int) -> bytes:
+        if self.wire:
+            delay = self.__ready - time.perf_counter()
+            while delay > 0:
+                # sleep() is too coarse for frame durations, spin instead.
+                delay = self.__ready - time.perf_counter()
+        data = bytes(self.__rx[:n])
+        del self.__rx[:n]
+        return data
+
+
+@contextmanager
+def loopback(**kwargs) -> Iterator[None]:
+    """
+    Context manager making :class:`pypdm.Link` open :class:`LoopbackSerial`
+    transports for ``loop://`` URLs, instead of the pyserial loopback.
+
+    :param kwargs: :class:`LoopbackSerial` constructor arguments.
+    """
+    original = TRANSPORTS.get("loop")
+
+    def factory(url, timeout, write_timeout):
+        return LoopbackSerial(url, BAUDRATE, timeout, write_timeout, **kwargs)
+
+    register_transport("loop", factory)
+    try:
+        yield
+    finally:
+        if original is None:
+            del TRANSPORTS["loop"]
+        else:
+            TRANSPORTS["loop"] = original
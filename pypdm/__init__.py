@@ -17,13 +17,28 @@
 # Copyright 2018 Olivier Hériveaux, Ledger SAS
 
 
-from .pdm import PDM, Link, ConnectionFailure, SyncSource, DelayLineType, \
-    CurrentSource, Mode, ControlMode, ChecksumError, ProtocolError, \
-    ProtocolVersionNotSupported, StatusError, InterlockStatus
+from .pdm import PDM, Link, ThreadedLink, ConnectionFailure, SyncSource, \
+    DelayLineType, CurrentSource, Mode, ControlMode, ChecksumError, \
+    ProtocolError, ProtocolVersionNotSupported, StatusError, InterlockStatus, \
+    ErrorFlags, ResponseTimeout, Batch, BatchItem, BatchError, \
+    ShadowRegisters, ElisionCounters, LinkMetrics, CommandStats, \
+    LatencyHistogram, RawRegisters, RegisterArray, emergency_off_all
+from .aio import AsyncLink, AsyncPDM
+from .group import PDMGroup
+from .fleet import PDMFleet, FleetError
+from .telemetry import TelemetrySampler
+from .watchdog import Watchdog, Watcher, WatchdogEvent
+from .sweep import Sweep
+from .identity import DeviceIdentity, IdentityRegistry
+from .state import PDMState
+from .recording import Recorder, RecordingReader, ReplaySerial, ReplayMismatch
+from .transport import Transport, TcpTransport, MemoryTransport, \
+    open_transport, register_transport
 
 __all__ = [
     "PDM",
     "Link",
+    "ThreadedLink",
     "ConnectionFailure",
     "SyncSource",
     "DelayLineType",
@@ -32,7 +47,42 @@ __all__ = [
     "ControlMode",
     "ChecksumError",
     "ProtocolError",
+    "ResponseTimeout",
     "ProtocolVersionNotSupported",
     "StatusError",
-    "InterlockStatus"
+    "InterlockStatus",
+    "ErrorFlags",
+    "Batch",
+    "BatchItem",
+    "BatchError",
+    "ShadowRegisters",
+    "ElisionCounters",
+    "LinkMetrics",
+    "CommandStats",
+    "LatencyHistogram",
+    "RawRegisters",
+    "RegisterArray",
+    "emergency_off_all",
+    "AsyncLink",
+    "AsyncPDM",
+    "PDMGroup",
+    "PDMFleet",
+    "FleetError",
+    "TelemetrySampler",
+    "Watchdog",
+    "Watcher",
+    "WatchdogEvent",
+    "Sweep",
+    "DeviceIdentity",
+    "IdentityRegistry",
+    "PDMState",
+    "Recorder",
+    "RecordingReader",
+    "ReplaySerial",
+    "ReplayMismatch",
+    "Transport",
+    "TcpTransport",
+    "MemoryTransport",
+    "open_transport",
+    "register_transport"
 ]
\ No newline at end of file
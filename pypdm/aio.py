@@ -0,0 +1,301 @@
+# This file is part of PyPDM
+#
+# PyPDM is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+#
+# Copyright 2018-2019 Olivier Hériveaux, Ledger SAS
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import functools
+from typing import Any, Callable, List, Sequence, Tuple, TypeVar, Union
+from .pdm import (
+    PDM,
+    Link,
+    Command,
+    ControlMode,
+    CurrentSource,
+    DelayLineType,
+    InterlockStatus,
+    Mode,
+    SyncSource,
+)
+
+T = TypeVar("T")
+
+
+class AsyncLink:
+    """
+    Asynchronous counterpart of :class:`pypdm.Link`, to be used with asyncio.
+
+    Serial ports are blocking, so each :class:`AsyncLink` owns a dedicated I/O
+    thread in which all its commands are executed, one after the other. This
+    serializes the requests on a link while letting commands on different
+    serial ports run concurrently on the same event loop. Frames are encoded
+    and checked by the wrapped :class:`pypdm.Link`.
+    """
+
+    def __init__(self, link: Union[str, Link]):
+        """
+        :param link: Serial device path or an existing :class:`pypdm.Link`
+            instance. When a :class:`pypdm.Link` is given, it must not be
+            used directly anymore.
+        """
+        self.link = Link(link) if isinstance(link, str) else link
+        self.__executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="pypdm-link"
+        )
+
+    async def run(self, function: Callable[..., T], *args, **kwargs) -> T:
+        """
+        Execute a blocking function in the I/O thread of the link, after all
+        previously submitted requests.
+
+        :param function: Function to be called.
+        :return: Function result.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.__executor, functools.partial(function, *args, **kwargs)
+        )
+
+    async def command(
+        self, address: int, command: Command, data: bytes = bytes()
+    ) -> bytes:
+        """
+        Transmit a command to a laser source, and retrieve the response to
+        that command. See :meth:`pypdm.Link.command`.
+
+        :param address: Device address.
+        :param command: An instance of Command enumeration.
+        :param data: Data bytes.
+        :return: Received data, without header and checksum.
+        """
+        return await self.run(self.link.command, address, command, data)
+
+    async def command_many(
+        self, requests: Sequence[Tuple[int, Command, bytes]]
+    ) -> List[Union[bytes, Exception]]:
+        """
+        Transmit several commands in a single burst. See
+        :meth:`pypdm.Link.command_many`.
+
+        :param requests: Sequence of (address, command, data) tuples.
+        :return: For each request, either the received data or the raised
+            exception.
+        """
+        return await self.run(self.link.command_many, requests)
+
+    def close(self):
+        """
+        Wait for pending requests, then stop the I/O thread of the link.
+        """
+        self.__executor.shutdown(wait=True)
+
+
+class AsyncPDM:
+    """
+    Asynchronous counterpart of :class:`pypdm.PDM`. Each property of
+    :class:`pypdm.PDM` is available through awaitable ``get_...`` and
+    ``set_...`` methods. Instances are created with :meth:`open`:
+
+    .. code-block:: python
+
+        link = AsyncLink('/dev/ttyUSB0')
+        pdm = await AsyncPDM.open(1, link)
+        await pdm.set_frequency(10000)
+        await pdm.apply()
+        print(await pdm.get_temperature())
+    """
+
+    def __init__(self, pdm: PDM, link: AsyncLink):
+        """
+        Prefer :meth:`open`, which does not block the event loop.
+
+        :param pdm: Wrapped :class:`pypdm.PDM` instance.
+        :param link: :class:`AsyncLink` wrapping the link of `pdm`.
+        """
+        if pdm.link is not link.link:
+            raise ValueError("PDM does not use the link.")
+        self.pdm = pdm
+        self.link = link
+
+    @classmethod
+    async def open(
+        cls, address: int, link: Union[str, AsyncLink, "AsyncPDM"], **kwargs
+    ) -> "AsyncPDM":
+        """
+        Connect to a PDM device.
+
+        :param address: PDM device address.
+        :param link: Serial device path, :class:`AsyncLink` or
+            :class:`AsyncPDM` instance for daisy-chained configurations.
+        :param kwargs: Other :class:`pypdm.PDM` constructor arguments.
+        """
+        if isinstance(link, str):
+            link = AsyncLink(link)
+        elif isinstance(link, AsyncPDM):
+            link = link.link
+        elif not isinstance(link, AsyncLink):
+            raise ValueError("Invalid link parameter.")
+        pdm = await link.run(PDM, address, link.link, **kwargs)
+        return cls(pdm, link)
+
+    async def __get(self, name: str) -> Any:
+        return await self.link.run(getattr, self.pdm, name)
+
+    async def __set(self, name: str, value: Any):
+        await self.link.run(setattr, self.pdm, name, value)
+
+    @property
+    def address(self) -> int:
+        """PDM device address."""
+        return self.pdm.address
+
+    @property
+    def version(self) -> str:
+        """PDM protocol version, queried when opening the device."""
+        return self.pdm.version
+
+    async def read_protocol_version(self) -> str:
+        """See :meth:`pypdm.PDM.read_protocol_version`."""
+        return await self.link.run(self.pdm.read_protocol_version)
+
+    async def read_address(self) -> int:
+        """See :meth:`pypdm.PDM.read_address`."""
+        return await self.link.run(self.pdm.read_address)
+
+    async def apply(self):
+        """See :meth:`pypdm.PDM.apply`."""
+        await self.link.run(self.pdm.apply)
+
+    async def configure(self, apply: bool = True, **settings):
+        """See :meth:`pypdm.PDM.configure`."""
+        await self.link.run(self.pdm.configure, apply, **settings)
+
+    async def get_sync_source(self) -> SyncSource:
+        """See :attr:`pypdm.PDM.sync_source`."""
+        return await self.__get("sync_source")
+
+    async def set_sync_source(self, value: SyncSource):
+        """See :attr:`pypdm.PDM.sync_source`."""
+        await self.__set("sync_source", value)
+
+    async def get_delay_line_type(self) -> DelayLineType:
+        """See :attr:`pypdm.PDM.delay_line_type`."""
+        return await self.__get("delay_line_type")
+
+    async def set_delay_line_type(self, value: DelayLineType):
+        """See :attr:`pypdm.PDM.delay_line_type`."""
+        await self.__set("delay_line_type", value)
+
+    async def get_frequency(self) -> int:
+        """See :attr:`pypdm.PDM.frequency`."""
+        return await self.__get("frequency")
+
+    async def set_frequency(self, value: int):
+        """See :attr:`pypdm.PDM.frequency`."""
+        await self.__set("frequency", value)
+
+    async def get_pulse_width(self) -> int:
+        """See :attr:`pypdm.PDM.pulse_width`."""
+        return await self.__get("pulse_width")
+
+    async def set_pulse_width(self, value: int):
+        """See :attr:`pypdm.PDM.pulse_width`."""
+        await self.__set("pulse_width", value)
+
+    async def get_delay(self) -> int:
+        """See :attr:`pypdm.PDM.delay`."""
+        return await self.__get("delay")
+
+    async def set_delay(self, value: int):
+        """See :attr:`pypdm.PDM.delay`."""
+        await self.__set("delay", value)
+
+    async def get_offset_current(self) -> float:
+        """See :attr:`pypdm.PDM.offset_current`."""
+        return await self.__get("offset_current")
+
+    async def set_offset_current(self, value: float):
+        """See :attr:`pypdm.PDM.offset_current`."""
+        await self.__set("offset_current", value)
+
+    async def get_current_percentage(self) -> float:
+        """See :attr:`pypdm.PDM.current_percentage`."""
+        return await self.__get("current_percentage")
+
+    async def set_current_percentage(self, value: float):
+        """See :attr:`pypdm.PDM.current_percentage`."""
+        await self.__set("current_percentage", value)
+
+    async def get_current(self) -> float:
+        """See :attr:`pypdm.PDM.current`."""
+        return await self.__get("current")
+
+    async def set_current(self, value: float):
+        """See :attr:`pypdm.PDM.current`."""
+        await self.__set("current", value)
+
+    async def get_temperature(self) -> float:
+        """See :attr:`pypdm.PDM.temperature`."""
+        return await self.__get("temperature")
+
+    async def get_maximum_current(self) -> float:
+        """See :attr:`pypdm.PDM.maximum_current`."""
+        return await self.__get("maximum_current")
+
+    async def get_maximum_mean_current(self) -> float:
+        """See :attr:`pypdm.PDM.maximum_mean_current`."""
+        return await self.__get("maximum_mean_current")
+
+    async def get_current_source(self) -> CurrentSource:
+        """See :attr:`pypdm.PDM.current_source`."""
+        return await self.__get("current_source")
+
+    async def set_current_source(self, value: CurrentSource):
+        """See :attr:`pypdm.PDM.current_source`."""
+        await self.__set("current_source", value)
+
+    async def get_interlock_status(self) -> InterlockStatus:
+        """See :attr:`pypdm.PDM.interlock_status`."""
+        return await self.__get("interlock_status")
+
+    async def get_activation(self) -> bool:
+        """See :attr:`pypdm.PDM.activation`."""
+        return await self.__get("activation")
+
+    async def set_activation(self, value: bool):
+        """See :attr:`pypdm.PDM.activation`."""
+        await self.__set("activation", value)
+
+    async def get_mode(self) -> Mode:
+        """See :attr:`pypdm.PDM.mode`."""
+        return await self.__get("mode")
+
+    async def get_software_control_mode(self) -> Mode:
+        """See :attr:`pypdm.PDM.software_control_mode`."""
+        return await self.__get("software_control_mode")
+
+    async def set_software_control_mode(self, value: Mode):
+        """See :attr:`pypdm.PDM.software_control_mode`."""
+        await self.__set("software_control_mode", value)
+
+    async def get_control_mode_selection(self) -> ControlMode:
+        """See :attr:`pypdm.PDM.control_mode_selection`."""
+        return await self.__get("control_mode_selection")
+
+    async def set_control_mode_selection(self, value: ControlMode):
+        """See :attr:`pypdm.PDM.control_mode_selection`."""
+        await self.__set("control_mode_selection", value)
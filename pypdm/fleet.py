@@ -0,0 +1,439 @@
+# This file is part of PyPDM
+#
+# PyPDM is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+#
+# Copyright 2018-2019 Olivier Hériveaux, Ledger SAS
+
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Tuple
+from .pdm import (
+    Batch,
+    BatchError,
+    BatchItem,
+    Command,
+    FIELDS,
+    INSTRUCTION_IDS,
+    Link,
+    PDM,
+    PROTOCOL_3_7_INSTRUCTIONS,
+    ProtocolError,
+    ProtocolVersionNotSupported,
+    decode_error_code,
+    decode_field,
+)
+from .group import PDMGroup
+
+# Device identifier in a fleet: serial port and device address.
+DeviceKey = Tuple[str, int]
+
+# Group of the current worker process, when the fleet uses processes.
+_process_group: Optional[PDMGroup] = None
+
+
+class FleetError(Exception):
+    """
+    Thrown when a fleet operation failed for one or more devices. The
+    operation has still been performed on all the other devices.
+    """
+
+    def __init__(
+        self, results: Dict[DeviceKey, Any], errors: Dict[DeviceKey, Exception]
+    ):
+        """
+        :param results: Results of the devices which succeeded. For
+            snapshots, also the fields which could be read from the devices
+            which failed.
+        :param errors: Raised exception for each device which failed. For
+            snapshots, a :class:`pypdm.BatchError` listing the fields which
+            could not be read.
+        """
+        super().__init__(results, errors)
+        self.results = results
+        self.errors = errors
+
+    def __str__(self):
+        return ", ".join(
+            "{0}@{1}: {2!r}".format(port, address, error)
+            for (port, address), error in self.errors.items()
+        )
+
+
+class _PartialResults(Exception):
+    """Raised by tasks which failed for some devices only."""
+
+    def __init__(self, results: Dict[int, Any], errors: Dict[int, Exception]):
+        super().__init__(results, errors)
+        self.results = results
+        self.errors = errors
+
+
+def _open_process_group(port: str, addresses: List[int], kwargs: Dict[str, Any]):
+    """Worker process initializer: connect to the devices of a port."""
+    global _process_group
+    _process_group = PDMGroup(port, addresses, **kwargs)
+
+
+def _run_in_process(task: Callable, *args):
+    """Run a task on the group of the worker process."""
+    assert _process_group is not None
+    return task(_process_group, *args)
+
+
+def _run(
+    addresses: List[int], task: Callable, group: Any, *args
+) -> Tuple[Dict[int, Any], Dict[int, Exception]]:
+    """
+    Run a task on a group and sort the results by address.
+
+    :param addresses: Addresses of the devices of the group.
+    :param task: Function called with the group and `args`.
+    :param group: Group of the devices.
+    :return: Results of the succeeding devices, and exceptions of the failing
+        devices.
+    """
+    try:
+        result = task(group, *args)
+    except _PartialResults as e:
+        return e.results, e.errors
+    except BatchError as e:
+        errors: Dict[int, Exception] = {}
+        for item in e.errors:
+            assert item.error is not None
+            errors.setdefault(item.address, item.error)
+        return {a: None for a in addresses if a not in errors}, errors
+    except Exception as e:
+        return {}, {a: e for a in addresses}
+    if isinstance(result, dict):
+        return result, {}
+    return {a: result for a in addresses}, {}
+
+
+def _discover(port: str, kwargs: Dict[str, Any]) -> Dict[int, str]:
+    link = Link(port)
+    try:
+        return link.discover(**kwargs)
+    finally:
+        link.close()
+
+
+def _close(group: PDMGroup):
+    group.link.close()
+
+
+def _configure(group: PDMGroup, apply: bool, settings: Dict[str, Any]):
+    group.configure(apply, **settings)
+
+
+def _apply(group: PDMGroup):
+    group.apply()
+
+
+def _decode_snapshot_field(pdm: PDM, name: str, value: bytes) -> Any:
+    if name == "error_code":
+        return decode_error_code(value)
+    result = decode_field(name, value)
+    if pdm.shadow is not None:
+        pdm.shadow.store(FIELDS[name][0], value)
+    return result
+
+
+def _snapshot(group: PDMGroup, names: List[str]) -> Dict[int, Dict[str, Any]]:
+    for name in names:
+        if name != "error_code" and name not in FIELDS:
+            raise ValueError(f"Property {name} cannot be read by group.")
+    # All the fields of all the devices are read in a single burst.
+    batch = Batch(group.link)
+    queued: List[Tuple[str, BatchItem]] = []
+    failed: Dict[int, List[BatchItem]] = {}
+    for pdm in group:
+        for name in names:
+            if name == "error_code":
+                item = batch.command(pdm.address, Command.READ_ERROR_CODE)
+            else:
+                instruction = FIELDS[name][0]
+                data = INSTRUCTION_IDS[instruction]
+                if instruction in PROTOCOL_3_7_INSTRUCTIONS and pdm.version != "3.7":
+                    item = BatchItem(
+                        pdm.address, Command.READ_INSTRUCTION, data, instruction
+                    )
+                    item.error = ProtocolVersionNotSupported(pdm.version)
+                    failed.setdefault(pdm.address, []).append(item)
+                    continue
+                item = batch.command(
+                    pdm.address, Command.READ_INSTRUCTION, data, instruction
+                )
+            queued.append((name, item))
+    try:
+        batch.flush()
+    except BatchError:
+        # Failed items are collected below, with the decoding errors.
+        pass
+    results: Dict[int, Dict[str, Any]] = {address: {} for address in group.addresses}
+    for name, item in queued:
+        if item.error is None:
+            assert item.result is not None
+            try:
+                results[item.address][name] = _decode_snapshot_field(
+                    group[item.address], name, item.result[1:]
+                )
+                continue
+            except ProtocolError as e:
+                item.error = e
+        failed.setdefault(item.address, []).append(item)
+    if failed:
+        for address in failed:
+            if not results[address]:
+                del results[address]
+        raise _PartialResults(
+            results, {address: BatchError(items) for address, items in failed.items()}
+        )
+    return results
+
+
+def _safe_off(group: PDMGroup):
+    for pdm in group:
+        # Do not trust caches when switching off, always transmit.
+        if pdm.shadow is not None:
+            pdm.shadow.invalidate()
+    group.configure(activation=False)
+
+
+class PDMFleet:
+    """
+    Many PDM devices on different serial ports. Each serial port is driven by
+    its own worker thread, or optionally its own process, so fleet-wide
+    operations run in parallel on all the ports and take as long as the
+    slowest port. On each port, operations are pipelined as with
+    :class:`pypdm.PDMGroup`.
+
+    .. code-block:: python
+
+        fleet = PDMFleet({'/dev/ttyUSB0': [1, 2], '/dev/ttyUSB1': [1]})
+        fleet.configure(current_percentage=50, activation=True)
+        print(fleet.snapshot(['temperature']))
+        fleet.safe_off()
+        fleet.close()
+
+    Results are dictionaries indexed by (port, address). When an operation
+    fails for some devices, a :class:`FleetError` holding the results of the
+    other devices is raised.
+    """
+
+    # Properties read by default by snapshot().
+    SNAPSHOT_FIELDS = [
+        "sync_source",
+        "frequency",
+        "pulse_width",
+        "delay",
+        "offset_current",
+        "current_percentage",
+        "current_source",
+        "activation",
+        "temperature",
+        "interlock_status",
+        "error_code",
+    ]
+
+    def __init__(
+        self, devices: Mapping[str, Iterable[int]], processes: bool = False, **kwargs
+    ):
+        """
+        Connect to all the devices, in parallel.
+
+        :param devices: Device addresses for each serial port path.
+        :param processes: If True, each serial port is driven from a
+            dedicated process instead of a thread. This prevents Python code
+            of one port from delaying the others, at the cost of inter-process
+            communication.
+        :param kwargs: :class:`pypdm.PDM` constructor arguments.
+        """
+        self.__addresses = {port: list(a) for port, a in devices.items()}
+        self.__processes = processes
+        self.__executors: Dict[str, Executor] = {}
+        self.__groups: Dict[str, PDMGroup] = {}
+        futures: Dict[str, Future] = {}
+        for port, addresses in self.__addresses.items():
+            executor: Executor
+            if processes:
+                executor = ProcessPoolExecutor(
+                    max_workers=1,
+                    initializer=_open_process_group,
+                    initargs=(port, addresses, kwargs),
+                )
+                # Force worker start, which opens the port.
+                futures[port] = executor.submit(int)
+            else:
+                executor = ThreadPoolExecutor(
+                    max_workers=1, thread_name_prefix="pypdm-fleet"
+                )
+                futures[port] = executor.submit(PDMGroup, port, addresses, **kwargs)
+            self.__executors[port] = executor
+        errors: Dict[DeviceKey, Exception] = {}
+        for port, future in futures.items():
+            try:
+                group = future.result()
+            except Exception as e:
+                errors.update({(port, a): e for a in self.__addresses[port]})
+            else:
+                if not processes:
+                    self.__groups[port] = group
+        if errors:
+            self.close()
+            raise FleetError({}, errors)
+
+    @staticmethod
+    def discover(ports: Iterable[str], **kwargs) -> Dict[DeviceKey, str]:
+        """
+        List the devices answering on several serial ports, probing all the
+        ports in parallel. See :meth:`pypdm.Link.discover`.
+
+        .. code-block:: python
+
+            found = PDMFleet.discover(['/dev/ttyUSB0', '/dev/ttyUSB1'])
+            devices = {}
+            for port, address in found:
+                devices.setdefault(port, []).append(address)
+            fleet = PDMFleet(devices)
+
+        :param ports: Serial port paths.
+        :param kwargs: :meth:`pypdm.Link.discover` arguments.
+        :return: Protocol version string of the found devices, by (port,
+            address).
+        :raise FleetError: If some ports could not be probed. The errors are
+            indexed by (port, 0), and the results hold the devices found on
+            the other ports.
+        """
+        ports = list(ports)
+        results: Dict[DeviceKey, str] = {}
+        errors: Dict[DeviceKey, Exception] = {}
+        if not ports:
+            return results
+        with ThreadPoolExecutor(
+            max_workers=len(ports), thread_name_prefix="pypdm-discover"
+        ) as executor:
+            futures = {port: executor.submit(_discover, port, kwargs) for port in ports}
+            for port, future in futures.items():
+                try:
+                    found = future.result()
+                except Exception as e:
+                    errors[(port, 0)] = e
+                else:
+                    results.update({(port, a): v for a, v in found.items()})
+        if errors:
+            raise FleetError(results, errors)
+        return results
+
+    @property
+    def devices(self) -> List[DeviceKey]:
+        """(port, address) of all the devices of the fleet."""
+        return [(p, a) for p, addresses in self.__addresses.items() for a in addresses]
+
+    def __execute(self, task: Callable, *args) -> Dict[DeviceKey, Any]:
+        """
+        Run a task on the group of each port, in parallel, and gather the
+        results.
+
+        :param task: Function called with the group and `args`.
+        :return: Results by device.
+        """
+        futures = {}
+        for port, executor in self.__executors.items():
+            addresses = self.__addresses[port]
+            if self.__processes:
+                futures[port] = executor.submit(
+                    _run, addresses, _run_in_process, task, *args
+                )
+            else:
+                futures[port] = executor.submit(
+                    _run, addresses, task, self.__groups[port], *args
+                )
+        results: Dict[DeviceKey, Any] = {}
+        errors: Dict[DeviceKey, Exception] = {}
+        for port, future in futures.items():
+            try:
+                port_results, port_errors = future.result()
+            except Exception as e:
+                # Worker failure, for instance a crashed process.
+                port_results = {}
+                port_errors = {a: e for a in self.__addresses[port]}
+            results.update({(port, a): r for a, r in port_results.items()})
+            errors.update({(port, a): e for a, e in port_errors.items()})
+        if errors:
+            raise FleetError(results, errors)
+        return results
+
+    def configure(self, apply: bool = True, **settings):
+        """
+        Change the same settings on all the devices. See
+        :meth:`pypdm.PDMGroup.configure`.
+
+        :param apply: If True, all devices apply the settings.
+        :param settings: Property names and their new values.
+        """
+        self.__execute(_configure, apply, settings)
+
+    def apply(self):
+        """Apply the volatile settings of all the devices."""
+        self.__execute(_apply)
+
+    def snapshot(
+        self, names: Optional[Iterable[str]] = None
+    ) -> Dict[DeviceKey, Dict[str, Any]]:
+        """
+        Read properties from all the devices, in a single burst per port.
+
+        :param names: Property names. By default, :attr:`SNAPSHOT_FIELDS`.
+        :return: Property values by name, for each device.
+        :raise FleetError: If some properties could not be read. The results
+            hold all the properties which could be read.
+        """
+        names = list(self.SNAPSHOT_FIELDS if names is None else names)
+        return self.__execute(_snapshot, names)
+
+    def safe_off(self):
+        """Switch off the lasers of all the devices, and apply."""
+        self.__execute(_safe_off)
+
+    def close(self):
+        """
+        Wait for pending operations, close the links opened by the fleet and
+        stop all the workers. Lasers are not switched off, see
+        :meth:`safe_off`.
+        """
+        futures = []
+        for port, executor in self.__executors.items():
+            try:
+                if self.__processes:
+                    futures.append(executor.submit(_run_in_process, _close))
+                elif port in self.__groups:
+                    futures.append(executor.submit(_close, self.__groups[port]))
+            except Exception:
+                # Broken worker process, its port is closed with it.
+                pass
+        for future in futures:
+            try:
+                future.result()
+            except Exception:
+                pass
+        for executor in self.__executors.values():
+            executor.shutdown(wait=True)
+        self.__executors.clear()
+        self.__groups.clear()
+
+    def __enter__(self) -> "PDMFleet":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,182 @@
+# This file is part of PyPDM
+#
+# PyPDM is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+#
+# Copyright 2018-2019 Olivier Hériveaux, Ledger SAS
+
+import functools
+from typing import Any, Dict, Iterable, Iterator, List, Union
+from .pdm import (
+    PDM,
+    Batch,
+    BatchError,
+    BatchItem,
+    Command,
+    ErrorFlags,
+    FIELDS,
+    INSTRUCTION_IDS,
+    Link,
+    PROTOCOL_3_7_INSTRUCTIONS,
+    ProtocolVersionNotSupported,
+    decode_field,
+)
+
+
+class PDMGroup:
+    """
+    Several daisy-chained PDM devices sharing the same :class:`pypdm.Link`,
+    driven together. Each group operation is transmitted as a single burst of
+    frames, and results are returned per device address.
+
+    .. code-block:: python
+
+        group = PDMGroup('/dev/ttyUSB0', [1, 2, 3])
+        group.configure(delay=1000, activation=True)
+        print(group.read('temperature'))  # {1: 24.5, 2: 25.0, 3: 24.8}
+
+    When a command fails for one or more devices, the other commands of the
+    burst are still transmitted and a :class:`pypdm.BatchError` listing the
+    failures is raised.
+    """
+
+    def __init__(
+        self, link: Union[str, Link, PDM], devices: Iterable[Union[int, PDM]], **kwargs
+    ):
+        """
+        :param link: Serial device path, :class:`pypdm.Link` or
+            :class:`pypdm.PDM` instance.
+        :param devices: Device addresses, or :class:`pypdm.PDM` instances
+            using `link`.
+        :param kwargs: :class:`pypdm.PDM` constructor arguments used for the
+            devices given by address.
+        """
+        if isinstance(link, str):
+            link = Link(link)
+        elif isinstance(link, PDM):
+            link = link.link
+        elif not isinstance(link, Link):
+            raise ValueError("Invalid link parameter.")
+        self.link = link
+        self.pdms: Dict[int, PDM] = {}
+        for device in devices:
+            if isinstance(device, PDM):
+                if device.link is not link:
+                    raise ValueError("PDM does not use the group link.")
+                pdm = device
+            else:
+                pdm = PDM(device, link, **kwargs)
+            if pdm.address in self.pdms:
+                raise ValueError(f"Duplicate address {pdm.address}")
+            self.pdms[pdm.address] = pdm
+
+    def __getitem__(self, address: int) -> PDM:
+        return self.pdms[address]
+
+    def __iter__(self) -> Iterator[PDM]:
+        return iter(self.pdms.values())
+
+    def __len__(self) -> int:
+        return len(self.pdms)
+
+    @property
+    def addresses(self) -> List[int]:
+        """Addresses of the devices of the group."""
+        return list(self.pdms)
+
+    def configure(self, apply: bool = True, **settings):
+        """
+        Change the same settings on all the devices, in a single burst. See
+        :meth:`pypdm.PDM.configure`.
+
+        :param apply: If True, all devices apply the settings at the end of
+            the burst.
+        :param settings: Property names and their new values.
+        """
+        with Batch(self.link) as batch:
+            for pdm in self:
+                pdm.configure(apply, batch, **settings)
+
+    def set(self, name: str, value: Any):
+        """
+        Change one setting on all the devices, in a single burst. Changes must
+        be applied with :meth:`apply`.
+
+        :param name: Property name.
+        :param value: New value.
+        """
+        self.configure(False, **{name: value})
+
+    def apply(self):
+        """Apply the volatile settings of all the devices, in a single burst."""
+        with Batch(self.link) as batch:
+            for pdm in self:
+                with pdm.batch(batch):
+                    pdm.apply()
+
+    def read(self, name: str) -> Dict[int, Any]:
+        """
+        Read one property from all the devices, in a single burst.
+
+        :param name: Property name. Must be one of the properties directly
+            mapped to an instruction, listed in :data:`pypdm.pdm.FIELDS`, or
+            ``error_code``.
+        :return: Property value of each device, by address.
+        """
+        if name == "error_code":
+            return self.read_errors()
+        if name not in FIELDS:
+            raise ValueError(f"Property {name} cannot be read by group.")
+        instruction = FIELDS[name][0]
+        data = INSTRUCTION_IDS[instruction]
+        batch = Batch(self.link)
+        errors: List[BatchItem] = []
+        for pdm in self:
+            if instruction in PROTOCOL_3_7_INSTRUCTIONS and pdm.version != "3.7":
+                item = BatchItem(
+                    pdm.address, Command.READ_INSTRUCTION, data, instruction
+                )
+                item.error = ProtocolVersionNotSupported(pdm.version)
+                errors.append(item)
+            else:
+                batch.command(pdm.address, Command.READ_INSTRUCTION, data, instruction)
+        items = batch.items
+        try:
+            batch.flush()
+        except BatchError as e:
+            errors += e.errors
+        if errors:
+            raise BatchError(errors)
+        results = {}
+        for item in items:
+            assert item.result is not None
+            value = item.result[1:]
+            results[item.address] = decode_field(name, value)
+            shadow = self.pdms[item.address].shadow
+            if shadow is not None:
+                shadow.store(instruction, value)
+        return results
+
+    def read_errors(self) -> Dict[int, ErrorFlags]:
+        """
+        Read the error flags of all the devices, in a single burst.
+
+        :return: :class:`pypdm.ErrorFlags` of each device, by address.
+        """
+        results: Dict[int, ErrorFlags] = {}
+        with Batch(self.link) as batch:
+            for pdm in self:
+                with pdm.batch(batch):
+                    pdm.read_errors(functools.partial(results.__setitem__, pdm.address))
+        return results
@@ -0,0 +1,241 @@
+# This file is part of PyPDM
+#
+# PyPDM is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+#
+# Copyright 2018-2019 Olivier Hériveaux, Ledger SAS
+
+import json
+import os
+import tempfile
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+
+class DeviceIdentity:
+    """
+    Constant characteristics of a PDM device, remembered by an
+    :class:`IdentityRegistry`.
+    """
+
+    __slots__ = ("version", "maximum_current", "maximum_mean_current", "validated")
+
+    def __init__(
+        self,
+        version: Optional[str] = None,
+        maximum_current: Optional[float] = None,
+        maximum_mean_current: Optional[float] = None,
+        validated: float = 0.0,
+    ):
+        """
+        :param version: Protocol version string, for instance '3.7'.
+        :param maximum_current: Maximum pulse current, in mA.
+        :param maximum_mean_current: Maximum mean current, in mA.
+        :param validated: Time of the last verification with the device, as
+            returned by :func:`time.time`.
+        """
+        self.version = version
+        self.maximum_current = maximum_current
+        self.maximum_mean_current = maximum_mean_current
+        self.validated = validated
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __eq__(self, other):
+        if not isinstance(other, DeviceIdentity):
+            return NotImplemented
+        return self.to_dict() == other.to_dict()
+
+    def __repr__(self):
+        return "DeviceIdentity({0})".format(
+            ", ".join("{0}={1!r}".format(k, v) for k, v in self.to_dict().items())
+        )
+
+
+class IdentityRegistry:
+    """
+    Remembers the identity of PDM devices (protocol version and maximum
+    currents) by serial port and address, so that the handshake queries are
+    not repeated each time a :class:`pypdm.PDM` is created. The registry is
+    given to :class:`pypdm.Link` and shared by all the devices of the link,
+    and can be shared by several links.
+
+    When a file path is given, the registry is loaded from it and saved to it
+    when an identity changes or is validated again after expiring, so it
+    survives process restarts. Concurrent processes may use the same file: saving merges the entries of the file, keeping the
+    most recently validated ones.
+
+    Remembered identities are trusted for :attr:`max_age` seconds. Devices on
+    a :class:`pypdm.ThreadedLink` are also verified in the background each
+    time a :class:`pypdm.PDM` is created from the registry. A wrong maximum
+    current would make :attr:`pypdm.PDM.current` inaccurate, so the registry
+    must be cleared when devices are swapped.
+    """
+
+    # Version of the file format.
+    FORMAT = 1
+
+    def __init__(self, path: Optional[str] = None, max_age: Optional[float] = 3600.0):
+        """
+        :param path: Cache file path. If None, the registry is kept in memory
+            only.
+        :param max_age: Duration in seconds after which a remembered identity
+            is verified again with the device before being used. None to
+            trust remembered identities forever.
+        """
+        self.path = path
+        self.max_age = max_age
+        self.__lock = threading.Lock()
+        self.__entries: Dict[Tuple[str, int], DeviceIdentity] = {}
+        if path is not None:
+            self.__entries = self.__read()
+
+    def __read(self) -> Dict[Tuple[str, int], DeviceIdentity]:
+        """
+        :return: Entries of the cache file. Empty if the file does not exist
+            or is not valid.
+        """
+        assert self.path is not None
+        try:
+            with open(self.path) as f:
+                document = json.load(f)
+            if document.get("format") != self.FORMAT:
+                return {}
+            return {
+                (d["port"], d["address"]): DeviceIdentity(
+                    d["version"],
+                    d["maximum_current"],
+                    d["maximum_mean_current"],
+                    d["validated"],
+                )
+                for d in document["devices"]
+            }
+        except (OSError, ValueError, KeyError, TypeError):
+            # A corrupted cache only costs a handshake.
+            return {}
+
+    def __write(self):
+        """Replace the cache file content with the current entries."""
+        assert self.path is not None
+        devices = [
+            dict(port=port, address=address, **identity.to_dict())
+            for (port, address), identity in sorted(self.__entries.items())
+        ]
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, temp = tempfile.mkstemp(dir=directory, prefix=".pypdm-")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump({"format": self.FORMAT, "devices": devices}, f)
+            os.replace(temp, self.path)
+        except BaseException:
+            os.unlink(temp)
+            raise
+
+    def save(self):
+        """
+        Write the registry to the cache file, if any. The file is replaced
+        atomically.
+        """
+        if self.path is None:
+            return
+        with self.__lock:
+            merged = self.__read()
+            for key, identity in self.__entries.items():
+                other = merged.get(key)
+                if other is None or other.validated <= identity.validated:
+                    merged[key] = identity
+            self.__entries = merged
+            self.__write()
+
+    def get(
+        self, port: str, address: int, expired: bool = False
+    ) -> Optional[DeviceIdentity]:
+        """
+        :param port: Serial port path.
+        :param address: Device address.
+        :param expired: If True, also return the identity when too old.
+        :return: Remembered identity, or None if unknown or too old.
+        """
+        with self.__lock:
+            identity = self.__entries.get((port, address))
+        if identity is None or expired:
+            return identity
+        if self.__expired(identity, time.time()):
+            return None
+        return identity
+
+    def __expired(self, identity: DeviceIdentity, now: float) -> bool:
+        return self.max_age is not None and now - identity.validated > self.max_age
+
+    def update(self, port: str, address: int, **values: Any):
+        """
+        Remember characteristics of a device, read right now. The identity
+        is stamped as validated only when its `version` is given, which
+        means the device at this address was checked.
+
+        :param port: Serial port path.
+        :param address: Device address.
+        :param values: :class:`DeviceIdentity` attributes. Attributes which
+            are not given keep their previous value, unless `version` changed,
+            which means the device has been replaced.
+        """
+        for name in values:
+            if name not in DeviceIdentity.__slots__ or name == "validated":
+                raise ValueError(f"Unknown identity attribute {name}")
+        now = time.time()
+        with self.__lock:
+            previous = self.__entries.get((port, address))
+            if previous is None or (
+                "version" in values and values["version"] != previous.version
+            ):
+                identity = DeviceIdentity()
+            else:
+                identity = DeviceIdentity(**previous.to_dict())
+            for name, value in values.items():
+                setattr(identity, name, value)
+            validated = "version" in values
+            if validated:
+                identity.validated = now
+            self.__entries[(port, address)] = identity
+            # Verifications which confirm an identity still valid are not
+            # worth a file rewrite.
+            changed = (
+                previous is None
+                or (validated and self.__expired(previous, now))
+                or any(getattr(previous, n) != v for n, v in values.items())
+            )
+        if changed:
+            self.save()
+
+    def forget(self, port: Optional[str] = None, address: Optional[int] = None):
+        """
+        Forget remembered identities.
+
+        :param port: Serial port path. If None, all ports.
+        :param address: Device address. If None, all the devices of the port.
+        """
+        with self.__lock:
+            for key in list(self.__entries):
+                if (port is None or key[0] == port) and (
+                    address is None or key[1] == address
+                ):
+                    del self.__entries[key]
+            if self.path is not None:
+                # Not merged, removed entries must not come back from the file.
+                self.__write()
+
+    def __len__(self) -> int:
+        return len(self.__entries)
@@ -19,11 +19,36 @@
 # Thanks for ALPhANOV for providing documentation to write this library.
 
 
-from enum import Enum
+from array import array
+import atexit
+import bisect
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from contextlib import contextmanager
+from enum import Enum, IntFlag
 import struct
+import threading
+import time
+import weakref
 import serial
-from serial.serialutil import SerialException
-from typing import Union, Optional
+from .identity import IdentityRegistry
+from .transport import open_transport
+from typing import (
+    Any,
+    Callable,
+    Deque,
+    Dict,
+    FrozenSet,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Union,
+)
 
 
 class ChecksumError(Exception):
@@ -42,6 +67,12 @@ class ConnectionFailure(Exception):
     pass
 
 
+class ResponseTimeout(ProtocolError):
+    """Thrown when a device did not respond before the command deadline."""
+
+    pass
+
+
 class ProtocolVersionNotSupported(Exception):
     """
     Thrown when a PDM protocol version is not (yet) supported by the library.
@@ -51,7 +82,7 @@ class ProtocolVersionNotSupported(Exception):
         """
         :param version: Version string.
         """
-        super().__init__()
+        super().__init__(version)
         self.version = version
 
     def __str__(self):
@@ -68,13 +99,32 @@ class StatusError(Exception):
         """
         :param status: Status code. int.
         """
-        super().__init__()
+        super().__init__(status)
         self.status = status
 
     def __str__(self):
         return str(Status(self.status))
 
 
+class BatchError(Exception):
+    """
+    Thrown when one or more commands of a :class:`Batch` failed. All the
+    commands of the batch have been transmitted; the failed ones are listed in
+    the :attr:`errors` attribute, in transmission order.
+    """
+
+    def __init__(self, errors: List["BatchItem"]):
+        """
+        :param errors: Failed :class:`BatchItem` instances. Each one holds the
+            raised exception in its ``error`` attribute.
+        """
+        super().__init__(errors)
+        self.errors = errors
+
+    def __str__(self):
+        return ", ".join(str(item) for item in self.errors)
+
+
 class Status(Enum):
     """Possible response status from the laser source."""
 
@@ -128,6 +178,59 @@ class Instruction(Enum):
     CONTROL_MODE_SELECTION = 32
 
 
+# Encoded identifier of each instruction, as sent in command data.
+INSTRUCTION_IDS = {
+    instruction: instruction.value.to_bytes(2, "big", signed=False)
+    for instruction in Instruction
+}
+
+# Instructions by identifier value.
+INSTRUCTIONS_BY_ID = {instruction.value: instruction for instruction in Instruction}
+
+# Wire format of each instruction value, as a struct format string.
+INSTRUCTION_FORMATS = {
+    Instruction.SYNC_SOURCE: ">B",
+    Instruction.DELAY_LINE_TYPE: ">B",
+    Instruction.FREQUENCY: ">I",
+    Instruction.PULSE_WIDTH: ">I",
+    Instruction.DELAY: ">I",
+    Instruction.OFFSET_CURRENT: ">f",
+    Instruction.CURRENT: ">f",
+    Instruction.TEMPERATURE: ">f",
+    Instruction.MAXIMUM_MEAN_CURRENT: ">f",
+    Instruction.MAXIMUM_PULSE_CURRENT: ">f",
+    Instruction.CURRENT_SOURCE: ">B",
+    Instruction.INTERLOCK_STATUS: ">B",
+    Instruction.LASER_ACTIVATION: ">B",
+    Instruction.SOFTWARE_CONTROL_MODE: ">B",
+    Instruction.CONTROL_MODE_SELECTION: ">B",
+}
+
+# Valid range of the values read from the devices, for the instructions
+# which have one: minimum, and maximum or None. Values out of range are
+# protocol errors.
+INSTRUCTION_RANGES = {
+    Instruction.OFFSET_CURRENT: (0, None),
+    Instruction.CURRENT: (0, 100),
+    Instruction.MAXIMUM_MEAN_CURRENT: (0, None),
+    Instruction.MAXIMUM_PULSE_CURRENT: (0, None),
+    Instruction.LASER_ACTIVATION: (0, 1),
+}
+
+# Compiled wire format of each instruction value.
+INSTRUCTION_STRUCTS = {
+    instruction: struct.Struct(fmt) for instruction, fmt in INSTRUCTION_FORMATS.items()
+}
+
+# Instructions only available since protocol version 3.7.
+PROTOCOL_3_7_INSTRUCTIONS = frozenset(
+    {Instruction.SOFTWARE_CONTROL_MODE, Instruction.CONTROL_MODE_SELECTION}
+)
+
+# Commands whose data starts with an instruction identifier.
+INSTRUCTION_COMMANDS = frozenset({Command.READ_INSTRUCTION, Command.WRITE_INSTRUCTION})
+
+
 class SyncSource(Enum):
     """Possible PDM synchronization source."""
 
@@ -166,6 +269,578 @@ class ControlMode(Enum):
     )
 
 
+class ErrorFlags(IntFlag):
+    """
+    Error code returned by the READ_ERROR_CODE command, as a set of flags.
+    The meaning of each bit depends on the device firmware and is not part of
+    the protocol, so flags are named after their bit position. Zero means no
+    error.
+    """
+
+    BIT0 = 1 << 0
+    BIT1 = 1 << 1
+    BIT2 = 1 << 2
+    BIT3 = 1 << 3
+    BIT4 = 1 << 4
+    BIT5 = 1 << 5
+    BIT6 = 1 << 6
+    BIT7 = 1 << 7
+    BIT8 = 1 << 8
+    BIT9 = 1 << 9
+    BIT10 = 1 << 10
+    BIT11 = 1 << 11
+    BIT12 = 1 << 12
+    BIT13 = 1 << 13
+    BIT14 = 1 << 14
+    BIT15 = 1 << 15
+
+    @property
+    def bits(self) -> List["ErrorFlags"]:
+        """Individual flags which are set, from the least significant."""
+        return [flag for flag in ErrorFlags if flag & self]
+
+
+# PDM properties which directly map to an instruction, with the instruction
+# and the type of the property value.
+FIELDS = {
+    "sync_source": (Instruction.SYNC_SOURCE, SyncSource),
+    "delay_line_type": (Instruction.DELAY_LINE_TYPE, DelayLineType),
+    "frequency": (Instruction.FREQUENCY, int),
+    "pulse_width": (Instruction.PULSE_WIDTH, int),
+    "delay": (Instruction.DELAY, int),
+    "offset_current": (Instruction.OFFSET_CURRENT, float),
+    "current_percentage": (Instruction.CURRENT, float),
+    "temperature": (Instruction.TEMPERATURE, float),
+    "maximum_current": (Instruction.MAXIMUM_PULSE_CURRENT, float),
+    "maximum_mean_current": (Instruction.MAXIMUM_MEAN_CURRENT, float),
+    "current_source": (Instruction.CURRENT_SOURCE, CurrentSource),
+    "interlock_status": (Instruction.INTERLOCK_STATUS, InterlockStatus),
+    "activation": (Instruction.LASER_ACTIVATION, bool),
+    "software_control_mode": (Instruction.SOFTWARE_CONTROL_MODE, Mode),
+    "control_mode_selection": (Instruction.CONTROL_MODE_SELECTION, ControlMode),
+}
+
+
+# Enumeration of the values of the instructions holding one.
+REGISTER_ENUMS = {
+    instruction: kind
+    for instruction, kind in FIELDS.values()
+    if isinstance(kind, type) and issubclass(kind, Enum)
+}
+
+
+def decode_field(name: str, value: bytes):
+    """
+    Decode the value of a PDM property from instruction data bytes, with the
+    same verifications as the :class:`PDM` properties.
+
+    :param name: Property name, in :data:`FIELDS`.
+    :param value: Instruction value data bytes.
+    :return: Decoded value.
+    """
+    instruction, kind = FIELDS[name]
+    fmt = INSTRUCTION_STRUCTS[instruction]
+    if len(value) != fmt.size:
+        raise ProtocolError()
+    val = fmt.unpack(value)[0]
+    limits = INSTRUCTION_RANGES.get(instruction)
+    if limits is not None:
+        low, high = limits
+        if val < low or (high is not None and val > high):
+            raise ProtocolError()
+    return kind(val)
+
+
+def decode_error_code(data: bytes) -> ErrorFlags:
+    """
+    Decode the response of the READ_ERROR_CODE command.
+
+    :param data: Response data bytes, without the status byte.
+    :return: Error flags.
+    """
+    if len(data) == 0:
+        raise ProtocolError()
+    return ErrorFlags(int.from_bytes(data, "big"))
+
+
+def checksum(data: bytes, initial: int = 0) -> int:
+    """
+    Calculate the checksum of some data.
+
+    :param data: Input data bytes.
+    :param initial: XOR of preceding bytes, when the checksum of the beginning
+        of the frame has already been computed.
+    :return: Checksum byte value.
+    """
+    val = initial
+    for byte in data:
+        val ^= byte
+    return (val - 1) % 256
+
+
+class FrameEncoder:
+    """
+    Builds command frames. Frame headers and their contribution to the
+    checksum are computed once per (length, address, command), so that only
+    the data bytes are summed for each frame. Encoded frames are also kept in
+    a cache, so that repeated commands, for instance writing the same
+    instruction value again, cost a single dictionary lookup. The cache is
+    emptied when full.
+    """
+
+    def __init__(self, cache_size: int = 1024):
+        """
+        :param cache_size: Maximum number of frames kept in cache. 0 disables
+            the cache.
+        """
+        self.cache_size = cache_size
+        # Keys hold command codes rather than Command members, which are
+        # slower to hash.
+        self.__headers: Dict[Tuple[int, int, int], Tuple[bytes, int]] = {}
+        self.__frames: Dict[Tuple[int, int, bytes], bytes] = {}
+
+    def __len__(self) -> int:
+        """:return: Number of frames in cache."""
+        return len(self.__frames)
+
+    def header(self, length: int, address: int, command: Command) -> Tuple[bytes, int]:
+        """
+        :param length: Frame length.
+        :param address: Device address.
+        :param command: An instance of Command enumeration.
+        :return: Header bytes, and XOR of the header bytes.
+        """
+        code = command._value_
+        key = (length, address, code)
+        header = self.__headers.get(key)
+        if header is None:
+            data = bytes([length, address, code])
+            header = self.__headers[key] = (data, length ^ address ^ code)
+        return header
+
+    def encode(self, address: int, command: Command, data: bytes = bytes()) -> bytes:
+        """
+        Build a command frame, with length and checksum bytes.
+
+        :param address: Device address.
+        :param command: An instance of Command enumeration.
+        :param data: Data bytes.
+        :return: Frame bytes.
+        """
+        if type(data) is not bytes:
+            data = bytes(data)
+        code = command._value_
+        key = (address, code, data)
+        frames = self.__frames
+        frame = frames.get(key)
+        if frame is not None:
+            return frame
+        length = 4 + len(data)
+        header = self.__headers.get((length, address, code))
+        if header is None:
+            if length > 0xFF:
+                raise ValueError("data too long.")
+            header = self.header(length, address, command)
+        prefix, val = header
+        # Inlined checksum(): for the few data bytes of a command, this loop
+        # is faster than functools.reduce or integer folding.
+        for byte in data:
+            val ^= byte
+        frame = prefix + data + ((val - 1) & 0xFF).to_bytes(1, "big")
+        if len(frames) >= self.cache_size:
+            if not self.cache_size:
+                return frame
+            frames.clear()
+        frames[key] = frame
+        return frame
+
+
+class FrameParser:
+    """
+    Incremental parser of response frames. Received bytes are stored in a
+    preallocated buffer, and complete frames are returned as memoryviews of
+    this buffer, without copy. Several responses may be buffered at once, for
+    instance when many requests are pipelined.
+
+    Returned views are only valid until the next call to :meth:`fill` or
+    :meth:`feed`, which may overwrite the buffer.
+    """
+
+    # Shortest valid response: length, status and checksum bytes.
+    MIN_LENGTH = 3
+
+    def __init__(self, size: int = 1024):
+        """
+        :param size: Buffer size. Must be able to hold the longest frame.
+        """
+        if size < 0xFF:
+            raise ValueError("Buffer too small.")
+        self.__buffer = bytearray(size)
+        self.__view = memoryview(self.__buffer)
+        # Buffered bytes are between start and end indexes.
+        self.__start = 0
+        self.__end = 0
+
+    @property
+    def pending(self) -> int:
+        """Number of received bytes not parsed yet."""
+        return self.__end - self.__start
+
+    def needed(self) -> int:
+        """
+        :return: Minimum number of bytes to be received to complete the next
+            frame.
+        """
+        pending = self.__end - self.__start
+        if pending == 0:
+            return self.MIN_LENGTH
+        length = max(self.__buffer[self.__start], self.MIN_LENGTH)
+        return max(length - pending, 0)
+
+    def __reserve(self, count: int) -> int:
+        """
+        Make room at the end of the buffer.
+
+        :param count: Number of requested bytes.
+        :return: Number of bytes which can be stored.
+        """
+        if self.__end + count > len(self.__buffer) and self.__start > 0:
+            # Move pending bytes to the beginning of the buffer.
+            pending = self.__end - self.__start
+            self.__buffer[:pending] = self.__view[self.__start : self.__end]
+            self.__start = 0
+            self.__end = pending
+        return min(count, len(self.__buffer) - self.__end)
+
+    def fill(self, stream) -> int:
+        """
+        Receive bytes from a stream. At least the bytes required to complete
+        the next frame are requested, plus the bytes already waiting in the
+        stream if it tells so with an ``in_waiting`` attribute. ``readinto``
+        is used when the stream supports it.
+
+        :param stream: Serial port or any object with a ``read`` method.
+        :return: Number of received bytes. 0 if the stream timed out.
+        """
+        count = self.__reserve(max(self.needed(), getattr(stream, "in_waiting", 0)))
+        readinto = getattr(stream, "readinto", None)
+        if readinto is not None:
+            received = readinto(self.__view[self.__end : self.__end + count]) or 0
+        else:
+            data = stream.read(count)
+            received = len(data)
+            self.__buffer[self.__end : self.__end + received] = data
+        self.__end += received
+        return received
+
+    def feed(self, data: bytes):
+        """
+        Append received bytes.
+
+        :param data: Received bytes.
+        """
+        if self.__reserve(len(data)) < len(data):
+            raise ValueError("Buffer overflow.")
+        self.__buffer[self.__end : self.__end + len(data)] = data
+        self.__end += len(data)
+
+    def next_frame(self) -> Optional[memoryview]:
+        """
+        Extract the next complete frame. Invalid frames are consumed and an
+        exception is raised.
+
+        :return: Complete frame, including length and checksum bytes, or None
+            if more bytes are needed.
+        """
+        start = self.__start
+        pending = self.__end - start
+        if pending == 0:
+            return None
+        length = self.__buffer[start]
+        if length < self.MIN_LENGTH:
+            self.__start += 1
+            raise ProtocolError()
+        if pending < length:
+            return None
+        frame = self.__view[start : start + length]
+        self.__start += length
+        if self.__start == self.__end:
+            self.__start = self.__end = 0
+        if checksum(frame[:-1]) != frame[-1]:
+            raise ChecksumError()
+        return frame
+
+    def frames(self) -> Iterator[memoryview]:
+        """
+        :return: Iterator over the complete frames currently buffered.
+        """
+        while True:
+            frame = self.next_frame()
+            if frame is None:
+                return
+            yield frame
+
+    def reset(self):
+        """Discard all the buffered bytes."""
+        self.__start = self.__end = 0
+
+
+class LatencyHistogram:
+    """
+    Histogram of durations with fixed, logarithmically spaced buckets. Bucket
+    ``i`` counts durations up to ``BOUNDS[i]`` nanoseconds, and the last
+    bucket counts the longer ones. Durations are recorded as integer
+    nanoseconds, see :func:`time.perf_counter_ns`, and are stored with the
+    counters in a preallocated array.
+    """
+
+    # Upper bounds of the buckets, from 1 µs to about 16.8 s, in nanoseconds.
+    BOUNDS = tuple(1000 * 2**i for i in range(25))
+
+    __slots__ = ("buckets", "stats")
+
+    def __init__(self):
+        self.buckets = array("Q", bytes(8 * (len(self.BOUNDS) + 1)))
+        # Count, total, minimum and maximum of the durations.
+        self.stats = array("Q", bytes(8 * 4))
+        self.reset()
+
+    def record(self, duration: int):
+        """
+        Add a duration.
+
+        :param duration: Duration in nanoseconds.
+        """
+        stats = self.stats
+        self.buckets[bisect.bisect_left(self.BOUNDS, duration)] += 1
+        stats[0] += 1
+        stats[1] += duration
+        if duration < stats[2]:
+            stats[2] = duration
+        if duration > stats[3]:
+            stats[3] = duration
+
+    @property
+    def count(self) -> int:
+        """Number of recorded durations."""
+        return self.stats[0]
+
+    @property
+    def total(self) -> float:
+        """Sum of the recorded durations, in seconds."""
+        return self.stats[1] * 1e-9
+
+    @property
+    def min(self) -> float:
+        """Shortest recorded duration in seconds, or 0 if nothing was recorded."""
+        return self.stats[2] * 1e-9 if self.count else 0.0
+
+    @property
+    def max(self) -> float:
+        """Longest recorded duration, in seconds."""
+        return self.stats[3] * 1e-9
+
+    @property
+    def mean(self) -> float:
+        """Mean duration in seconds, or 0 if nothing was recorded."""
+        count = self.count
+        return self.stats[1] * 1e-9 / count if count else 0.0
+
+    def percentile(self, q: float) -> float:
+        """
+        :param q: Percentile, between 0 and 100.
+        :return: Upper bound of the bucket holding the q-th percentile, in
+            seconds. The maximum recorded duration if it is in the last
+            bucket, and 0 if nothing was recorded.
+        """
+        count = self.count
+        if count == 0:
+            return 0.0
+        rank = q / 100 * count
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if n and seen >= rank:
+                if i < len(self.BOUNDS):
+                    return min(self.BOUNDS[i], self.stats[3]) * 1e-9
+                break
+        return self.max
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        :return: Statistics as a dictionary of plain values, suitable for JSON
+            serialization. Durations are in seconds.
+        """
+        return {
+            "count": self.count,
+            "total": self.total,
+            "min": self.min,
+            "max": self.max,
+            "mean": self.mean,
+            "p50": self.percentile(50),
+            "p90": self.percentile(90),
+            "p99": self.percentile(99),
+            "buckets": self.buckets.tolist(),
+        }
+
+    def reset(self):
+        """Forget all the recorded durations."""
+        for i in range(len(self.buckets)):
+            self.buckets[i] = 0
+        self.stats[0] = 0
+        self.stats[1] = 0
+        self.stats[2] = 2**64 - 1
+        self.stats[3] = 0
+
+
+class CommandStats:
+    """
+    Latency histograms of a command. See :class:`LinkMetrics`.
+
+    :ivar encode: Time to build the frame.
+    :ivar write: Time to write the frame to the serial port.
+    :ivar first_byte: Time between the end of the write and the reception of
+        the first response byte.
+    :ivar total: Round-trip time, from the start of the encoding to the
+        complete reception of the response.
+    """
+
+    __slots__ = ("encode", "write", "first_byte", "total")
+
+    def __init__(self):
+        self.encode = LatencyHistogram()
+        self.write = LatencyHistogram()
+        self.first_byte = LatencyHistogram()
+        self.total = LatencyHistogram()
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """:return: Snapshot of each histogram, by name."""
+        return {name: getattr(self, name).snapshot() for name in self.__slots__}
+
+    def reset(self):
+        """Reset all the histograms."""
+        for name in self.__slots__:
+            getattr(self, name).reset()
+
+
+class LinkMetrics:
+    """
+    Timing statistics and error counters of a :class:`Link`, enabled with the
+    `metrics` constructor argument or by assigning :attr:`Link.metrics`.
+
+    Latencies of successful calls to :meth:`Link.command` are recorded per
+    command, and per instruction for instruction reads and writes. Errors are
+    counted for all the received responses, including the ones of
+    :meth:`Link.transfer`.
+
+    .. code-block:: python
+
+        link = Link('/dev/ttyUSB0', metrics=True)
+        ...
+        print(link.metrics.snapshot())
+        link.metrics.reset()
+    """
+
+    def __init__(self):
+        # Statistics by command and instruction. Created on first use.
+        self.commands: Dict[Tuple[Command, Optional[Instruction]], CommandStats] = {}
+        self.checksum_errors = 0
+        self.protocol_errors = 0
+        self.timeouts = 0
+        # StatusError count by device status code.
+        self.status_errors: Dict[int, int] = {}
+        # Number of error code readings with each flag set, by flag.
+        self.device_errors: Dict[ErrorFlags, int] = {}
+
+    def stats(self, command: Command, data: bytes = bytes()) -> CommandStats:
+        """
+        :param command: Transmitted command.
+        :param data: Transmitted data, used to identify the instruction.
+        :return: Statistics of the command, created if needed.
+        """
+        instruction = None
+        if command in INSTRUCTION_COMMANDS and len(data) >= 2:
+            instruction = INSTRUCTIONS_BY_ID.get((data[0] << 8) | data[1])
+        key = (command, instruction)
+        stats = self.commands.get(key)
+        if stats is None:
+            stats = self.commands[key] = CommandStats()
+        return stats
+
+    def error(self, error: Exception):
+        """
+        Count a communication error.
+
+        :param error: Raised exception.
+        """
+        if isinstance(error, StatusError):
+            self.status_errors[error.status] = (
+                self.status_errors.get(error.status, 0) + 1
+            )
+        elif isinstance(error, ChecksumError):
+            self.checksum_errors += 1
+        elif isinstance(error, ResponseTimeout):
+            self.timeouts += 1
+        elif isinstance(error, ProtocolError):
+            self.protocol_errors += 1
+
+    def error_code(self, flags: ErrorFlags):
+        """
+        Count the flags of an error code read from a device.
+
+        :param flags: Decoded error code.
+        """
+        for flag in flags.bits:
+            self.device_errors[flag] = self.device_errors.get(flag, 0) + 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        :return: All the statistics as a dictionary of plain values, suitable
+            for JSON serialization. Commands are named after the
+            :class:`Command` member, followed by the :class:`Instruction`
+            member for instruction reads and writes, for instance
+            ``READ_INSTRUCTION:TEMPERATURE``. Status errors are indexed by
+            :class:`Status` name when known, and device errors by
+            :class:`ErrorFlags` name.
+        """
+        commands = {}
+        for (command, instruction), stats in self.commands.items():
+            name = command.name
+            if instruction is not None:
+                name += ":" + instruction.name
+            commands[name] = stats.snapshot()
+        status_names = {s.value: s.name for s in Status}
+        return {
+            "commands": commands,
+            "errors": {
+                "checksum": self.checksum_errors,
+                "protocol": self.protocol_errors,
+                "timeout": self.timeouts,
+                "status": {
+                    status_names.get(code, str(code)): count
+                    for code, count in self.status_errors.items()
+                },
+                "device": {
+                    flag.name: count for flag, count in self.device_errors.items()
+                },
+            },
+        }
+
+    def reset(self):
+        """Reset all the statistics and counters."""
+        for stats in self.commands.values():
+            stats.reset()
+        self.checksum_errors = 0
+        self.protocol_errors = 0
+        self.timeouts = 0
+        self.status_errors.clear()
+        self.device_errors.clear()
+
+
+# Open links, switched off by emergency_off_all().
+_LINKS: "weakref.WeakSet[Link]" = weakref.WeakSet()
+
+
 class Link:
     """
     Base PDM communication implementation. An instance of :class:`Link` uses a
@@ -173,64 +848,176 @@ class Link:
     devices are daisy-chained.
     """
 
-    def __init__(self, dev: str):
+    # Commands which do not change the device state, and can be retried.
+    IDEMPOTENT_COMMANDS = frozenset(
+        {
+            Command.READ_ADDRESS,
+            Command.READ_PROTOCOL_VERSION,
+            Command.READ_ERROR_CODE,
+            Command.READ_INSTRUCTION,
+            Command.READ_MEASURE,
+            Command.READ_CW_PULSE,
+        }
+    )
+
+    # Device status codes worth a retry: the request was corrupted on the way.
+    RETRYABLE_STATUS = frozenset({Status.TIMEOUT.value, Status.CHECKSUM_ERROR.value})
+
+    def __init__(
+        self,
+        dev: Union[str, Any],
+        timeout: Optional[float] = 1.0,
+        retries: int = 0,
+        backoff: float = 0.01,
+        metrics: bool = False,
+        identities: Union[None, str, IdentityRegistry] = None,
+    ):
         """
         Open serial device.
 
         :param dev: Serial device path. For instance '/dev/ttyUSB0' on linux,
-            'COM0' on Windows, "/dev/tty.usbserial-FTA1BWEV" on macOS.
+            'COM0' on Windows, "/dev/tty.usbserial-FTA1BWEV" on macOS. May
+            also be a transport URL, such as 'tcp://bridge:4001' or
+            'sim://1,2', see :func:`pypdm.transport.open_transport`, or an
+            already open transport: a serial port object, a
+            :class:`pypdm.transport.Transport`, or any object with the same
+            ``read`` and ``write`` methods and ``timeout`` and
+            ``write_timeout`` attributes.
+        :param timeout: Maximum time in seconds to wait for each response. A
+            :class:`ResponseTimeout` is raised when expired. None to wait
+            forever.
+        :param retries: Number of times a failed read command is transmitted
+            again. Commands changing the device state are never retried.
+        :param backoff: Delay in seconds before the first retry. Doubled at
+            each following retry.
+        :param metrics: If True, record latencies and errors in
+            :attr:`metrics`.
+        :param identities: Registry remembering the identity of the devices,
+            shared by all the :class:`PDM` instances of the link, or the path
+            of its cache file. See :class:`IdentityRegistry`.
         """
-        try:
-            self.serial = serial.Serial(dev, 125000)
-        except SerialException as e:
-            raise ConnectionFailure() from e
+        if isinstance(dev, str):
+            try:
+                self.serial = open_transport(dev, timeout, timeout)
+            except OSError as e:
+                raise ConnectionFailure() from e
+            self.port: str = getattr(self.serial, "port", None) or dev
+        else:
+            self.serial = dev
+            self.serial.timeout = timeout
+            self.serial.write_timeout = timeout
+            self.port = getattr(dev, "port", None) or repr(dev)
+        if isinstance(identities, str):
+            identities = IdentityRegistry(identities)
+        self.identities: Optional[IdentityRegistry] = identities
+        self.__timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.encoder = FrameEncoder()
+        self.parser = FrameParser()
+        # Timing statistics and error counters, None when disabled.
+        self.metrics: Optional[LinkMetrics] = LinkMetrics() if metrics else None
+        # Addresses of the devices opened on this link, switched off by
+        # emergency_off().
+        self.addresses: Set[int] = set()
+        self.__closed = False
+        _LINKS.add(self)
+
+    @property
+    def timeout(self) -> Optional[float]:
+        """Maximum time in seconds to wait for each response."""
+        return self.__timeout
 
-    def __checksum(self, data: bytes) -> int:
+    @timeout.setter
+    def timeout(self, value: Optional[float]):
+        self.serial.timeout = value
+        self.serial.write_timeout = value
+        self.__timeout = value
+
+    def resync(self):
         """
-        Calculate the checksum of some data.
-        :param data: Input data bytes.
-        :return: Checksum byte value.
+        Discard all received bytes which have not been parsed yet, so that the
+        next received byte is expected to start a new frame. Called
+        automatically after a communication error.
         """
-        val = 0
-        for byte in data:
-            val ^= byte
-        return (val - 1) % 256
+        self.parser.reset()
+        reset_input_buffer = getattr(self.serial, "reset_input_buffer", None)
+        if reset_input_buffer is not None:
+            reset_input_buffer()
 
-    def __receive(self):
+    def __receive(self, deadline: Optional[float] = None):
         """
         Receive a response. Verify the status and checksum.
+        :param deadline: time.monotonic() value after which the response is
+            considered lost. By default, the link timeout from now.
         :return: Received data, without header and checksum.
         """
-        # Get length byte.
-        data = self.serial.read(1)
-        # Length byte must be at least 3 for responses (length byte, status
-        # byte and checksum byte).
-        if data[0] < 3:
-            raise ProtocolError()
-        # Fetch all the bytes of the command
-        data += self.serial.read(data[0] - 1)
-        # Verify the checksum
-        if self.__checksum(data[:-1]) != data[-1]:
-            raise ChecksumError()
+        frame = self.parser.next_frame()
+        if frame is None:
+            if deadline is not None:
+                frame = self.__wait_frame(deadline, True)
+            elif self.__timeout is not None:
+                deadline = time.monotonic() + self.__timeout
+                frame = self.__wait_frame(deadline, False)
+            else:
+                frame = self.__wait_frame(None, False)
         # Verify the status
-        if data[1] != Status.OK.value:
-            raise StatusError(data[1])
-        return data[1:-1]
+        if frame[1] != Status.OK.value:
+            raise StatusError(frame[1])
+        return bytes(frame[1:-1])
+
+    def __wait_frame(self, deadline: Optional[float], shorten: bool) -> memoryview:
+        """
+        Receive bytes until a frame is complete. The serial port timeout is
+        shortened to the time remaining before the deadline, so that a
+        response received in several reads cannot take longer.
+
+        :param deadline: time.monotonic() value, or None to wait forever.
+        :param shorten: If True, the serial port timeout is also shortened
+            for the first read. Otherwise, the deadline is assumed to be one
+            link timeout away.
+        :return: Complete frame.
+        """
+        shortened = False
+        try:
+            while True:
+                if shorten and deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise ResponseTimeout()
+                    self.serial.timeout = remaining
+                    shortened = True
+                if self.parser.fill(self.serial) == 0:
+                    # Serial port read timeout expired.
+                    raise ResponseTimeout()
+                frame = self.parser.next_frame()
+                if frame is not None:
+                    return frame
+                shorten = True
+        finally:
+            if shortened:
+                self.serial.timeout = self.__timeout
+
+    def encode(self, address: int, command: Command, data: bytes = bytes()) -> bytes:
+        """
+        Build a command frame. This method automatically add the length and
+        checksum bytes. See :class:`FrameEncoder`.
+
+        :param address: Device address.
+        :param command: An instance of Command enumeration.
+        :param data: Data bytes.
+        :return: Frame bytes.
+        """
+        return self.encoder.encode(address, command, data)
 
     def __send(self, address: int, command: Command, data: bytes):
         """
-        Transmit a command to the laser source. This method automatically add
-        the length and checksum bytes.
+        Transmit a command to the laser source.
         :param address: Device address.
         :param command: An instance of Command enumeration.
         :param data: Data bytes.
         """
-        length = 4 + len(data)
-        if length > 0xFF:
-            raise ValueError("data too long.")
-        frame = bytearray([length, address, command.value]) + data
-        frame.append(self.__checksum(bytes(frame)))
-        self.serial.write(frame)
+        self.serial.write(self.encode(address, command, data))
 
     def command(self, address: int, command: Command, data: bytes = bytes()):
         """
@@ -240,16 +1027,1146 @@ class Link:
         :param address: Device address.
         :param command: An instance of Command enumeration.
         :param data: Data bytes.
-        :param address: Device address override.
         :return: Received data, without header and checksum.
         """
-        self.__send(address, command, data)
-        return self.__receive()
+        attempts = 1
+        if command in self.IDEMPOTENT_COMMANDS:
+            attempts += self.retries
+        for attempt in range(attempts):
+            try:
+                if self.metrics is not None:
+                    return self.__measured_command(address, command, data)
+                self.__send(address, command, data)
+                return self.__receive()
+            except StatusError as e:
+                if self.metrics is not None:
+                    self.metrics.error(e)
+                if attempt + 1 == attempts or e.status not in self.RETRYABLE_STATUS:
+                    raise
+            except (ChecksumError, ProtocolError) as e:
+                if self.metrics is not None:
+                    self.metrics.error(e)
+                # The stream may be misaligned.
+                self.resync()
+                if attempt + 1 == attempts:
+                    raise
+            time.sleep(self.backoff * (2**attempt))
+
+    def __measured_command(self, address: int, command: Command, data: bytes):
+        """
+        Same as sending a command and receiving its response, but records the
+        latencies in :attr:`metrics`.
+
+        :return: Received data, without header and checksum.
+        """
+        t0 = time.perf_counter_ns()
+        frame = self.encode(address, command, data)
+        t1 = time.perf_counter_ns()
+        self.serial.write(frame)
+        t2 = time.perf_counter_ns()
+        deadline = None
+        if self.__timeout is not None:
+            deadline = time.monotonic() + self.__timeout
+        if self.parser.pending == 0 and self.parser.fill(self.serial) == 0:
+            raise ResponseTimeout()
+        t3 = time.perf_counter_ns()
+        result = self.__receive(deadline)
+        t4 = time.perf_counter_ns()
+        assert self.metrics is not None
+        stats = self.metrics.stats(command, data)
+        stats.encode.record(t1 - t0)
+        stats.write.record(t2 - t1)
+        stats.first_byte.record(t3 - t2)
+        stats.total.record(t4 - t0)
+        return result
+
+    def command_many(
+        self, requests: Sequence[Tuple[int, Command, bytes]]
+    ) -> List[Union[bytes, Exception]]:
+        """
+        Transmit several commands in a single write, then retrieve all the
+        responses in order. This saves one round trip per command compared to
+        successive calls to :meth:`command`.
+
+        :param requests: Sequence of (address, command, data) tuples.
+        :return: For each request, either the received data (without header
+            and checksum) or the exception raised when receiving its response.
+        """
+        frames = bytearray()
+        for address, command, data in requests:
+            frames += self.encode(address, command, data)
+        return self.transfer(frames, len(requests))
+
+    def transfer(self, frames: bytes, count: int) -> List[Union[bytes, Exception]]:
+        """
+        Transmit already encoded frames in a single write, then retrieve the
+        responses in order.
+
+        :param frames: Frames bytes, as built by :meth:`encode`.
+        :param count: Number of frames, which is the number of expected
+            responses.
+        :return: For each frame, either the received data (without header
+            and checksum) or the exception raised when receiving its response.
+        """
+        self.serial.write(frames)
+        results: List[Union[bytes, Exception]] = []
+        for _ in range(count):
+            try:
+                results.append(self.__receive())
+            except (StatusError, ChecksumError) as e:
+                # The whole frame has been consumed, next responses can still
+                # be received.
+                if self.metrics is not None:
+                    self.metrics.error(e)
+                results.append(e)
+            except ProtocolError as e:
+                # Frame boundaries are lost, following responses cannot be
+                # trusted.
+                if self.metrics is not None:
+                    self.metrics.error(e)
+                self.resync()
+                results += [e] * (count - len(results))
+                break
+        return results
+
+    def emergency_off(
+        self, addresses: Optional[Iterable[int]] = None, deadline: float = 0.05
+    ) -> Set[int]:
+        """
+        Switch off the lasers of several devices as fast as possible: laser
+        deactivation and apply commands of all the devices are transmitted
+        in a single burst, then the responses are collected until the
+        deadline. Devices which did not answer in time may still have been
+        switched off. Nothing is transmitted once the link is closed.
+
+        :param addresses: Device addresses. By default, all the devices
+            opened on this link, see :attr:`addresses`.
+        :param deadline: Maximum time in seconds to wait for the responses.
+        :return: Addresses of the devices which acknowledged both commands.
+        """
+        targets = sorted(self.addresses if addresses is None else set(addresses))
+        if not targets or self.__closed:
+            return set()
+        end = time.monotonic() + deadline
+        frames = bytearray()
+        off = INSTRUCTION_IDS[Instruction.LASER_ACTIVATION] + bytes([0])
+        for address in targets:
+            frames += self.encode(address, Command.WRITE_INSTRUCTION, off)
+            frames += self.encode(address, Command.APPLY_ALL_INSTRUCTIONS)
+        previous = self.timeout
+        self.timeout = deadline
+        confirmed: Set[int] = set()
+        try:
+            self.serial.write(frames)
+            for address in targets:
+                acknowledged = True
+                for _ in range(2):
+                    try:
+                        # Each read waits for the remaining time at most.
+                        self.__receive(end)
+                    except (StatusError, ChecksumError):
+                        acknowledged = False
+                if acknowledged:
+                    confirmed.add(address)
+        except ProtocolError:
+            self.resync()
+        finally:
+            self.timeout = previous
+        return confirmed
+
+    @property
+    def closed(self) -> bool:
+        """True once :meth:`close` has been called."""
+        return self.__closed
+
+    def close(self):
+        """
+        Close the serial port. Lasers are not switched off, see
+        :meth:`emergency_off`, or use the link as a context manager.
+        """
+        if self.__closed:
+            return
+        self.__closed = True
+        _LINKS.discard(self)
+        close = getattr(self.serial, "close", None)
+        if close is not None:
+            close()
+
+    def __enter__(self) -> "Link":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """Switch off the lasers of the opened devices, then close the link."""
+        try:
+            self.emergency_off()
+        finally:
+            self.close()
+
+    def discover(
+        self,
+        addresses: Iterable[int] = range(1, 256),
+        timeout: float = 0.02,
+        pipelined: bool = True,
+        burst: int = 16,
+    ) -> Dict[int, str]:
+        """
+        List the devices answering on the link.
+
+        In pipelined mode, ``READ_ADDRESS`` probes are transmitted in bursts.
+        Absent devices do not answer, but each response carries the address
+        of the device, so responses are matched whatever the number of
+        missing ones. The protocol versions of the found devices are then
+        read in a single burst. Otherwise, the protocol version of each
+        address is queried in turn.
+
+        :param addresses: Probed addresses.
+        :param timeout: Maximum time in seconds to wait for a response. Keep
+            it short, absent devices cost this delay once per burst in
+            pipelined mode, and once per address otherwise.
+        :param pipelined: If False, probe one address at a time, for devices
+            which do not answer ``READ_ADDRESS`` on their own address.
+        :param burst: Number of probes per burst, in pipelined mode.
+        :return: Protocol version string of the found devices, by address.
+        """
+        addresses = list(addresses)
+        previous = self.timeout
+        self.timeout = timeout
+        try:
+            if pipelined:
+                found = self.__probe_addresses(addresses, burst)
+            else:
+                found = addresses
+            versions: Dict[int, str] = {}
+            frames = bytearray()
+            for address in found:
+                frames += self.encode(address, Command.READ_PROTOCOL_VERSION)
+            if pipelined:
+                results = self.transfer(frames, len(found))
+            else:
+                results = []
+                for address in found:
+                    try:
+                        self.__send(address, Command.READ_PROTOCOL_VERSION, bytes())
+                        results.append(self.__receive())
+                    except (ProtocolError, ChecksumError, StatusError) as e:
+                        self.resync()
+                        results.append(e)
+            for address, res in zip(found, results):
+                if not isinstance(res, Exception) and len(res) == 3:
+                    versions[address] = "{0}.{1}".format(res[1], res[2])
+            return versions
+        finally:
+            self.timeout = previous
+
+    def __probe_addresses(self, addresses: List[int], burst: int) -> List[int]:
+        """
+        Transmit ``READ_ADDRESS`` probes in bursts, and collect the answers.
+
+        :param addresses: Probed addresses.
+        :param burst: Number of probes per burst.
+        :return: Addresses of the devices which answered, sorted.
+        """
+        probed = set(addresses)
+        found: Set[int] = set()
+        for i in range(0, len(addresses), burst):
+            chunk = addresses[i : i + burst]
+            frames = bytearray()
+            for address in chunk:
+                frames += self.encode(address, Command.READ_ADDRESS)
+            self.serial.write(frames)
+            # Late responses of a previous burst are fine, they still carry
+            # their address.
+            for _ in chunk:
+                try:
+                    res = self.__receive()
+                except (ChecksumError, StatusError):
+                    continue
+                except ProtocolError:
+                    # Timeout: all the present devices answered.
+                    break
+                if len(res) == 2 and res[1] in probed:
+                    found.add(res[1])
+        self.resync()
+        return sorted(found)
+
+
+# Request queued by a ThreadedLink: future, function performing the request and
+# addresses of the devices it writes to.
+QueuedRequest = Tuple[Future, Callable[[], Any], FrozenSet[int]]
+
+
+class ThreadedLink(Link):
+    """
+    A :class:`Link` which can be safely shared by several threads. All
+    commands are submitted to a queue and transmitted by a dedicated I/O
+    thread, so frames of different requests never interleave on the wire.
+
+    Pending requests are queued per device address, and the I/O thread serves
+    the addresses in turn: a thread flooding one device does not delay the
+    requests for other devices of the daisy-chain by more than one command.
+    """
+
+    # Codes of the commands which do not change the device state.
+    __IDEMPOTENT_CODES = frozenset(c.value for c in Link.IDEMPOTENT_COMMANDS)
+
+    def __init__(self, dev: Union[str, Any], **kwargs):
+        """
+        Open serial device and start the I/O thread.
+
+        :param dev: Serial device path, transport URL or transport. See
+            :class:`Link`.
+        :param kwargs: Other :class:`Link` constructor arguments.
+        """
+        super().__init__(dev, **kwargs)
+        self.__condition = threading.Condition()
+        # Pending requests, per address, with the addresses of the devices
+        # they write to. Addresses are served in order, and moved to the end
+        # once served.
+        self.__queues: "OrderedDict[int, Deque[QueuedRequest]]" = OrderedDict()
+        self.__closed = False
+        # Set when close() is called from the I/O thread, which then closes
+        # the serial port on exit.
+        self.__close_port = False
+        self.__thread = threading.Thread(
+            target=self.__run, name="pypdm-link", daemon=True
+        )
+        self.__thread.start()
+
+    def __run(self):
+        """I/O thread loop."""
+        while True:
+            with self.__condition:
+                while not self.__queues and not self.__closed:
+                    self.__condition.wait()
+                if not self.__queues:
+                    if self.__close_port:
+                        Link.close(self)
+                    return
+                address, queue = next(iter(self.__queues.items()))
+                future, function, _ = queue.popleft()
+                if queue:
+                    self.__queues.move_to_end(address)
+                else:
+                    del self.__queues[address]
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(function())
+            except Exception as e:
+                future.set_exception(e)
+
+    def __submit(
+        self,
+        address: int,
+        function: Callable[[], Any],
+        writes: FrozenSet[int] = frozenset(),
+    ) -> Future:
+        """
+        Queue a request for the I/O thread.
+
+        :param address: Device address, used for fairness.
+        :param function: Function performing the request.
+        :param writes: Addresses of the devices whose state the request
+            changes. Cancelled by :meth:`emergency_off`.
+        :return: A future of the function result.
+        """
+        future: Future = Future()
+        with self.__condition:
+            if self.__closed:
+                raise RuntimeError("Link is closed.")
+            self.__queues.setdefault(address, deque()).append(
+                (future, function, writes)
+            )
+            self.__condition.notify()
+        return future
+
+    def __writes(self, requests: Iterable[Tuple[int, int]]) -> FrozenSet[int]:
+        """
+        :param requests: (address, command code) pairs.
+        :return: Addresses of the devices written to by the requests.
+        """
+        return frozenset(
+            address for address, code in requests if code not in self.__IDEMPOTENT_CODES
+        )
+
+    def submit(self, address: int, command: Command, data: bytes = bytes()) -> Future:
+        """
+        Queue a command without waiting for its response.
+
+        :param address: Device address.
+        :param command: An instance of Command enumeration.
+        :param data: Data bytes.
+        :return: A :class:`concurrent.futures.Future` of the received data.
+        """
+        return self.__submit(
+            address,
+            lambda: Link.command(self, address, command, data),
+            self.__writes([(address, command.value)]),
+        )
+
+    def submit_many(self, requests: Sequence[Tuple[int, Command, bytes]]) -> Future:
+        """
+        Queue several commands to be transmitted in a single burst. See
+        :meth:`Link.command_many`. The burst is never interleaved with other
+        requests.
+
+        :param requests: Sequence of (address, command, data) tuples.
+        :return: A :class:`concurrent.futures.Future` of the results list.
+        """
+        requests = list(requests)
+        address = requests[0][0] if requests else 0
+        return self.__submit(
+            address,
+            lambda: Link.command_many(self, requests),
+            self.__writes((a, command.value) for a, command, _ in requests),
+        )
+
+    def submit_transfer(self, frames: bytes, count: int, address: int = 0) -> Future:
+        """
+        Queue already encoded frames to be transmitted in a single burst. See
+        :meth:`Link.transfer`.
+
+        :param frames: Frames bytes.
+        :param count: Number of frames.
+        :param address: Device address used for fairness.
+        :return: A :class:`concurrent.futures.Future` of the results list.
+        """
+        offsets = []
+        offset = 0
+        while offset + 2 < len(frames) and frames[offset] > 0:
+            offsets.append(offset)
+            offset += frames[offset]
+        return self.__submit(
+            address,
+            lambda: Link.transfer(self, frames, count),
+            self.__writes((frames[i + 1], frames[i + 2]) for i in offsets),
+        )
+
+    def command(self, address: int, command: Command, data: bytes = bytes()):
+        """
+        Transmit a command to a laser source, and wait for the response to
+        that command.
+
+        :param address: Device address.
+        :param command: An instance of Command enumeration.
+        :param data: Data bytes.
+        :return: Received data, without header and checksum.
+        """
+        if threading.current_thread() is self.__thread:
+            return super().command(address, command, data)
+        return self.submit(address, command, data).result()
+
+    def command_many(
+        self, requests: Sequence[Tuple[int, Command, bytes]]
+    ) -> List[Union[bytes, Exception]]:
+        """
+        Transmit several commands in a single burst and wait for all the
+        responses. See :meth:`Link.command_many`.
+
+        :param requests: Sequence of (address, command, data) tuples.
+        :return: For each request, either the received data or the raised
+            exception.
+        """
+        if threading.current_thread() is self.__thread:
+            return super().command_many(requests)
+        return self.submit_many(requests).result()
+
+    def transfer(self, frames: bytes, count: int) -> List[Union[bytes, Exception]]:
+        """
+        Transmit already encoded frames in a single burst and wait for all the
+        responses. See :meth:`Link.transfer`.
+
+        :param frames: Frames bytes.
+        :param count: Number of frames.
+        :return: For each frame, either the received data or the raised
+            exception.
+        """
+        if threading.current_thread() is self.__thread:
+            return super().transfer(frames, count)
+        address = frames[1] if frames else 0
+        return self.submit_transfer(frames, count, address).result()
+
+    def discover(self, *args, **kwargs) -> Dict[int, str]:
+        """
+        List the devices answering on the link, once all previously submitted
+        requests have been transmitted. See :meth:`Link.discover`.
+        """
+        if threading.current_thread() is self.__thread:
+            return super().discover(*args, **kwargs)
+        return self.__submit(0, lambda: Link.discover(self, *args, **kwargs)).result()
+
+    def emergency_off(
+        self, addresses: Optional[Iterable[int]] = None, deadline: float = 0.05
+    ) -> Set[int]:
+        """
+        Switch off the lasers as soon as the request in progress, if any,
+        completes. See :meth:`Link.emergency_off`.
+
+        Pending requests changing the state of the switched off devices are
+        cancelled, as they could switch them on again: their futures raise a
+        :class:`concurrent.futures.CancelledError`. Other pending requests,
+        such as reads, are transmitted afterwards.
+        """
+        if threading.current_thread() is self.__thread or not self.__thread.is_alive():
+            return super().emergency_off(addresses, deadline)
+        targets = set(self.addresses if addresses is None else addresses)
+        future: Future = Future()
+        with self.__condition:
+            for address in list(self.__queues):
+                kept: Deque[QueuedRequest] = deque()
+                for entry in self.__queues[address]:
+                    if entry[2] & targets:
+                        entry[0].cancel()
+                    else:
+                        kept.append(entry)
+                if kept:
+                    self.__queues[address] = kept
+                else:
+                    del self.__queues[address]
+            stopped = self.__closed
+            if not stopped:
+                # Served before the other pending requests.
+                entry = (
+                    future,
+                    lambda: Link.emergency_off(self, addresses, deadline),
+                    frozenset(),
+                )
+                self.__queues.setdefault(0, deque()).appendleft(entry)
+                self.__queues.move_to_end(0, last=False)
+                self.__condition.notify()
+        if stopped:
+            # The I/O thread transmits the requests in progress, then exits.
+            self.__thread.join()
+            return super().emergency_off(addresses, deadline)
+        return future.result()
+
+    def close(self):
+        """
+        Transmit pending requests, then stop the I/O thread and close the
+        serial port. Later requests raise a RuntimeError.
+        """
+        with self.__condition:
+            self.__closed = True
+            if threading.current_thread() is self.__thread:
+                # Cannot wait for itself: the port is closed once the pending
+                # requests have been transmitted.
+                self.__close_port = True
+                return
+            self.__condition.notify()
+        self.__thread.join()
+        super().close()
+
+
+def emergency_off_all(deadline: float = 0.05) -> Dict[str, Set[int]]:
+    """
+    Switch off the lasers of all the devices opened on all the open links,
+    the links in parallel. See :meth:`Link.emergency_off`. Called when the
+    interpreter exits.
+
+    :param deadline: Maximum time in seconds to wait for the responses.
+    :return: For each link port, the addresses of the devices which
+        acknowledged.
+    """
+    links = [link for link in list(_LINKS) if link.addresses and not link.closed]
+    results: Dict[str, Set[int]] = {link.port: set() for link in links}
+
+    def run(link: Link):
+        try:
+            results[link.port] = link.emergency_off(deadline=deadline)
+        except Exception:
+            pass
+
+    threads = [
+        threading.Thread(target=run, args=(link,), name="pypdm-off", daemon=True)
+        for link in links
+    ]
+    end = time.monotonic() + deadline
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        # Links busy with a request in progress may take longer.
+        thread.join(max(0.0, end - time.monotonic()) + 0.1)
+    return results
+
+
+@atexit.register
+def _emergency_off_at_exit():
+    emergency_off_all()
+    # PDM objects deleted afterwards must not transmit again.
+    for link in list(_LINKS):
+        try:
+            link.close()
+        except Exception:
+            pass
+
+
+class BatchItem:
+    """
+    A command queued in a :class:`Batch`. Once the batch has been flushed,
+    either :attr:`result` holds the response data or :attr:`error` holds the
+    exception raised for this command.
+    """
+
+    __slots__ = (
+        "address",
+        "command",
+        "data",
+        "instruction",
+        "callback",
+        "errback",
+        "result",
+        "error",
+    )
+
+    def __init__(
+        self,
+        address: int,
+        command: Command,
+        data: bytes,
+        instruction: Optional[Instruction] = None,
+        callback: Optional[Callable[[bytes], None]] = None,
+        errback: Optional[Callable[[Exception], None]] = None,
+    ):
+        self.address = address
+        self.command = command
+        self.data = data
+        self.instruction = instruction
+        self.callback = callback
+        self.errback = errback
+        self.result: Optional[bytes] = None
+        self.error: Optional[Exception] = None
+
+    def __str__(self):
+        target = self.command.name
+        if self.instruction is not None:
+            target += " " + self.instruction.name
+        return "{0} @{1}: {2!r}".format(target, self.address, self.error)
+
+
+class Batch:
+    """
+    Collects commands for one or several devices sharing a :class:`Link`, and
+    transmits them in a single burst when flushed. Usually obtained with
+    :meth:`PDM.batch`. It can also be used as a context manager, which flushes
+    the batch on exit:
+
+    .. code-block:: python
+
+        with Batch(link) as batch:
+            with pdm1.batch(batch):
+                pdm1.activation = True
+                pdm1.apply()
+            with pdm2.batch(batch):
+                pdm2.activation = True
+                pdm2.apply()
+    """
+
+    def __init__(self, link: Link):
+        """
+        :param link: Link used to transmit the commands.
+        """
+        self.link = link
+        self.items: List[BatchItem] = []
+
+    def __enter__(self) -> "Batch":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # Transmit queued commands only if the block completed normally.
+        if exc_type is None:
+            self.flush()
+        else:
+            self.items.clear()
+
+    def command(
+        self,
+        address: int,
+        command: Command,
+        data: bytes = bytes(),
+        instruction: Optional[Instruction] = None,
+        callback: Optional[Callable[[bytes], None]] = None,
+        errback: Optional[Callable[[Exception], None]] = None,
+    ) -> BatchItem:
+        """
+        Queue a command.
+
+        :param address: Device address.
+        :param command: An instance of Command enumeration.
+        :param data: Data bytes.
+        :param instruction: Instruction targeted by the command, if any. Used
+            for error reporting.
+        :param callback: Called with the response data if the command
+            succeeds.
+        :param errback: Called with the exception if the command fails.
+        :return: The queued :class:`BatchItem`.
+        """
+        item = BatchItem(address, command, data, instruction, callback, errback)
+        self.items.append(item)
+        return item
+
+    def flush(self) -> List[BatchItem]:
+        """
+        Transmit all queued commands and receive their responses. Raise a
+        :class:`BatchError` if any command failed.
+
+        :return: The transmitted :class:`BatchItem` list.
+        """
+        items, self.items = self.items, []
+        if not items:
+            return items
+        try:
+            results: Sequence[Union[bytes, Exception]] = self.link.command_many(
+                [(item.address, item.command, item.data) for item in items]
+            )
+        except Exception as e:
+            # Commands may or may not have been received.
+            for item in items:
+                item.error = e
+                if item.errback is not None:
+                    item.errback(e)
+            raise
+        errors = []
+        for item, result in zip(items, results):
+            if isinstance(result, Exception):
+                item.error = result
+                errors.append(item)
+                if item.errback is not None:
+                    item.errback(result)
+            else:
+                item.result = result
+                if item.callback is not None:
+                    item.callback(result)
+        if errors:
+            raise BatchError(errors)
+        return items
+
+
+class ShadowRegisters:
+    """
+    Last known value of the instructions of a PDM device, used by :class:`PDM`
+    to answer reads without querying the device. Values are stored as raw
+    instruction data bytes, when written to the device and when read for the
+    first time.
+
+    Written values are kept in the :attr:`dirty` set until
+    :meth:`PDM.apply` is called, which makes them effective.
+
+    Measurements (temperature, interlock status) are never assumed to be
+    stable: they are served from the cache only while younger than
+    :attr:`measurement_max_age` seconds. The default of 0 disables caching of
+    measurements.
+    """
+
+    # Instructions which are measured by the device and may change anytime.
+    MEASUREMENTS = frozenset({Instruction.TEMPERATURE, Instruction.INTERLOCK_STATUS})
+
+    def __init__(self, measurement_max_age: float = 0.0):
+        """
+        :param measurement_max_age: Maximum age in seconds of a cached
+            measurement.
+        """
+        self.measurement_max_age = measurement_max_age
+        # Value and time of storage of each known instruction.
+        self.__values: Dict[Instruction, Tuple[bytes, float]] = {}
+        self.__dirty: Set[Instruction] = set()
+        # Settings in the volatile memory of the device are unknown until the
+        # first apply.
+        self.__clean = False
+
+    def get(self, instruction: Instruction) -> Optional[bytes]:
+        """
+        :param instruction: An Instruction enum instance.
+        :return: Known value data bytes, or None if the value is unknown or
+            has expired.
+        """
+        entry = self.__values.get(instruction)
+        if entry is None:
+            return None
+        value, timestamp = entry
+        if instruction in self.MEASUREMENTS:
+            if time.monotonic() - timestamp > self.measurement_max_age:
+                del self.__values[instruction]
+                return None
+        return value
+
+    def store(self, instruction: Instruction, value: bytes, written: bool = False):
+        """
+        Record the value of an instruction.
+
+        :param instruction: An Instruction enum instance.
+        :param value: Value data bytes.
+        :param written: True if the value has been written in the volatile
+            memory of the device, and is not effective until applied.
+        """
+        self.__values[instruction] = (bytes(value), time.monotonic())
+        if written:
+            self.__dirty.add(instruction)
+
+    def unknown(self, instruction: Instruction):
+        """
+        Forget the value of an instruction after a failed write. The device
+        may have received the value, so it is also considered written and
+        not yet applied.
+
+        :param instruction: An Instruction enum instance.
+        """
+        self.__values.pop(instruction, None)
+        self.__dirty.add(instruction)
+
+    def applied(self):
+        """Mark all written values as effective."""
+        self.__dirty.clear()
+        self.__clean = True
+
+    def invalidate(self, instruction: Optional[Instruction] = None):
+        """
+        Forget the value of an instruction, so it is read again from the
+        device on next access.
+
+        :param instruction: Instruction to forget. If None, all the values
+            are forgotten.
+        """
+        if instruction is None:
+            self.__values.clear()
+            self.__clean = False
+        else:
+            self.__values.pop(instruction, None)
+
+    @property
+    def dirty(self) -> FrozenSet[Instruction]:
+        """Instructions written in volatile memory and not yet applied."""
+        return frozenset(self.__dirty)
+
+    @property
+    def clean(self) -> bool:
+        """
+        True when the volatile memory of the device is known to hold only
+        applied values, in which case applying again has no effect.
+        """
+        return self.__clean and not self.__dirty
+
+
+class ElisionCounters:
+    """
+    Number of frames which have not been transmitted thanks to write elision.
+    See :attr:`PDM.elided`.
+    """
+
+    __slots__ = ("writes", "applies")
+
+    def __init__(self):
+        self.writes = 0
+        self.applies = 0
+
+    @property
+    def frames(self) -> int:
+        """Total number of frames saved."""
+        return self.writes + self.applies
+
+    def reset(self):
+        """Reset all counters to zero."""
+        self.writes = 0
+        self.applies = 0
+
+    def __repr__(self):
+        return "ElisionCounters(writes={0}, applies={1})".format(
+            self.writes, self.applies
+        )
+
+
+class RegisterArray:
+    """
+    Values of one instruction of a device, validated and encoded once into a
+    contiguous buffer of write frames, so that writing any of them costs a
+    single transfer and no check. Built by :meth:`RawRegisters.array`.
+
+    .. code-block:: python
+
+        delays = pdm.registers.array(Instruction.DELAY, range(0, 15000, 10),
+            apply=True)
+        for i in range(len(delays)):
+            delays.write(i)
+            trigger_target()
+    """
+
+    def __init__(
+        self,
+        pdm: "PDM",
+        instruction: Instruction,
+        data: bytes,
+        count: int,
+        apply: bool = False,
+    ):
+        """
+        :param pdm: Configured device.
+        :param instruction: Written instruction.
+        :param data: Encoded values, concatenated.
+        :param count: Number of values.
+        :param apply: If True, each write is followed by an apply command, in
+            the same burst.
+        """
+        self.pdm = pdm
+        self.instruction = instruction
+        self.apply = apply
+        link = pdm.link
+        self.__size = struct.calcsize(INSTRUCTION_FORMATS[instruction])
+        if len(data) != self.__size * count:
+            raise ValueError("Invalid data length.")
+        self.__count = count
+        # Frames per write.
+        self.__frames = 2 if apply else 1
+        identifier = INSTRUCTION_IDS[instruction]
+        apply_frame = link.encode(pdm.address, Command.APPLY_ALL_INSTRUCTIONS)
+        buffer = bytearray()
+        for i in range(0, len(data), self.__size):
+            value = identifier + data[i : i + self.__size]
+            buffer += link.encode(pdm.address, Command.WRITE_INSTRUCTION, value)
+            if apply:
+                buffer += apply_frame
+        self.__buffer = buffer
+        self.__stride = len(buffer) // count if count else 0
+
+    def __len__(self) -> int:
+        return self.__count
+
+    @property
+    def frames(self) -> memoryview:
+        """Read-only view of the compiled frames of all the values."""
+        return memoryview(self.__buffer).toreadonly()
+
+    def write(self, index: int):
+        """
+        Write one of the values, and apply if enabled.
+
+        :param index: Value index.
+        """
+        if not 0 <= index < self.__count:
+            raise IndexError("Value index out of range.")
+        start = index * self.__stride
+        view = memoryview(self.__buffer)[start : start + self.__stride]
+        shadow = self.pdm.shadow
+        try:
+            results = self.pdm.link.transfer(view, self.__frames)
+        except Exception:
+            if shadow is not None:
+                shadow.unknown(self.instruction)
+            raise
+        for result in results:
+            if isinstance(result, Exception):
+                if shadow is not None:
+                    shadow.unknown(self.instruction)
+                raise result
+        if shadow is not None:
+            # Value bytes follow the length, address, command and identifier.
+            shadow.store(self.instruction, view[5 : 5 + self.__size], written=True)
+            if self.apply:
+                shadow.applied()
+
+
+class RawRegisters:
+    """
+    Unchecked access to the instruction registers of a device, for hot loops
+    where parameters have already been validated. Values are the raw numbers
+    transmitted to the device: integers for enumerations (their value) and
+    booleans (0 or 1), floats for currents. Obtained with
+    :attr:`PDM.registers`.
+
+    Writes go through the same path as the property setters, so batches,
+    shadow registers and write elision apply. Only the validation is
+    skipped: out of bounds values are transmitted as they are. Validate
+    whole arrays of values at once with :meth:`validate` or :meth:`array`.
+    """
+
+    # Instructions which cannot be written.
+    READ_ONLY = frozenset(
+        {
+            Instruction.TEMPERATURE,
+            Instruction.MAXIMUM_MEAN_CURRENT,
+            Instruction.MAXIMUM_PULSE_CURRENT,
+            Instruction.INTERLOCK_STATUS,
+        }
+    )
+
+    def __init__(
+        self,
+        pdm: "PDM",
+        write: Callable[[Instruction, bytes], None],
+        read: Callable[[Instruction, int], bytes],
+    ):
+        """
+        :param pdm: Device.
+        :param write: Writes instruction value bytes.
+        :param read: Reads instruction value bytes, given their length.
+        """
+        self.pdm = pdm
+        self.__write = write
+        self.__read = read
+
+    def write(self, instruction: Instruction, value: Union[int, float]):
+        """
+        Write a raw value, without any check.
+
+        :param instruction: Written instruction.
+        :param value: Raw value.
+        """
+        self.__write(instruction, INSTRUCTION_STRUCTS[instruction].pack(value))
+
+    def write_bytes(self, instruction: Instruction, data: bytes):
+        """
+        Write already encoded value bytes, without any check.
+
+        :param instruction: Written instruction.
+        :param data: Value data bytes.
+        """
+        self.__write(instruction, bytes(data))
+
+    def write_many(self, values: Mapping[Instruction, Union[int, float, bytes]]):
+        """
+        Write several raw values or encoded value bytes in a single burst,
+        without any check. See :meth:`PDM.batch`.
+
+        :param values: Values by instruction.
+        """
+        write = self.__write
+        with self.pdm.batch():
+            for instruction, value in values.items():
+                if not isinstance(value, (bytes, bytearray)):
+                    value = INSTRUCTION_STRUCTS[instruction].pack(value)
+                write(instruction, bytes(value))
+
+    def read(self, instruction: Instruction) -> Union[int, float]:
+        """
+        :param instruction: Read instruction.
+        :return: Raw value.
+        """
+        layout = INSTRUCTION_STRUCTS[instruction]
+        return layout.unpack(self.__read(instruction, layout.size))[0]
+
+    def read_bytes(self, instruction: Instruction) -> bytes:
+        """
+        :param instruction: Read instruction.
+        :return: Value data bytes.
+        """
+        return bytes(self.__read(instruction, INSTRUCTION_STRUCTS[instruction].size))
+
+    def read_many(self, instructions: Iterable[Instruction]) -> List[Union[int, float]]:
+        """
+        Read several raw values in a single burst.
+
+        :param instructions: Read instructions.
+        :return: Raw values, in the same order.
+        """
+        instructions = list(instructions)
+        pdm = self.pdm
+        batch = Batch(pdm.link)
+        for instruction in instructions:
+            batch.command(
+                pdm.address,
+                Command.READ_INSTRUCTION,
+                INSTRUCTION_IDS[instruction],
+                instruction,
+            )
+        items = batch.items
+        batch.flush()
+        values = []
+        for instruction, item in zip(instructions, items):
+            assert item.result is not None
+            data = item.result[1:]
+            layout = INSTRUCTION_STRUCTS[instruction]
+            if len(data) != layout.size:
+                raise ProtocolError()
+            if pdm.shadow is not None:
+                pdm.shadow.store(instruction, data)
+            values.append(layout.unpack(data)[0])
+        return values
+
+    def limits(self, instruction: Instruction) -> Tuple[float, float]:
+        """
+        :param instruction: Writable instruction.
+        :return: Minimum and maximum raw values accepted by the property
+            setters.
+        """
+        if instruction in self.READ_ONLY:
+            raise ValueError(f"Instruction {instruction.name} is read-only")
+        pdm = self.pdm
+        bounds = {
+            Instruction.FREQUENCY: (1, pdm.MAX_FREQUENCY),
+            Instruction.PULSE_WIDTH: (0, pdm.MAX_PULSE_WIDTH),
+            Instruction.DELAY: (0, pdm.MAX_DELAY),
+            Instruction.OFFSET_CURRENT: (0.0, 150.0),
+            Instruction.CURRENT: (0.0, 100.0),
+            Instruction.LASER_ACTIVATION: (0, 1),
+        }.get(instruction)
+        if bounds is not None:
+            return bounds
+        kind = REGISTER_ENUMS[instruction]
+        values = [member.value for member in kind]
+        return min(values), max(values)
+
+    def validate(
+        self, instruction: Instruction, values: Iterable[Union[int, float]]
+    ) -> bytes:
+        """
+        Validate many values of an instruction at once, with the same rules
+        as the property setters, and encode them.
+
+        :param instruction: Written instruction.
+        :param values: Raw values.
+        :return: Encoded values, concatenated.
+        """
+        if not isinstance(values, Sequence):
+            values = list(values)
+        if instruction in PROTOCOL_3_7_INSTRUCTIONS and self.pdm.version != "3.7":
+            raise ProtocolVersionNotSupported(self.pdm.version)
+        low, high = self.limits(instruction)
+        fmt = INSTRUCTION_FORMATS[instruction]
+        try:
+            # Packing checks the types and the integer ranges.
+            data = struct.pack(f"{fmt[0]}{len(values)}{fmt[1:]}", *values)
+        except struct.error as e:
+            raise ValueError(f"Invalid {instruction.name} value: {e}") from e
+        if values and (min(values) < low or max(values) > high):
+            raise ValueError(
+                f"{instruction.name} values out of bounds ({low} to {high})"
+            )
+        return data
+
+    def array(
+        self,
+        instruction: Instruction,
+        values: Iterable[Union[int, float]],
+        apply: bool = False,
+    ) -> RegisterArray:
+        """
+        Validate many values of an instruction at once, and compile their
+        write frames. See :class:`RegisterArray`.
+
+        :param instruction: Written instruction.
+        :param values: Raw values.
+        :param apply: If True, each write is followed by an apply command.
+        """
+        if not isinstance(values, Sequence):
+            values = list(values)
+        data = self.validate(instruction, values)
+        return RegisterArray(self.pdm, instruction, data, len(values), apply)
 
 
 class PDM:
     """
     Class to command one Alphanov's PDM laser sources.
+
+    For safety, the laser is switched off when the device is closed. Use it
+    as a context manager, or call :meth:`close`:
+
+    .. code-block:: python
+
+        with PDM(1, '/dev/ttyUSB0') as pdm:
+            pdm.activation = True
+            pdm.apply()
+
+    Devices not closed are switched off when the object is deleted, and all
+    the devices still open when the interpreter exits are switched off
+    together, see :func:`emergency_off_all`.
     """
 
     # Maximum delay in ps, according to documentation.
@@ -259,14 +2176,35 @@ class PDM:
     # Maximum frequency, in Hz, according to documentation.
     MAX_FREQUENCY = 250000000
 
-    def __init__(self, address: int, link: Union[str, Link, "PDM"]):
+    def __init__(
+        self,
+        address: int,
+        link: Union[str, Link, "PDM"],
+        cache: bool = False,
+        elide_writes: bool = False,
+    ):
         """
         :param address: PDM device address.
         :param link: Specify a string for the serial to be used
             ('/dev/ttyUSBx' or 'COMx'), a :class:`Link` or :class:`PDM` instance
             for daisy-chained configurations.
+        :param cache: If True, instruction values are kept in
+            :attr:`shadow` registers and reads are answered from them when
+            possible. This assumes no other program changes the device
+            settings.
+        :param elide_writes: If True, instruction writes are not transmitted
+            when the device is known to already hold the value, and
+            :meth:`apply` is not transmitted when there is nothing to apply.
+            Skipped frames are counted in :attr:`elided`. Implies `cache`.
         """
         self.address = address
+        self.__closed = False
+        self.__batch: Optional[Batch] = None
+        self.elide_writes = elide_writes
+        self.elided = ElisionCounters()
+        self.shadow: Optional[ShadowRegisters] = (
+            ShadowRegisters() if (cache or elide_writes) else None
+        )
         if type(link) is str:
             self.link = Link(link)
         elif isinstance(link, Link):
@@ -275,9 +2213,24 @@ class PDM:
             self.link = link.link
         else:
             raise ValueError("Invalid link parameter.")
+        # If the maximum current or maximum mean current is queried,
+        # cache the result in the following float variable.
+        self.__maximum_current_cache: Optional[float] = None
+        self.__maximum_mean_current_cache: Optional[float] = None
+        self.__version_cache = None
+        registry = self.link.identities
+        identity = None
+        if registry is not None:
+            identity = registry.get(self.link.port, address)
+        if identity is not None and identity.version is not None:
+            # Skip the handshake, the device is already known.
+            self.__version_cache = identity.version
+            self.__maximum_current_cache = identity.maximum_current
+            self.__maximum_mean_current_cache = identity.maximum_mean_current
+            if isinstance(self.link, ThreadedLink):
+                self.__revalidate_in_background()
         # Verify we can communicate with the PDM and the protocol version is
         # supported.
-        self.__version_cache = None
         version_parts = self.version.split(".")
         try:
             major = int(version_parts[0])
@@ -286,17 +2239,157 @@ class PDM:
             raise ProtocolVersionNotSupported(self.version)
         if not (major == 3 and 4 <= minor <= 7):
             raise ProtocolVersionNotSupported(self.version)
-        # If the maximum current or maximum mean current is queried,
-        # cache the result in the following float variable.
-        self.__maximum_current_cache: Optional[float] = None
-        self.__maximum_mean_current_cache: Optional[float] = None
+        if registry is not None and identity is None:
+            self.__validate_identity(registry)
+        self.link.addresses.add(address)
+
+    def __validate_identity(self, registry: IdentityRegistry):
+        """
+        Store the identity of the device after the handshake. Maximum currents
+        of an expired identity are read again, rather than being stamped as
+        validated with the version.
+
+        :param registry: Identity registry of the link.
+        """
+        values: Dict[str, Any] = {"version": self.version}
+        expired = registry.get(self.link.port, self.address, expired=True)
+        if expired is not None and expired.version == self.version:
+            if expired.maximum_current is not None:
+                current = self.__read_maximum("maximum_current")
+                self.__maximum_current_cache = current
+                values["maximum_current"] = current
+            if expired.maximum_mean_current is not None:
+                current = self.__read_maximum("maximum_mean_current")
+                self.__maximum_mean_current_cache = current
+                values["maximum_mean_current"] = current
+        registry.update(self.link.port, self.address, **values)
+
+    def __read_maximum(self, name: str) -> float:
+        """
+        :param name: ``maximum_current`` or ``maximum_mean_current``.
+        :return: Maximum current read from the device, in mA.
+        """
+        val = self.__read_instruction(FIELDS[name][0], 4)
+        return decode_field(name, val)
+
+    def __remember(self, **values: Any):
+        """
+        Store device characteristics in the identity registry of the link, if
+        any.
+
+        :param values: :class:`DeviceIdentity` attributes.
+        """
+        registry = self.link.identities
+        if registry is not None:
+            registry.update(self.link.port, self.address, **values)
+
+    def __revalidate_in_background(self):
+        """
+        Query the characteristics taken from the identity registry through the
+        I/O thread of the :class:`ThreadedLink`, and correct them if the
+        device does not match.
+        """
+        link = self.link
+        assert isinstance(link, ThreadedLink)
+        address = self.address
+        version = link.submit(address, Command.READ_PROTOCOL_VERSION)
+        currents = [
+            (
+                name,
+                link.submit(
+                    address, Command.READ_INSTRUCTION, INSTRUCTION_IDS[instruction]
+                ),
+            )
+            for name, instruction, value in (
+                (
+                    "maximum_current",
+                    Instruction.MAXIMUM_PULSE_CURRENT,
+                    self.__maximum_current_cache,
+                ),
+                (
+                    "maximum_mean_current",
+                    Instruction.MAXIMUM_MEAN_CURRENT,
+                    self.__maximum_mean_current_cache,
+                ),
+            )
+            if value is not None
+        ]
+        # Do not keep the device alive until verified.
+        pdm_ref = weakref.ref(self)
+
+        def verify(_):
+            try:
+                res = version.result()
+                values: Dict[str, Any] = {"version": "{0}.{1}".format(res[1], res[2])}
+                for name, future in currents:
+                    values[name] = struct.unpack(">f", future.result()[1:])[0]
+            except Exception:
+                # Verified again once the registry entry expires.
+                return
+            assert link.identities is not None
+            link.identities.update(link.port, address, **values)
+            pdm = pdm_ref()
+            if pdm is not None:
+                pdm.__version_cache = values["version"]
+                pdm.__maximum_current_cache = values.get("maximum_current")
+                pdm.__maximum_mean_current_cache = values.get("maximum_mean_current")
+
+        (currents[-1][1] if currents else version).add_done_callback(verify)
+
+    def close(self):
+        """
+        Switch off the laser and apply, in a single burst. Nothing is
+        transmitted if the link is already closed. The device must not be
+        used afterwards.
+        """
+        if self.__closed:
+            return
+        self.__closed = True
+        link = self.__dict__.get("link")
+        if link is None or link.closed:
+            return
+        link.addresses.discard(self.address)
+        # Do not trust the cache for this, always transmit.
+        if self.shadow is not None:
+            self.shadow.invalidate()
+        results = link.command_many(
+            [
+                (
+                    self.address,
+                    Command.WRITE_INSTRUCTION,
+                    INSTRUCTION_IDS[Instruction.LASER_ACTIVATION] + bytes([0]),
+                ),
+                (self.address, Command.APPLY_ALL_INSTRUCTIONS, bytes()),
+            ]
+        )
+        for res in results:
+            if isinstance(res, Exception):
+                raise res
+
+    @property
+    def registers(self) -> RawRegisters:
+        """
+        Unchecked raw access to the instruction registers, for hot loops. See
+        :class:`RawRegisters`. Keep the returned object in a local variable
+        rather than getting it at each call.
+        """
+        return RawRegisters(self, self.__write_instruction, self.__read_instruction)
+
+    def __enter__(self) -> "PDM":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
 
     def __del__(self):
         """
-        For safety, disable laser when the object is deleted.
+        For safety, disable laser when the object is deleted, unless already
+        closed. Errors are ignored, the link may be gone.
         """
-        self.activation = False
-        self.apply()
+        try:
+            self.close()
+        except Exception:
+            pass
 
     def __command(
         self, command: Command, data: bytes = bytes(), address: Optional[int] = None
@@ -312,6 +2405,66 @@ class PDM:
             self.address if address is None else address, command, data
         )
 
+    @contextmanager
+    def batch(self, batch: Optional[Batch] = None) -> Iterator[Batch]:
+        """
+        Context manager queuing all instruction writes and :meth:`apply` calls
+        instead of transmitting them immediately. When the context exits, the
+        queued commands are transmitted in a single burst and all responses
+        are then checked. A :class:`BatchError` is raised if any of them
+        failed. Reads are not queued and are still performed immediately.
+
+        .. code-block:: python
+
+            with pdm.batch():
+                pdm.frequency = 10000
+                pdm.pulse_width = 5000
+                pdm.activation = True
+                pdm.apply()
+
+        :param batch: An existing :class:`Batch` to join, for instance to
+            configure several daisy-chained devices in the same burst. In that
+            case the batch is not flushed when the context exits.
+        """
+        own = batch is None
+        if batch is None:
+            batch = Batch(self.link)
+        elif batch.link is not self.link:
+            raise ValueError("Batch does not use the same link.")
+        previous, self.__batch = self.__batch, batch
+        try:
+            yield batch
+        finally:
+            self.__batch = previous
+        if own:
+            batch.flush()
+
+    def configure(self, apply: bool = True, batch: Optional[Batch] = None, **settings):
+        """
+        Change several settings at once. All settings are validated and encoded
+        first, then transmitted in a single burst (see :meth:`batch`).
+
+        .. code-block:: python
+
+            pdm.configure(sync_source=SyncSource.INTERNAL, frequency=10000,
+                pulse_width=5000, activation=True)
+
+        :param apply: If True, :meth:`apply` is called at the end of the
+            burst.
+        :param batch: An existing :class:`Batch` to join instead of
+            transmitting immediately. See :meth:`batch`.
+        :param settings: Property names and their new values.
+        """
+        for name in settings:
+            attr = getattr(type(self), name, None)
+            if not isinstance(attr, property) or attr.fset is None:
+                raise ValueError(f"Unknown setting {name}")
+        with self.batch(batch):
+            for name, value in settings.items():
+                setattr(self, name, value)
+            if apply:
+                self.apply()
+
     def read_protocol_version(self) -> str:
         """
         :return: Protocol version string, for instance '3.4'.
@@ -328,16 +2481,129 @@ class PDM:
         res = self.__command(Command.READ_ADDRESS, address=0)
         return res[1]
 
+    @property
+    def error_code(self) -> ErrorFlags:
+        """
+        Error flags reported by the device, :class:`ErrorFlags` instance.
+        Always read from the device, even in a batch and with cache enabled.
+        """
+        return self.__error_code(self.__command(Command.READ_ERROR_CODE))
+
+    def read_errors(
+        self, callback: Optional[Callable[[ErrorFlags], None]] = None
+    ) -> Optional[ErrorFlags]:
+        """
+        Read the error flags of the device. Unlike other reads, this one is
+        queued when called within :meth:`batch`, so that health checks of
+        several devices can be pipelined with other commands:
+
+        .. code-block:: python
+
+            with Batch(link) as batch:
+                for pdm in pdms:
+                    with pdm.batch(batch):
+                        pdm.read_errors(lambda flags: print(pdm.address, flags))
+
+        :param callback: Called with the error flags once read.
+        :return: The error flags, or None if the read has been queued.
+        """
+        if self.__batch is not None:
+            self.__batch.command(
+                self.address,
+                Command.READ_ERROR_CODE,
+                callback=lambda res: self.__errors_read(res, callback),
+            )
+            return None
+        return self.__errors_read(self.__command(Command.READ_ERROR_CODE), callback)
+
+    def __errors_read(
+        self, res: bytes, callback: Optional[Callable[[ErrorFlags], None]]
+    ) -> ErrorFlags:
+        """
+        Called when the error code has been received.
+        :param res: Response data, with status byte.
+        :param callback: Called with the error flags, if any.
+        :return: Error flags.
+        """
+        flags = self.__error_code(res)
+        if callback is not None:
+            callback(flags)
+        return flags
+
+    def __error_code(self, res: bytes) -> ErrorFlags:
+        """
+        Decode an error code response, and count its flags in the link
+        metrics.
+        :param res: Response data, with status byte.
+        :return: Error flags.
+        """
+        flags = decode_error_code(res[1:])
+        if self.link.metrics is not None:
+            self.link.metrics.error_code(flags)
+        return flags
+
     def __write_instruction(self, instruction: Instruction, value: bytes):
         """
         Write an instruction in volatile memory.
         :param instruction: An Instruction enum instance.
         :param value: Value data bytes. bytes.
         """
-        self.__command(
-            Command.WRITE_INSTRUCTION,
-            instruction.value.to_bytes(2, "big", signed=False) + value,
-        )
+        if self.elide_writes and self.__known_value(instruction) == value:
+            self.elided.writes += 1
+            return
+        data = INSTRUCTION_IDS[instruction] + value
+        if self.__batch is not None:
+            self.__batch.command(
+                self.address,
+                Command.WRITE_INSTRUCTION,
+                data,
+                instruction,
+                lambda _: self.__written(instruction, value),
+                lambda _: self.__write_failed(instruction),
+            )
+        else:
+            try:
+                self.__command(Command.WRITE_INSTRUCTION, data)
+            except Exception:
+                self.__write_failed(instruction)
+                raise
+            self.__written(instruction, value)
+
+    def __known_value(self, instruction: Instruction) -> Optional[bytes]:
+        """
+        :param instruction: An Instruction enum instance.
+        :return: Value the device will hold for the instruction once pending
+            batched commands are transmitted, or None if unknown.
+        """
+        if self.__batch is not None:
+            for item in reversed(self.__batch.items):
+                if (
+                    item.address == self.address
+                    and item.instruction == instruction
+                    and item.command == Command.WRITE_INSTRUCTION
+                ):
+                    return item.data[2:]
+        if self.shadow is None or instruction in ShadowRegisters.MEASUREMENTS:
+            return None
+        return self.shadow.get(instruction)
+
+    def __written(self, instruction: Instruction, value: bytes):
+        """
+        Called when an instruction has been successfully written.
+        :param instruction: An Instruction enum instance.
+        :param value: Value data bytes.
+        """
+        if self.shadow is not None:
+            self.shadow.store(instruction, value, written=True)
+
+    def __write_failed(self, instruction: Instruction):
+        """
+        Called when writing an instruction failed. The device may still have
+        received the value.
+        :param instruction: An Instruction enum instance.
+        """
+        if self.shadow is not None:
+            self.shadow.unknown(instruction)
 
     def __read_instruction(self, instruction: Instruction, length: int) -> bytes:
         """
@@ -346,11 +2612,15 @@ class PDM:
         :param length: Expected response length.
         :return: Instruction value data bytes.
         """
-        res = self.__command(
-            Command.READ_INSTRUCTION, instruction.value.to_bytes(2, "big", signed=False)
-        )
+        if self.shadow is not None:
+            value = self.shadow.get(instruction)
+            if value is not None and len(value) == length:
+                return value
+        res = self.__command(Command.READ_INSTRUCTION, INSTRUCTION_IDS[instruction])
         if len(res) - 1 != length:
             raise ProtocolError()
+        if self.shadow is not None:
+            self.shadow.store(instruction, res[1:])
         return res[1:]
 
     @property
@@ -434,10 +2704,7 @@ class PDM:
     def offset_current(self):
         """Offset current, in mA. float."""
         val = self.__read_instruction(Instruction.OFFSET_CURRENT, 4)
-        current = struct.unpack(">f", val)[0]
-        if current < 0:
-            raise ProtocolError()
-        return current
+        return decode_field("offset_current", val)
 
     @offset_current.setter
     def offset_current(self, value: float):
@@ -454,10 +2721,7 @@ class PDM:
         change effective.
         """
         val = self.__read_instruction(Instruction.CURRENT, 4)
-        current = struct.unpack(">f", val)[0]
-        if (current < 0) or (current > 100):
-            raise ProtocolError()
-        return current
+        return decode_field("current_percentage", val)
 
     @current_percentage.setter
     def current_percentage(self, value: float):
@@ -508,11 +2772,9 @@ class PDM:
         if self.__maximum_current_cache is not None:
             return self.__maximum_current_cache
 
-        val = self.__read_instruction(Instruction.MAXIMUM_PULSE_CURRENT, 4)
-        max_current = struct.unpack(">f", val)[0]
-        if max_current < 0:
-            raise ProtocolError()
+        max_current = self.__read_maximum("maximum_current")
         self.__maximum_current_cache = max_current
+        self.__remember(maximum_current=max_current)
         return max_current
 
     @property
@@ -525,11 +2787,9 @@ class PDM:
         if self.__maximum_mean_current_cache is not None:
             return self.__maximum_mean_current_cache
 
-        val = self.__read_instruction(Instruction.MAXIMUM_MEAN_CURRENT, 4)
-        max_current = struct.unpack(">f", val)[0]
-        if max_current < 0:
-            raise ProtocolError()
+        max_current = self.__read_maximum("maximum_mean_current")
         self.__maximum_mean_current_cache = max_current
+        self.__remember(maximum_mean_current=max_current)
         return max_current
 
     @property
@@ -566,10 +2826,8 @@ class PDM:
         True when laser is enabled, False when laser is off. Call :meth:`apply`
         to make any change effective.
         """
-        val = self.__read_instruction(Instruction.LASER_ACTIVATION, 1)[0]
-        if val not in range(2):
-            raise ProtocolError()
-        return bool(val)
+        val = self.__read_instruction(Instruction.LASER_ACTIVATION, 1)
+        return decode_field("activation", val)
 
     @activation.setter
     def activation(self, value: bool):
@@ -603,7 +2861,39 @@ class PDM:
         Apply all the instructions which are in volatile memory. This makes all
         settings changes effective.
         """
-        self.__command(Command.APPLY_ALL_INSTRUCTIONS)
+        if self.elide_writes and self.__nothing_to_apply():
+            self.elided.applies += 1
+            return
+        if self.__batch is not None:
+            self.__batch.command(
+                self.address,
+                Command.APPLY_ALL_INSTRUCTIONS,
+                callback=lambda _: self.__applied(),
+            )
+        else:
+            self.__command(Command.APPLY_ALL_INSTRUCTIONS)
+            self.__applied()
+
+    def __nothing_to_apply(self) -> bool:
+        """
+        :return: True if the device volatile memory is known to hold only
+            applied values, including pending batched commands.
+        """
+        if self.shadow is None or not self.shadow.clean:
+            return False
+        if self.__batch is not None:
+            for item in self.__batch.items:
+                if (
+                    item.address == self.address
+                    and item.command == Command.WRITE_INSTRUCTION
+                ):
+                    return False
+        return True
+
+    def __applied(self):
+        """Called when volatile instructions have been successfully applied."""
+        if self.shadow is not None:
+            self.shadow.applied()
 
     @property
     def software_control_mode(self) -> Mode:
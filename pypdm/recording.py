@@ -0,0 +1,373 @@
+# This file is part of PyPDM
+#
+# PyPDM is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+#
+# Copyright 2018-2019 Olivier Hériveaux, Ledger SAS
+
+import mmap
+import struct
+import time
+from typing import Any, BinaryIO, Iterator, NamedTuple, Optional
+from .pdm import Link
+
+# Recording file header: magic, format version, recording start time (as
+# returned by time.time) and length of the serial port name, which follows.
+HEADER = struct.Struct(">6sBdH")
+MAGIC = b"PDMREC"
+FORMAT = 1
+# Record header: direction, time since the start in seconds, data length.
+RECORD = struct.Struct(">BdI")
+
+# Record directions.
+TX = 0
+RX = 1
+
+
+class Record(NamedTuple):
+    """A chunk of bytes transmitted or received on a serial port."""
+
+    #: :data:`TX` or :data:`RX`.
+    direction: int
+    #: Time since the start of the recording, in seconds.
+    time: float
+    #: Transmitted or received bytes.
+    data: bytes
+
+
+class ReplayMismatch(Exception):
+    """
+    Thrown by :class:`ReplaySerial` when the transmitted bytes differ from
+    the recorded ones.
+    """
+
+    def __init__(self, index: int, expected: bytes, actual: bytes):
+        super().__init__(index, expected, actual)
+        self.index = index
+        self.expected = expected
+        self.actual = actual
+
+    def __str__(self):
+        return "Record {0}: expected {1}, transmitted {2}".format(
+            self.index, self.expected.hex(), self.actual.hex()
+        )
+
+
+class RecordingSerial:
+    """
+    Serial port wrapper appending all the transmitted and received bytes to a
+    recording file. See :class:`Recorder`. Other attributes are those of the
+    wrapped serial port.
+    """
+
+    def __init__(self, serial: Any, output: BinaryIO, offset: float = 0.0):
+        """
+        :param serial: Wrapped serial port.
+        :param output: Recording file, with its header already written.
+        :param offset: Time elapsed since the start of the recording, in
+            seconds, when appending to an existing recording.
+        """
+        self.serial = serial
+        self.output = output
+        self.start = time.perf_counter() - offset
+
+    def __record(self, direction: int, data: bytes):
+        self.output.write(
+            RECORD.pack(direction, time.perf_counter() - self.start, len(data))
+        )
+        self.output.write(data)
+
+    def __getattr__(self, name: str) -> Any:
+        # Only called for the attributes not defined here.
+        if name == "serial":
+            raise AttributeError(name)
+        return getattr(self.serial, name)
+
+    @property
+    def port(self) -> Optional[str]:
+        return getattr(self.serial, "port", None)
+
+    @property
+    def timeout(self):
+        return self.serial.timeout
+
+    @timeout.setter
+    def timeout(self, value):
+        self.serial.timeout = value
+
+    @property
+    def write_timeout(self):
+        return self.serial.write_timeout
+
+    @write_timeout.setter
+    def write_timeout(self, value):
+        self.serial.write_timeout = value
+
+    @property
+    def in_waiting(self) -> int:
+        return getattr(self.serial, "in_waiting", 0)
+
+    def write(self, data: bytes) -> Optional[int]:
+        self.__record(TX, bytes(data))
+        return self.serial.write(data)
+
+    def read(self, n: int) -> bytes:
+        data = self.serial.read(n)
+        if data:
+            self.__record(RX, data)
+        return data
+
+    def readinto(self, buffer: memoryview) -> int:
+        readinto = getattr(self.serial, "readinto", None)
+        if readinto is None:
+            data = self.serial.read(len(buffer))
+            received = len(data)
+            buffer[:received] = data
+        else:
+            received = readinto(buffer) or 0
+        if received:
+            self.__record(RX, bytes(buffer[:received]))
+        return received
+
+    def reset_input_buffer(self):
+        reset_input_buffer = getattr(self.serial, "reset_input_buffer", None)
+        if reset_input_buffer is not None:
+            reset_input_buffer()
+
+    def close(self):
+        close = getattr(self.serial, "close", None)
+        if close is not None:
+            close()
+
+
+class Recorder:
+    """
+    Records all the traffic of a :class:`pypdm.Link` to a compact binary
+    file, until stopped. The file can be read with :class:`RecordingReader`
+    and replayed with :class:`ReplaySerial`.
+
+    .. code-block:: python
+
+        with Recorder(link, 'campaign.pdmrec'):
+            run_campaign(pdm)
+
+    Each chunk of bytes written to or read from the serial port is appended
+    with its direction and timestamp. Records are buffered, so the file is
+    complete once the recorder is stopped.
+    """
+
+    def __init__(self, link: Link, path: str):
+        """
+        :param link: Recorded link.
+        :param path: Recording file path. If the file exists, records are
+            appended to it.
+        """
+        self.link = link
+        self.path = path
+        self.__output: Optional[BinaryIO] = None
+        self.__serial: Any = None
+
+    def start(self):
+        """Start recording."""
+        if self.__output is not None:
+            raise RuntimeError("Recorder already started.")
+        output = open(self.path, "ab")
+        offset = 0.0
+        if output.tell() == 0:
+            port = self.link.port.encode()
+            output.write(HEADER.pack(MAGIC, FORMAT, time.time(), len(port)))
+            output.write(port)
+        else:
+            with RecordingReader(self.path) as reader:
+                offset = time.time() - reader.start
+        self.__output = output
+        self.__serial = self.link.serial
+        self.link.serial = RecordingSerial(self.__serial, output, offset)
+
+    def stop(self):
+        """Stop recording, and close the recording file."""
+        if self.__output is None:
+            return
+        self.link.serial = self.__serial
+        self.__output.close()
+        self.__output = None
+        self.__serial = None
+
+    def flush(self):
+        """Write buffered records to the recording file."""
+        if self.__output is not None:
+            self.__output.flush()
+
+    def __enter__(self) -> "Recorder":
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+
+class RecordingReader:
+    """
+    Reads a recording file, memory-mapped so that large recordings are not
+    loaded in memory.
+
+    :ivar port: Name of the recorded serial port.
+    :ivar start: Recording start time, as returned by :func:`time.time`.
+    """
+
+    def __init__(self, path: str):
+        """
+        :param path: Recording file path.
+        """
+        with open(path, "rb") as f:
+            self.__map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self.__map) < HEADER.size:
+            raise ValueError("Not a recording file.")
+        magic, version, self.start, length = HEADER.unpack_from(self.__map)
+        if magic != MAGIC:
+            raise ValueError("Not a recording file.")
+        if version != FORMAT:
+            raise ValueError(f"Unsupported recording format {version}")
+        self.port = bytes(self.__map[HEADER.size : HEADER.size + length]).decode()
+        self.__offset = HEADER.size + length
+
+    def __iter__(self) -> Iterator[Record]:
+        data = self.__map
+        offset = self.__offset
+        while offset + RECORD.size <= len(data):
+            direction, timestamp, length = RECORD.unpack_from(data, offset)
+            offset += RECORD.size
+            if offset + length > len(data):
+                # Truncated last record, for instance after a crash.
+                return
+            yield Record(direction, timestamp, data[offset : offset + length])
+            offset += length
+
+    def close(self):
+        self.__map.close()
+
+    def __enter__(self) -> "RecordingReader":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class ReplaySerial:
+    """
+    Serial port replaying a recording: each write is checked against the
+    recorded transmitted bytes, and the bytes recorded after it are then
+    returned by the reads. Give it to :class:`pypdm.Link` in place of a
+    serial port path:
+
+    .. code-block:: python
+
+        pdm = PDM(1, Link(ReplaySerial('campaign.pdmrec')))
+
+    The recording is memory-mapped and read as the replay goes. When it is
+    exhausted, reads return nothing, as a serial port whose timeout expired.
+    """
+
+    def __init__(self, path: str, timing: bool = False, strict: bool = True):
+        """
+        :param path: Recording file path.
+        :param timing: If True, received bytes are available with the same
+            delay after each write as when recorded. Otherwise, they are
+            available immediately.
+        :param strict: If True, a :class:`ReplayMismatch` is raised when the
+            written bytes differ from the recorded ones. Otherwise, recorded
+            responses are returned whatever was written.
+        """
+        self.__reader = RecordingReader(path)
+        self.port = self.__reader.port
+        self.__records = iter(self.__reader)
+        # Next record to be replayed, and its index.
+        self.__next: Optional[Record] = next(self.__records, None)
+        self.__index = 0
+        self.timing = timing
+        self.strict = strict
+        self.timeout: Optional[float] = None
+        self.write_timeout: Optional[float] = None
+        self.__rx = bytearray()
+        # Correspondence between recording time and replay time.
+        self.__origin = 0.0
+
+    def __advance(self):
+        """Move to the next record."""
+        self.__next = next(self.__records, None)
+        self.__index += 1
+
+    @property
+    def exhausted(self) -> bool:
+        """True once all the records have been replayed."""
+        return self.__next is None
+
+    def write(self, data: bytes) -> int:
+        data = bytes(data)
+        # Bytes received before this write are kept unread, as in a serial
+        # port buffer. Only reset_input_buffer() discards them.
+        while self.__next is not None and self.__next.direction == RX:
+            self.__rx += self.__next.data
+            self.__advance()
+        record = self.__next
+        if record is None:
+            return len(data)
+        if self.strict and record.data != data:
+            raise ReplayMismatch(self.__index, bytes(record.data), data)
+        self.__advance()
+        self.__origin = time.perf_counter() - record.time
+        return len(data)
+
+    def __release(self, wait: bool) -> bool:
+        """
+        Move the next received record to the receive buffer, if due.
+
+        :param wait: If True, wait for the record to be due, within the read
+            timeout.
+        :return: True if a record has been released.
+        """
+        record = self.__next
+        if record is None or record.direction != RX:
+            return False
+        if self.timing:
+            delay = self.__origin + record.time - time.perf_counter()
+            if delay > 0:
+                if not wait or (self.timeout is not None and delay > self.timeout):
+                    return False
+                time.sleep(delay)
+        self.__rx += record.data
+        self.__advance()
+        return True
+
+    @property
+    def in_waiting(self) -> int:
+        while self.__release(False):
+            pass
+        return len(self.__rx)
+
+    def read(self, n: int) -> bytes:
+        while len(self.__rx) < n and self.__release(True):
+            pass
+        data = bytes(self.__rx[:n])
+        del self.__rx[:n]
+        return data
+
+    def close(self):
+        """Close the recording file."""
+        self.__next = None
+        self.__records = iter(())
+        self.__reader.close()
+
+    def reset_input_buffer(self):
+        self.__rx.clear()
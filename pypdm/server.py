@@ -0,0 +1,732 @@
+# This file is part of PyPDM
+#
+# PyPDM is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+#
+# Copyright 2018-2019 Olivier Hériveaux, Ledger SAS
+
+import argparse
+from collections import OrderedDict, deque
+import math
+import os
+import select
+import socket
+import stat
+import struct
+import tempfile
+import threading
+import time
+from typing import Any, Callable, Deque, Dict, List, Optional, Sequence, Tuple, Union
+from urllib.parse import parse_qs, urlsplit
+from .pdm import (
+    Link,
+    ChecksumError,
+    ConnectionFailure,
+    Command,
+    Instruction,
+    ResponseTimeout,
+    Status,
+    StatusError,
+    INSTRUCTION_IDS,
+    checksum,
+)
+from .transport import Transport
+
+# Message header between clients and the server: kind and payload length.
+HEADER = struct.Struct(">BI")
+
+# Message kinds.
+# Client: name of the requested link, empty for the first one. Server: name of
+# the link.
+HELLO = 0
+# Client: sequence number and command frames. Server: sequence number of the
+# request and one response frame per command frame, in order.
+FRAMES = 1
+# Client: telemetry request. Server: telemetry sample.
+TELEMETRY = 2
+# Server: error message, the connection is then closed.
+ERROR = 3
+
+# Sequence number of the FRAMES messages, chosen by the client.
+SEQUENCE = struct.Struct(">Q")
+
+# Telemetry request: device address and maximum age of a shared sample, in
+# seconds.
+TELEMETRY_REQUEST = struct.Struct(">Bd")
+# Telemetry sample: device address, age in seconds, temperature, interlock
+# status and mode. Failed readings are NaN.
+TELEMETRY_SAMPLE = struct.Struct(">Bdddd")
+
+# Fields of the telemetry samples.
+TELEMETRY_FIELDS = ("temperature", "interlock_status", "mode")
+
+# Default path of the server socket.
+DEFAULT_SOCKET = os.path.join(tempfile.gettempdir(), "pypdm.sock")
+
+# Default response timeout of the clients, in seconds. Longer than the default
+# timeout of the served links, as requests may also wait for the requests of
+# other clients.
+REMOTE_TIMEOUT = 5.0
+
+# Called with the results of the frames of a request.
+ResultsCallback = Callable[[List[Union[bytes, Exception]]], None]
+
+
+def _response_frame(result: Union[bytes, Exception]) -> bytes:
+    """
+    Encode the response frame forwarded to a client. Errors which are not
+    device status errors are reported with a device status: TIMEOUT when no
+    valid response was received, CHECKSUM_ERROR when the response was
+    corrupted.
+
+    :param result: Response data as returned by :meth:`Link.transfer`, or the
+        exception raised when receiving it.
+    :return: Response frame.
+    """
+    if isinstance(result, StatusError):
+        body = bytes([result.status])
+    elif isinstance(result, ChecksumError):
+        body = bytes([Status.CHECKSUM_ERROR.value])
+    elif isinstance(result, Exception):
+        body = bytes([Status.TIMEOUT.value])
+    else:
+        body = result
+    frame = bytes([len(body) + 2]) + body
+    return frame + bytes([checksum(frame)])
+
+
+class _Client:
+    """Connection of a client process, on the server side."""
+
+    def __init__(self, connection: socket.socket):
+        self.connection = connection
+        self.__lock = threading.Lock()
+
+    def send(self, kind: int, payload: bytes = bytes()):
+        """
+        Send a message. Ignored if the client is gone.
+
+        :param kind: Message kind.
+        :param payload: Message payload.
+        """
+        with self.__lock:
+            try:
+                self.connection.sendall(HEADER.pack(kind, len(payload)) + payload)
+            except OSError:
+                pass
+
+    def close(self):
+        try:
+            self.connection.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.connection.close()
+
+
+class _ServedLink:
+    """
+    A link owned by the server. Requests of the clients are queued per
+    client, and a dispatcher thread transmits them, taking the clients in
+    turn.
+    """
+
+    def __init__(self, link: Link):
+        self.link = link
+        self.__condition = threading.Condition()
+        self.__queues: "OrderedDict[Any, Deque[Tuple[bytes, int, ResultsCallback]]]" = (
+            OrderedDict()
+        )
+        self.__closed = False
+        # Last telemetry sample of each device, with its time.monotonic time.
+        self.__telemetry: Dict[int, Tuple[float, Tuple[float, ...]]] = {}
+        # Replies waiting for the telemetry reading in progress, per device.
+        self.__waiting: Dict[int, List[Callable[[float, Tuple[float, ...]], None]]] = {}
+        self.__thread = threading.Thread(
+            target=self.__run, name="pypdm-server-link", daemon=True
+        )
+        self.__thread.start()
+
+    def submit(self, owner: Any, frames: bytes, count: int, callback: ResultsCallback):
+        """
+        Queue command frames.
+
+        :param owner: Requester, for fairness.
+        :param frames: Encoded command frames.
+        :param count: Number of frames.
+        :param callback: Called from the dispatcher thread with the results.
+        """
+        with self.__condition:
+            if self.__closed:
+                raise RuntimeError("Link is closed.")
+            self.__queues.setdefault(owner, deque()).append((frames, count, callback))
+            self.__condition.notify()
+
+    def __run(self):
+        """Dispatcher thread loop."""
+        while True:
+            with self.__condition:
+                while not self.__queues and not self.__closed:
+                    self.__condition.wait()
+                if not self.__queues:
+                    return
+                # One request of each requester in turn.
+                owner, queue = next(iter(self.__queues.items()))
+                frames, count, callback = queue.popleft()
+                if queue:
+                    self.__queues.move_to_end(owner)
+                else:
+                    del self.__queues[owner]
+            # Requests are never merged: a lost response, for instance of a
+            # probe of an absent device, only fails the following frames of
+            # the same request.
+            try:
+                results = self.link.transfer(frames, count)
+            except Exception as e:
+                results = [e] * count
+            callback(results)
+
+    def telemetry(
+        self,
+        address: int,
+        max_age: float,
+        reply: Callable[[float, Tuple[float, ...]], None],
+    ):
+        """
+        Get a telemetry sample of a device. The last sample is shared by all
+        the clients while younger than `max_age`, and concurrent requests
+        share the same reading.
+
+        :param address: Device address.
+        :param max_age: Maximum age of the sample, in seconds.
+        :param reply: Called with the age of the sample and its values.
+        """
+        with self.__condition:
+            cached = self.__telemetry.get(address)
+            if cached is not None:
+                age = time.monotonic() - cached[0]
+                if age <= max_age:
+                    reply(age, cached[1])
+                    return
+            waiting = self.__waiting.get(address)
+            if waiting is not None:
+                waiting.append(reply)
+                return
+            self.__waiting[address] = [reply]
+        frames = bytearray()
+        for instruction in (Instruction.TEMPERATURE, Instruction.INTERLOCK_STATUS):
+            frames += self.link.encode(
+                address, Command.READ_INSTRUCTION, INSTRUCTION_IDS[instruction]
+            )
+        frames += self.link.encode(address, Command.READ_CW_PULSE)
+        try:
+            self.submit(
+                ("telemetry", address),
+                bytes(frames),
+                len(TELEMETRY_FIELDS),
+                lambda results: self.__sampled(address, results),
+            )
+        except BaseException:
+            # Let the next request read the device.
+            with self.__condition:
+                del self.__waiting[address]
+            raise
+
+    def __sampled(self, address: int, results: List[Union[bytes, Exception]]):
+        """Store a telemetry sample and reply to the waiting clients."""
+        values: List[float] = []
+        for name, res in zip(TELEMETRY_FIELDS, results):
+            if isinstance(res, Exception) or len(res) < 2:
+                values.append(math.nan)
+            elif name == "temperature":
+                values.append(struct.unpack_from(">f", res, 1)[0])
+            else:
+                values.append(float(res[1]))
+        sample = tuple(values)
+        with self.__condition:
+            self.__telemetry[address] = (time.monotonic(), sample)
+            waiting = self.__waiting.pop(address)
+        for reply in waiting:
+            reply(0.0, sample)
+
+    def close(self):
+        """
+        Transmit pending requests, stop the dispatcher, switch off the lasers
+        of the devices used by the clients and close the link.
+        """
+        with self.__condition:
+            self.__closed = True
+            self.__condition.notify()
+        self.__thread.join()
+        try:
+            self.link.emergency_off()
+        finally:
+            self.link.close()
+
+
+class PDMServer:
+    """
+    Daemon owning one or more links, and serving them to several local
+    client processes over a Unix domain socket. Clients connect with
+    :class:`RemoteLink`, which can be given to :class:`pypdm.PDM` as any
+    link:
+
+    .. code-block:: python
+
+        pdm = PDM(1, RemoteLink('/tmp/pypdm.sock'))
+
+    Command frames of the clients are forwarded as they are. The server
+    transmits the frames of each request in a single write, taking the
+    clients in turn. Clients may send several requests without waiting for
+    the responses. Telemetry samples are shared between clients, see
+    :meth:`RemoteLink.telemetry`.
+
+    The server can be started from the command line::
+
+        python -m pypdm.server /dev/ttyUSB0 --socket /tmp/pypdm.sock
+    """
+
+    def __init__(
+        self,
+        path: str,
+        ports: Sequence[Union[str, Link]],
+        **kwargs: Any,
+    ):
+        """
+        :param path: Path of the Unix domain socket.
+        :param ports: Served serial ports, transport URLs or links. Clients
+            select them by port name.
+        :param kwargs: :class:`pypdm.Link` constructor arguments, for ports
+            given by name.
+        """
+        if not ports:
+            raise ValueError("No port to serve.")
+        self.path = path
+        self.__ports = list(ports)
+        self.__kwargs = kwargs
+        self.__links: "OrderedDict[str, _ServedLink]" = OrderedDict()
+        self.__clients: List[_Client] = []
+        self.__lock = threading.Lock()
+        self.__listener: Optional[socket.socket] = None
+        self.__stop = threading.Event()
+        self.__thread: Optional[threading.Thread] = None
+
+    @property
+    def ports(self) -> List[str]:
+        """Names of the served ports, once started."""
+        return list(self.__links)
+
+    def start(self):
+        """Open the links, and start accepting clients."""
+        if self.__thread is not None:
+            raise RuntimeError("Server already started.")
+        try:
+            for port in self.__ports:
+                link = port if isinstance(port, Link) else Link(port, **self.__kwargs)
+                self.__links[link.port] = _ServedLink(link)
+            self.__remove_stale_socket()
+            self.__listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.__listener.bind(self.path)
+            self.__listener.listen()
+        except BaseException:
+            self.__close_links()
+            raise
+        self.__stop.clear()
+        self.__thread = threading.Thread(
+            target=self.__accept, name="pypdm-server", daemon=True
+        )
+        self.__thread.start()
+
+    def __remove_stale_socket(self):
+        """
+        Remove the socket file left by a server which did not stop cleanly.
+        Raise an error if another server is listening on it.
+        """
+        try:
+            mode = os.stat(self.path).st_mode
+        except FileNotFoundError:
+            return
+        if not stat.S_ISSOCK(mode):
+            raise FileExistsError(f"{self.path} exists and is not a socket.")
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(self.path)
+        except ConnectionRefusedError:
+            os.unlink(self.path)
+        else:
+            raise OSError(f"A server is already listening on {self.path}.")
+        finally:
+            probe.close()
+
+    def __accept(self):
+        """Accepting thread loop."""
+        listener = self.__listener
+        assert listener is not None
+        while not self.__stop.is_set():
+            readable, _, _ = select.select([listener], [], [], 0.05)
+            if not readable:
+                continue
+            try:
+                connection, _ = listener.accept()
+            except OSError:
+                continue
+            client = _Client(connection)
+            with self.__lock:
+                self.__clients.append(client)
+            threading.Thread(
+                target=self.__serve, args=(client,), name="pypdm-client", daemon=True
+            ).start()
+
+    def __serve(self, client: _Client):
+        """Read and handle the messages of a client, until disconnected."""
+        link: Optional[_ServedLink] = None
+        buffer = bytearray()
+        try:
+            while True:
+                data = client.connection.recv(65536)
+                if not data:
+                    return
+                buffer += data
+                offset = 0
+                while len(buffer) - offset >= HEADER.size:
+                    kind, length = HEADER.unpack_from(buffer, offset)
+                    end = offset + HEADER.size + length
+                    if end > len(buffer):
+                        break
+                    payload = bytes(buffer[offset + HEADER.size : end])
+                    offset = end
+                    if kind == HELLO:
+                        if payload:
+                            link = self.__links.get(payload.decode())
+                        else:
+                            link = next(iter(self.__links.values()))
+                        if link is None:
+                            client.send(ERROR, b"Unknown port " + payload)
+                            return
+                        client.send(HELLO, link.link.port.encode())
+                    elif link is None:
+                        client.send(ERROR, b"Expected HELLO message")
+                        return
+                    elif kind == FRAMES:
+                        self.__frames(client, link, payload)
+                    elif kind == TELEMETRY:
+                        self.__telemetry(client, link, payload)
+                    else:
+                        client.send(ERROR, f"Unknown message {kind}".encode())
+                        return
+                del buffer[:offset]
+        except (OSError, RuntimeError, ValueError, struct.error) as e:
+            client.send(ERROR, str(e).encode())
+        finally:
+            client.close()
+            with self.__lock:
+                if client in self.__clients:
+                    self.__clients.remove(client)
+
+    def __frames(self, client: _Client, link: _ServedLink, payload: bytes):
+        """Queue the command frames of a client."""
+        sequence = payload[: SEQUENCE.size]
+        frames = payload[SEQUENCE.size :]
+        if len(sequence) != SEQUENCE.size:
+            raise ValueError("Missing sequence number")
+        addresses: List[int] = []
+        offset = 0
+        while offset < len(frames):
+            length = frames[offset]
+            if length < 4 or offset + length > len(frames):
+                raise ValueError("Invalid frame")
+            addresses.append(frames[offset + 1])
+            offset += length
+
+        def forward(results: List[Union[bytes, Exception]]):
+            for address, result in zip(addresses, results):
+                if not isinstance(result, Exception):
+                    # Present device, switched off when the server stops.
+                    link.link.addresses.add(address)
+            client.send(
+                FRAMES, sequence + b"".join(_response_frame(r) for r in results)
+            )
+
+        if addresses:
+            link.submit(client, frames, len(addresses), forward)
+
+    def __telemetry(self, client: _Client, link: _ServedLink, payload: bytes):
+        """Answer a telemetry request of a client."""
+        address, max_age = TELEMETRY_REQUEST.unpack(payload)
+
+        def reply(age: float, sample: Tuple[float, ...]):
+            client.send(TELEMETRY, TELEMETRY_SAMPLE.pack(address, age, *sample))
+
+        link.telemetry(address, max_age, reply)
+
+    def __close_links(self):
+        for link in self.__links.values():
+            link.close()
+        self.__links.clear()
+
+    def stop(self):
+        """Disconnect the clients, close the links and remove the socket."""
+        if self.__thread is None:
+            return
+        self.__stop.set()
+        self.__thread.join()
+        self.__thread = None
+        assert self.__listener is not None
+        self.__listener.close()
+        self.__listener = None
+        with self.__lock:
+            clients = list(self.__clients)
+        for client in clients:
+            client.close()
+        self.__close_links()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+    def __enter__(self) -> "PDMServer":
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+
+class RemoteTransport(Transport):
+    """
+    Transport to a link served by a :class:`PDMServer`. Written command
+    frames are forwarded by the server, which sends back the response frames.
+    Errors of the server link are reported as device status errors: TIMEOUT
+    when no valid response was received, CHECKSUM_ERROR when it was
+    corrupted. Each write is numbered, so that the late responses of the
+    writes abandoned by :meth:`reset_input_buffer` are discarded.
+
+    URL: ``pdmd:///tmp/pypdm.sock?port=/dev/ttyUSB0``. Without ``port``,
+    the first link of the server is used.
+    """
+
+    def __init__(
+        self,
+        path: str = DEFAULT_SOCKET,
+        port: Optional[str] = None,
+        timeout: Optional[float] = None,
+        write_timeout: Optional[float] = None,
+    ):
+        """
+        :param path: Path of the server socket.
+        :param port: Name of the served port. None for the first one.
+        :param timeout: Read timeout in seconds. None to wait forever.
+        :param write_timeout: Write timeout in seconds. None to wait forever.
+        """
+        super().__init__(timeout, write_timeout)
+        # Sequence number of the last FRAMES request, and of the oldest one
+        # whose response is still expected.
+        self.__sequence = 0
+        self.__expected = 1
+        # Bytes received from the server, not parsed yet.
+        self.__input = bytearray()
+        # Response frames.
+        self.__rx = bytearray()
+        # Telemetry samples, by device address.
+        self.__samples: Dict[int, Tuple[float, ...]] = {}
+        self.__hello: Optional[bytes] = None
+        self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            self.socket.settimeout(5.0)
+            self.socket.connect(path)
+            self.__send(HELLO, (port or "").encode())
+            while self.__hello is None:
+                if not self.__pump(5.0):
+                    raise ConnectionRefusedError("No answer from the PDM server.")
+        except BaseException:
+            self.socket.close()
+            raise
+        self.port = self.__hello.decode()
+
+    def __send(self, kind: int, payload: bytes):
+        self.socket.settimeout(self.write_timeout)
+        self.socket.sendall(HEADER.pack(kind, len(payload)) + payload)
+
+    def __pump(self, timeout: Optional[float]) -> bool:
+        """
+        Receive messages from the server.
+
+        :param timeout: Maximum time to wait, in seconds.
+        :return: False if nothing was received before the timeout.
+        """
+        self.socket.settimeout(timeout)
+        try:
+            data = self.socket.recv(65536)
+        except socket.timeout:
+            return False
+        if not data:
+            raise ConnectionResetError("Connection closed by the PDM server.")
+        self.__input += data
+        offset = 0
+        while len(self.__input) - offset >= HEADER.size:
+            kind, length = HEADER.unpack_from(self.__input, offset)
+            end = offset + HEADER.size + length
+            if end > len(self.__input):
+                break
+            payload = bytes(self.__input[offset + HEADER.size : end])
+            offset = end
+            if kind == FRAMES:
+                # Responses of abandoned requests would be taken for the
+                # responses of the following ones.
+                if SEQUENCE.unpack_from(payload)[0] >= self.__expected:
+                    self.__rx += payload[SEQUENCE.size :]
+            elif kind == TELEMETRY:
+                address, *sample = TELEMETRY_SAMPLE.unpack(payload)
+                self.__samples[address] = tuple(sample)
+            elif kind == HELLO:
+                self.__hello = payload
+            elif kind == ERROR:
+                raise ConnectionAbortedError(payload.decode(errors="replace"))
+        del self.__input[:offset]
+        return True
+
+    def write(self, data: bytes) -> Optional[int]:
+        self.__sequence += 1
+        self.__send(FRAMES, SEQUENCE.pack(self.__sequence) + bytes(data))
+        return len(data)
+
+    def readinto(self, buffer: memoryview) -> int:
+        deadline = None if self.timeout is None else time.monotonic() + self.timeout
+        while not self.__rx:
+            # Received messages may be telemetry samples or discarded
+            # responses.
+            remaining = None
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return 0
+            if not self.__pump(remaining):
+                return 0
+        n = min(len(buffer), len(self.__rx))
+        buffer[:n] = self.__rx[:n]
+        del self.__rx[:n]
+        return n
+
+    def read(self, n: int) -> bytes:
+        buffer = bytearray(n)
+        received = self.readinto(memoryview(buffer))
+        return bytes(buffer[:received])
+
+    @property
+    def in_waiting(self) -> int:
+        return len(self.__rx)
+
+    def reset_input_buffer(self):
+        """
+        Discard the received response frames, and the responses of the
+        requests already transmitted, which may still be in progress on the
+        server.
+        """
+        self.__rx.clear()
+        self.__expected = self.__sequence + 1
+
+    def telemetry(self, address: int, max_age: float = 0.1) -> Dict[str, float]:
+        """
+        See :meth:`RemoteLink.telemetry`.
+        """
+        self.__samples.pop(address, None)
+        self.__send(TELEMETRY, TELEMETRY_REQUEST.pack(address, max_age))
+        deadline = None if self.timeout is None else time.monotonic() + self.timeout
+        while address not in self.__samples:
+            remaining = None
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise ResponseTimeout()
+            if not self.__pump(remaining):
+                raise ResponseTimeout()
+        age, *values = self.__samples.pop(address)
+        result = {"age": age}
+        result.update(zip(TELEMETRY_FIELDS, values))
+        return result
+
+    def close(self):
+        self.socket.close()
+
+
+def open_remote(url: str, timeout: Optional[float], write_timeout: Optional[float]):
+    """
+    Transport factory of the ``pdmd://`` URL scheme. See
+    :class:`RemoteTransport`.
+    """
+    parts = urlsplit(url)
+    port = parse_qs(parts.query).get("port", [None])[-1]
+    return RemoteTransport(parts.path or DEFAULT_SOCKET, port, timeout, write_timeout)
+
+
+class RemoteLink(Link):
+    """
+    A :class:`pypdm.Link` to a link served by a :class:`PDMServer`, shared
+    with other processes. See :class:`RemoteTransport`.
+    """
+
+    def __init__(
+        self, path: str = DEFAULT_SOCKET, port: Optional[str] = None, **kwargs: Any
+    ):
+        """
+        :param path: Path of the server socket.
+        :param port: Name of the served port. None for the first one.
+        :param kwargs: Other :class:`pypdm.Link` constructor arguments. The
+            default timeout is :data:`REMOTE_TIMEOUT`.
+        """
+        timeout = kwargs.setdefault("timeout", REMOTE_TIMEOUT)
+        try:
+            self.remote = RemoteTransport(path, port, timeout, timeout)
+        except OSError as e:
+            raise ConnectionFailure() from e
+        super().__init__(self.remote, **kwargs)
+
+    def telemetry(self, address: int, max_age: float = 0.1) -> Dict[str, float]:
+        """
+        Read the telemetry of a device: ``temperature``, ``interlock_status``
+        (0: closed, 1: open) and ``mode`` (0: pulsed, 1: continuous). Failed
+        readings are NaN.
+
+        The sample is shared by all the clients of the server: if another
+        client read the device less than `max_age` seconds ago, that sample
+        is returned without any transmission.
+
+        :param address: Device address.
+        :param max_age: Maximum age of the sample, in seconds.
+        :return: Values by field name, and ``age`` of the sample in seconds.
+        """
+        return self.remote.telemetry(address, max_age)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(
+        description="Share PDM links between local processes."
+    )
+    parser.add_argument(
+        "ports", nargs="+", help="Serial ports or transport URLs to be served."
+    )
+    parser.add_argument("--socket", default=DEFAULT_SOCKET, help="Socket path.")
+    parser.add_argument("--timeout", type=float, default=1.0, help="In seconds.")
+    args = parser.parse_args(argv)
+    # Frames are forwarded without retries: clients retry their idempotent
+    # commands, as failures are reported with a retryable status.
+    server = PDMServer(args.socket, args.ports, timeout=args.timeout)
+    with server:
+        print(args.socket, flush=True)
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
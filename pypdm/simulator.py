@@ -0,0 +1,473 @@
+# This file is part of PyPDM
+#
+# PyPDM is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+#
+# Copyright 2018-2019 Olivier Hériveaux, Ledger SAS
+
+import argparse
+from collections import deque
+import os
+import random
+import select
+import struct
+import threading
+import time
+from typing import Any, Deque, Dict, Iterable, List, Optional, Tuple
+from .pdm import (
+    Command,
+    ControlMode,
+    Instruction,
+    InterlockStatus,
+    Mode,
+    Status,
+    INSTRUCTION_FORMATS,
+    INSTRUCTIONS_BY_ID,
+    PROTOCOL_3_7_INSTRUCTIONS,
+    checksum,
+)
+
+# Instructions which can be read but not written.
+READ_ONLY_INSTRUCTIONS = frozenset(
+    {
+        Instruction.TEMPERATURE,
+        Instruction.MAXIMUM_MEAN_CURRENT,
+        Instruction.MAXIMUM_PULSE_CURRENT,
+        Instruction.INTERLOCK_STATUS,
+    }
+)
+
+# Supported protocol versions.
+VERSIONS = ("3.4", "3.5", "3.6", "3.7")
+
+
+def encode_response(status: Status, data: bytes = bytes()) -> bytes:
+    """
+    Build a response frame.
+
+    :param status: Response status.
+    :param data: Response data bytes.
+    :return: Frame bytes.
+    """
+    frame = bytes([3 + len(data), status.value]) + data
+    return frame + bytes([checksum(frame)])
+
+
+class SimulatedPDM:
+    """
+    State machine of a single PDM device.
+
+    Each instruction has three register banks, holding raw values as sent on
+    the wire: :attr:`volatile` registers are changed by instruction writes and
+    returned by instruction reads, :attr:`applied` registers are the ones in
+    effect and are copied from the volatile registers by
+    ``APPLY_ALL_INSTRUCTIONS``, and :attr:`saved` registers are copied from
+    the applied ones by ``SAVE_ALL_INSTRUCTIONS`` and restored by
+    :meth:`power_cycle`. Measurements (temperature and interlock status) are
+    the same in all the banks.
+    """
+
+    def __init__(
+        self,
+        address: int,
+        version: str = "3.7",
+        maximum_current: float = 2500.0,
+        maximum_mean_current: float = 500.0,
+    ):
+        """
+        :param address: Device address, between 1 and 255.
+        :param version: Protocol version, from 3.4 to 3.7. Instructions of
+            protocol 3.7 are rejected by older versions.
+        :param maximum_current: Maximum pulse current, in mA.
+        :param maximum_mean_current: Maximum mean current, in mA.
+        """
+        if version not in VERSIONS:
+            raise ValueError(f"Unsupported protocol version {version}")
+        if not 1 <= address <= 255:
+            raise ValueError("Invalid address.")
+        self.address = address
+        self.version = version
+        self.__minor = int(version.split(".")[1])
+        # Position of the hardware continuous/pulsed switch.
+        self.hardware_mode = Mode.PULSED
+        # Value returned by READ_ERROR_CODE.
+        self.error_code = 0
+        self.saved: Dict[Instruction, bytes] = {
+            instruction: struct.pack(fmt, 0)
+            for instruction, fmt in INSTRUCTION_FORMATS.items()
+            if self.supports(instruction)
+        }
+        self.saved[Instruction.MAXIMUM_PULSE_CURRENT] = struct.pack(
+            ">f", maximum_current
+        )
+        self.saved[Instruction.MAXIMUM_MEAN_CURRENT] = struct.pack(
+            ">f", maximum_mean_current
+        )
+        self.saved[Instruction.TEMPERATURE] = struct.pack(">f", 25.0)
+        self.volatile: Dict[Instruction, bytes] = {}
+        self.applied: Dict[Instruction, bytes] = {}
+        self.power_cycle()
+
+    def supports(self, instruction: Instruction) -> bool:
+        """
+        :return: True if the protocol version of the device has the
+            instruction.
+        """
+        return self.__minor >= 7 or instruction not in PROTOCOL_3_7_INSTRUCTIONS
+
+    def power_cycle(self):
+        """Restart the device: all registers are loaded from saved ones."""
+        self.volatile = dict(self.saved)
+        self.applied = dict(self.saved)
+
+    def value(self, instruction: Instruction, applied: bool = True) -> Any:
+        """
+        :param instruction: Register instruction.
+        :param applied: If True, the value of the applied register, otherwise
+            the value of the volatile register.
+        :return: Decoded register value.
+        """
+        bank = self.applied if applied else self.volatile
+        return struct.unpack(INSTRUCTION_FORMATS[instruction], bank[instruction])[0]
+
+    def __set_measurement(self, instruction: Instruction, value: Any):
+        raw = struct.pack(INSTRUCTION_FORMATS[instruction], value)
+        for bank in (self.saved, self.volatile, self.applied):
+            bank[instruction] = raw
+
+    @property
+    def temperature(self) -> float:
+        """Measured temperature, in degrees."""
+        return self.value(Instruction.TEMPERATURE)
+
+    @temperature.setter
+    def temperature(self, value: float):
+        self.__set_measurement(Instruction.TEMPERATURE, value)
+
+    @property
+    def interlock_status(self) -> InterlockStatus:
+        """Interlock status."""
+        return InterlockStatus(self.value(Instruction.INTERLOCK_STATUS))
+
+    @interlock_status.setter
+    def interlock_status(self, value: InterlockStatus):
+        self.__set_measurement(Instruction.INTERLOCK_STATUS, value.value)
+
+    @property
+    def mode(self) -> Mode:
+        """Continuous or pulsed mode in effect."""
+        if (
+            self.supports(Instruction.CONTROL_MODE_SELECTION)
+            and self.value(Instruction.CONTROL_MODE_SELECTION)
+            == ControlMode.SOFTWARE.value
+        ):
+            return Mode(self.value(Instruction.SOFTWARE_CONTROL_MODE))
+        return self.hardware_mode
+
+    @property
+    def emitting(self) -> bool:
+        """True if the laser is activated and the interlock is closed."""
+        return (
+            self.value(Instruction.LASER_ACTIVATION) != 0
+            and self.interlock_status == InterlockStatus.CLOSED
+        )
+
+    def handle(self, command_id: int, data: bytes) -> bytes:
+        """
+        Execute a command.
+
+        :param command_id: Command identifier.
+        :param data: Command data bytes.
+        :return: Response frame.
+        """
+        try:
+            command = Command(command_id)
+        except ValueError:
+            return encode_response(Status.UNKNOWN_COMMAND)
+        if command in (Command.READ_INSTRUCTION, Command.WRITE_INSTRUCTION):
+            if len(data) < 2:
+                return encode_response(Status.BAD_LENGTH)
+            instruction = INSTRUCTIONS_BY_ID.get(int.from_bytes(data[:2], "big"))
+            if instruction is None or not self.supports(instruction):
+                return encode_response(Status.QUERY_ERROR)
+            if command == Command.READ_INSTRUCTION:
+                if len(data) != 2:
+                    return encode_response(Status.BAD_LENGTH)
+                return encode_response(Status.OK, self.volatile[instruction])
+            if instruction in READ_ONLY_INSTRUCTIONS:
+                return encode_response(Status.QUERY_ERROR)
+            value = bytes(data[2:])
+            if len(value) != struct.calcsize(INSTRUCTION_FORMATS[instruction]):
+                return encode_response(Status.BAD_LENGTH)
+            self.volatile[instruction] = value
+            return encode_response(Status.OK)
+        if data:
+            return encode_response(Status.BAD_LENGTH)
+        if command == Command.READ_ADDRESS:
+            return encode_response(Status.OK, bytes([self.address]))
+        if command == Command.READ_PROTOCOL_VERSION:
+            major, minor = self.version.split(".")
+            return encode_response(Status.OK, bytes([int(major), int(minor)]))
+        if command == Command.READ_ERROR_CODE:
+            return encode_response(Status.OK, self.error_code.to_bytes(2, "big"))
+        if command == Command.APPLY_ALL_INSTRUCTIONS:
+            self.applied = dict(self.volatile)
+            return encode_response(Status.OK)
+        if command == Command.SAVE_ALL_INSTRUCTIONS:
+            self.saved = dict(self.applied)
+            return encode_response(Status.OK)
+        if command == Command.READ_MEASURE:
+            # Approximation: the diode current, in mA.
+            current = 0.0
+            if self.emitting:
+                current = (
+                    self.value(Instruction.CURRENT)
+                    * self.value(Instruction.MAXIMUM_PULSE_CURRENT)
+                    / 100
+                )
+            return encode_response(Status.OK, struct.pack(">f", current))
+        assert command == Command.READ_CW_PULSE
+        return encode_response(Status.OK, bytes([self.mode.value]))
+
+
+class SimulatedBus:
+    """
+    Daisy-chained :class:`SimulatedPDM` devices sharing a serial line.
+
+    Frames addressed to a device which is not on the bus are not answered,
+    like on real hardware, and the host times out. Address 0 is answered by
+    the first device of the chain. Corruption and loss of responses can be
+    injected to exercise error paths.
+    """
+
+    def __init__(
+        self,
+        devices: Iterable[SimulatedPDM] = (),
+        latency: float = 0.0,
+        corruption: float = 0.0,
+        loss: float = 0.0,
+        seed: Optional[int] = None,
+    ):
+        """
+        :param devices: Devices on the bus.
+        :param latency: Response delay, in seconds.
+        :param corruption: Probability of a response having one byte altered.
+        :param loss: Probability of a response not being transmitted.
+        :param seed: Seed of the random generator used for error injection.
+        """
+        self.devices: Dict[int, SimulatedPDM] = {}
+        for device in devices:
+            self.add(device)
+        self.latency = latency
+        self.corruption = corruption
+        self.loss = loss
+        self.random = random.Random(seed)
+        # Number of received frames.
+        self.frames = 0
+        self.__buffer = bytearray()
+
+    def add(self, device: SimulatedPDM):
+        """
+        Add a device at the end of the chain.
+
+        :param device: New device. Its address must not be used yet.
+        """
+        if device.address in self.devices:
+            raise ValueError(f"Address {device.address} already used.")
+        self.devices[device.address] = device
+
+    def __getitem__(self, address: int) -> SimulatedPDM:
+        return self.devices[address]
+
+    def handle(self, frame: bytes) -> Optional[bytes]:
+        """
+        Process a single command frame.
+
+        :param frame: Complete frame, with length and checksum bytes.
+        :return: Response frame, or None if no device answers.
+        """
+        self.frames += 1
+        address = frame[1]
+        if address == 0 and self.devices:
+            device: Optional[SimulatedPDM] = next(iter(self.devices.values()))
+        else:
+            device = self.devices.get(address)
+        if device is None:
+            return None
+        if checksum(frame[:-1]) != frame[-1]:
+            response = encode_response(Status.CHECKSUM_ERROR)
+        else:
+            response = device.handle(frame[2], bytes(frame[3:-1]))
+        if self.loss and self.random.random() < self.loss:
+            return None
+        if self.corruption and self.random.random() < self.corruption:
+            altered = bytearray(response)
+            altered[self.random.randrange(len(altered))] ^= 1 << self.random.randrange(
+                8
+            )
+            response = bytes(altered)
+        return response
+
+    def receive(self, data: bytes) -> List[bytes]:
+        """
+        Process received bytes. Incomplete frames are kept until the next
+        call.
+
+        :param data: Bytes received from the host.
+        :return: Response frames to be transmitted.
+        """
+        buffer = self.__buffer
+        buffer += data
+        responses = []
+        while buffer:
+            length = buffer[0]
+            if length < 4:
+                # Not a command frame, resynchronize on next byte.
+                del buffer[0]
+                continue
+            if len(buffer) < length:
+                break
+            response = self.handle(bytes(buffer[:length]))
+            del buffer[:length]
+            if response is not None:
+                responses.append(response)
+        return responses
+
+
+class PtySimulator:
+    """
+    Serves a :class:`SimulatedBus` on a pseudo-terminal, from a background
+    thread. The terminal path can be opened by :class:`pypdm.Link` as any
+    serial port. Only available on POSIX systems.
+
+    .. code-block:: python
+
+        bus = SimulatedBus([SimulatedPDM(1), SimulatedPDM(2)])
+        with PtySimulator(bus) as simulator:
+            pdm = PDM(1, simulator.path)
+
+    A simulator can also be started from the command line, which prints the
+    terminal path::
+
+        python -m pypdm.simulator 1 2 --version 3.7 --latency 0.001
+    """
+
+    def __init__(self, bus: SimulatedBus):
+        """
+        :param bus: Served devices.
+        """
+        self.bus = bus
+        self.__master: Optional[int] = None
+        self.__slave: Optional[int] = None
+        self.__path: Optional[str] = None
+        self.__stop = threading.Event()
+        self.__thread: Optional[threading.Thread] = None
+
+    @property
+    def path(self) -> str:
+        """Path of the pseudo-terminal, once started."""
+        if self.__path is None:
+            raise RuntimeError("Simulator not started.")
+        return self.__path
+
+    def start(self):
+        """Create the pseudo-terminal and start serving."""
+        import tty
+
+        if self.__thread is not None:
+            raise RuntimeError("Simulator already started.")
+        self.__master, self.__slave = os.openpty()
+        tty.setraw(self.__master)
+        tty.setraw(self.__slave)
+        self.__path = os.ttyname(self.__slave)
+        self.__stop.clear()
+        self.__thread = threading.Thread(
+            target=self.__run, name="pypdm-simulator", daemon=True
+        )
+        self.__thread.start()
+
+    def __run(self):
+        """Serving thread loop."""
+        master = self.__master
+        assert master is not None
+        # Responses waiting for their transmission time.
+        pending: Deque[Tuple[float, bytes]] = deque()
+        while not self.__stop.is_set():
+            timeout = 0.05
+            if pending:
+                timeout = min(timeout, max(0.0, pending[0][0] - time.monotonic()))
+            readable, _, _ = select.select([master], [], [], timeout)
+            if readable:
+                try:
+                    data = os.read(master, 4096)
+                except OSError:
+                    break
+                due = time.monotonic() + self.bus.latency
+                for response in self.bus.receive(data):
+                    pending.append((due, response))
+            now = time.monotonic()
+            while pending and pending[0][0] <= now:
+                os.write(master, pending.popleft()[1])
+
+    def stop(self):
+        """Stop serving and close the pseudo-terminal."""
+        if self.__thread is None:
+            return
+        self.__stop.set()
+        self.__thread.join()
+        self.__thread = None
+        for fd in (self.__master, self.__slave):
+            if fd is not None:
+                os.close(fd)
+        self.__master = self.__slave = self.__path = None
+
+    def __enter__(self) -> "PtySimulator":
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(
+        description="Simulate daisy-chained PDM devices on a pseudo-terminal."
+    )
+    parser.add_argument(
+        "addresses", type=int, nargs="*", default=[1], help="Device addresses."
+    )
+    parser.add_argument("--version", default="3.7", choices=VERSIONS)
+    parser.add_argument("--latency", type=float, default=0.0, help="In seconds.")
+    parser.add_argument("--corruption", type=float, default=0.0)
+    parser.add_argument("--loss", type=float, default=0.0)
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args(argv)
+    bus = SimulatedBus(
+        (SimulatedPDM(a, args.version) for a in args.addresses),
+        latency=args.latency,
+        corruption=args.corruption,
+        loss=args.loss,
+        seed=args.seed,
+    )
+    with PtySimulator(bus) as simulator:
+        print(simulator.path, flush=True)
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,280 @@
+# This file is part of PyPDM
+#
+# PyPDM is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+#
+# Copyright 2018-2019 Olivier Hériveaux, Ledger SAS
+
+from enum import Enum
+import json
+import struct
+from typing import Any, Dict, Optional, Tuple
+from .pdm import (
+    PDM,
+    Batch,
+    Command,
+    FIELDS,
+    INSTRUCTION_FORMATS,
+    INSTRUCTION_IDS,
+    PROTOCOL_3_7_INSTRUCTIONS,
+    decode_field,
+)
+
+# Settings held by a state, in serialization order.
+STATE_FIELDS = (
+    "sync_source",
+    "delay_line_type",
+    "frequency",
+    "pulse_width",
+    "delay",
+    "offset_current",
+    "current_percentage",
+    "current_source",
+    "activation",
+    "software_control_mode",
+    "control_mode_selection",
+)
+
+
+def _encode(name: str, value: Any) -> bytes:
+    """
+    :return: Instruction data bytes of a setting value.
+    """
+    instruction, kind = FIELDS[name]
+    if isinstance(value, Enum):
+        value = value.value
+    return struct.pack(INSTRUCTION_FORMATS[instruction], value)
+
+
+class PDMState:
+    """
+    Immutable snapshot of the settings of a PDM device. States are hashable,
+    can be compared, and serialized to bytes or JSON.
+
+    A state is captured from a device in a single burst of reads, and
+    restored with a single burst of writes which only changes the differing
+    settings:
+
+    .. code-block:: python
+
+        saved = PDMState.capture(pdm)
+        pdm.configure(current_percentage=80, activation=True)
+        ...
+        saved.restore(pdm)
+
+    Settings not supported by the protocol version of the device are None.
+    """
+
+    __slots__ = STATE_FIELDS
+
+    # Serialization format version.
+    FORMAT = 1
+
+    def __init__(self, **settings: Any):
+        """
+        :param settings: Setting values, by property name. Missing settings
+            are None.
+        """
+        for name in settings:
+            if name not in STATE_FIELDS:
+                raise ValueError(f"Unknown setting {name}")
+        for name in STATE_FIELDS:
+            value = settings.get(name)
+            if value is not None:
+                # Normalize the value type, as returned by the PDM getters.
+                value = FIELDS[name][1](value)
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("PDMState is immutable.")
+
+    def __delattr__(self, name):
+        raise AttributeError("PDMState is immutable.")
+
+    def __values(self) -> Tuple[Any, ...]:
+        return tuple(getattr(self, name) for name in STATE_FIELDS)
+
+    def __eq__(self, other):
+        if not isinstance(other, PDMState):
+            return NotImplemented
+        return self.__values() == other.__values()
+
+    def __hash__(self):
+        return hash(self.__values())
+
+    def __repr__(self):
+        return "PDMState({0})".format(
+            ", ".join(
+                "{0}={1!r}".format(name, value)
+                for name, value in self.to_dict().items()
+            )
+        )
+
+    def __reduce__(self):
+        return (PDMState.from_bytes, (self.to_bytes(),))
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        :return: Setting values by name. None values are omitted.
+        """
+        result = {}
+        for name in STATE_FIELDS:
+            value = getattr(self, name)
+            if value is not None:
+                result[name] = value
+        return result
+
+    def replace(self, **changes: Any) -> "PDMState":
+        """
+        :param changes: Setting values to be changed.
+        :return: A new state with the changed settings.
+        """
+        settings = self.to_dict()
+        settings.update(changes)
+        return PDMState(**settings)
+
+    def diff(self, other: Optional["PDMState"]) -> Dict[str, Any]:
+        """
+        :param other: Reference state. None if unknown.
+        :return: Settings of this state which are not set or differ in the
+            reference state.
+        """
+        return {
+            name: value
+            for name, value in self.to_dict().items()
+            if other is None or getattr(other, name) != value
+        }
+
+    def to_bytes(self) -> bytes:
+        """
+        Compact binary serialization: format version, 16-bit mask of the
+        defined settings, then their instruction data bytes as transmitted to
+        the device.
+
+        :return: Serialized state.
+        """
+        mask = 0
+        data = bytearray()
+        for i, name in enumerate(STATE_FIELDS):
+            value = getattr(self, name)
+            if value is not None:
+                mask |= 1 << i
+                data += _encode(name, value)
+        return struct.pack(">BH", self.FORMAT, mask) + data
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "PDMState":
+        """
+        :param data: State serialized by :meth:`to_bytes`.
+        :return: Deserialized state.
+        """
+        if len(data) < 3:
+            raise ValueError("Truncated state.")
+        version, mask = struct.unpack_from(">BH", data)
+        if version != cls.FORMAT:
+            raise ValueError(f"Unsupported state format {version}")
+        offset = 3
+        settings = {}
+        for i, name in enumerate(STATE_FIELDS):
+            if mask & (1 << i):
+                size = struct.calcsize(INSTRUCTION_FORMATS[FIELDS[name][0]])
+                if offset + size > len(data):
+                    raise ValueError("Truncated state.")
+                settings[name] = decode_field(name, data[offset : offset + size])
+                offset += size
+        if offset != len(data):
+            raise ValueError("Invalid state length.")
+        return cls(**settings)
+
+    def to_json(self) -> str:
+        """
+        :return: JSON object of the settings. Enumerations are stored by
+            member name.
+        """
+        return json.dumps(
+            {
+                name: value.name if isinstance(value, Enum) else value
+                for name, value in self.to_dict().items()
+            }
+        )
+
+    @classmethod
+    def from_json(cls, text: str) -> "PDMState":
+        """
+        :param text: JSON object, as built by :meth:`to_json`.
+        :return: Deserialized state.
+        """
+        settings = {}
+        for name, value in json.loads(text).items():
+            if name not in STATE_FIELDS:
+                raise ValueError(f"Unknown setting {name}")
+            kind = FIELDS[name][1]
+            if isinstance(kind, type) and issubclass(kind, Enum):
+                value = kind[value]
+            settings[name] = value
+        return cls(**settings)
+
+    @classmethod
+    def capture(cls, pdm: PDM) -> "PDMState":
+        """
+        Read all the settings of a device, in a single burst. The shadow
+        registers of the device are updated, if any.
+
+        :param pdm: Device.
+        :return: Device state.
+        """
+        batch = Batch(pdm.link)
+        names = []
+        for name in STATE_FIELDS:
+            instruction = FIELDS[name][0]
+            if instruction in PROTOCOL_3_7_INSTRUCTIONS and pdm.version != "3.7":
+                continue
+            batch.command(
+                pdm.address,
+                Command.READ_INSTRUCTION,
+                INSTRUCTION_IDS[instruction],
+                instruction,
+            )
+            names.append(name)
+        items = batch.items
+        batch.flush()
+        settings = {}
+        for name, item in zip(names, items):
+            assert item.result is not None
+            value = item.result[1:]
+            settings[name] = decode_field(name, value)
+            if pdm.shadow is not None:
+                pdm.shadow.store(FIELDS[name][0], value)
+        return cls(**settings)
+
+    def restore(self, pdm: PDM, current: Optional["PDMState"] = None):
+        """
+        Configure a device with this state, then apply, in a single burst.
+
+        Only the settings which differ from `current` are written. If
+        `current` is None, the settings already known to be held by the
+        device from its shadow registers are skipped, if any. Settings which
+        are None are left unchanged.
+
+        :param pdm: Device.
+        :param current: Known state of the device, for instance captured
+            before changing it.
+        """
+        changes = self.diff(current)
+        if current is None and pdm.shadow is not None:
+            for name in list(changes):
+                known = pdm.shadow.get(FIELDS[name][0])
+                if known is not None and known == _encode(name, changes[name]):
+                    del changes[name]
+        pdm.configure(apply=True, **changes)
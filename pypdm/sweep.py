@@ -0,0 +1,214 @@
+# This file is part of PyPDM
+#
+# PyPDM is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+#
+# Copyright 2018-2019 Olivier Hériveaux, Ledger SAS
+
+from array import array
+import itertools
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Tuple,
+)
+from .pdm import PDM, Batch, Command, FIELDS
+
+# Step callback signature: step index and parameters of the step.
+StepCallback = Callable[[int, Dict[str, Any]], None]
+
+
+class Sweep:
+    """
+    Sequence of device configurations, compiled once into a contiguous buffer
+    of frames so that stepping through it only costs one write and the
+    reception of the responses.
+
+    Each value is validated and encoded once by the corresponding
+    :class:`pypdm.PDM` property setter when the sweep is built. Each step only
+    transmits the parameters which differ from the previous step, followed by
+    an apply command.
+
+    .. code-block:: python
+
+        sweep = Sweep.grid(pdm, delay=range(0, 15000, 100),
+            current_percentage=[20, 40, 60])
+        for index, point in sweep:
+            trigger_target()
+
+    The steps must be run in order, from the first one. Shadow registers of
+    the device, if any, are invalidated for the swept parameters.
+    """
+
+    def __init__(
+        self, pdm: PDM, points: Iterable[Mapping[str, Any]], apply: bool = True
+    ):
+        """
+        :param pdm: Configured device.
+        :param points: Parameters of each step, as property names and values.
+            All the points must define the same properties.
+        :param apply: If True, each step ends with an apply command.
+        """
+        self.pdm = pdm
+        self.points: List[Dict[str, Any]] = [dict(point) for point in points]
+        if not self.points:
+            raise ValueError("Sweep has no step.")
+        self.names = list(self.points[0])
+        for point in self.points:
+            if list(point) != self.names:
+                raise ValueError("All points must define the same parameters.")
+        # Frame of each (name, value), encoded only once.
+        encoded: Dict[Tuple[str, Any], bytes] = {}
+        apply_frame = pdm.link.encode(pdm.address, Command.APPLY_ALL_INSTRUCTIONS, b"")
+        self.__buffer = bytearray()
+        # Offset of the frames of each step in the buffer, and their count.
+        self.__offsets = array("I", [0])
+        self.__counts = array("H")
+        previous: Dict[str, Any] = {}
+        for point in self.points:
+            count = 0
+            for name, value in point.items():
+                if name in previous and previous[name] == value:
+                    continue
+                key = (name, value)
+                frame = encoded.get(key)
+                if frame is None:
+                    frame = encoded[key] = self.__encode(name, value)
+                self.__buffer += frame
+                count += 1
+            if apply:
+                self.__buffer += apply_frame
+                count += 1
+            previous = point
+            self.__offsets.append(len(self.__buffer))
+            self.__counts.append(count)
+        self.__apply = apply
+
+    def __encode(self, name: str, value: Any) -> bytes:
+        """
+        Validate and encode the frame setting a property.
+
+        :param name: Property name.
+        :param value: Property value.
+        :return: Frame bytes.
+        """
+        attr = getattr(type(self.pdm), name, None)
+        if not isinstance(attr, property) or attr.fset is None:
+            raise ValueError(f"Unknown setting {name}")
+        batch = Batch(self.pdm.link)
+        # Elision would drop writes of values the device currently holds.
+        elide, self.pdm.elide_writes = self.pdm.elide_writes, False
+        try:
+            with self.pdm.batch(batch):
+                setattr(self.pdm, name, value)
+        finally:
+            self.pdm.elide_writes = elide
+        (item,) = batch.items
+        return bytes(self.pdm.link.encode(item.address, item.command, item.data))
+
+    @classmethod
+    def grid(cls, pdm: PDM, apply: bool = True, **axes: Iterable[Any]) -> "Sweep":
+        """
+        Build the sweep of the Cartesian product of parameter axes. The last
+        axis varies the fastest.
+
+        :param pdm: Configured device.
+        :param apply: If True, each step ends with an apply command.
+        :param axes: Property names and their values.
+        """
+        names = list(axes)
+        points = (
+            dict(zip(names, values))
+            for values in itertools.product(*(list(axes[name]) for name in names))
+        )
+        return cls(pdm, points, apply)
+
+    def __len__(self) -> int:
+        return len(self.points)
+
+    @property
+    def frames(self) -> memoryview:
+        """Read-only view of the compiled frames of all the steps."""
+        return memoryview(self.__buffer).toreadonly()
+
+    def __invalidate(self):
+        """Forget the swept parameters in the device shadow registers."""
+        shadow = self.pdm.shadow
+        if shadow is None:
+            return
+        if not self.__apply:
+            shadow.invalidate()
+            return
+        for name in self.names:
+            if name in FIELDS:
+                shadow.invalidate(FIELDS[name][0])
+            elif name == "current":
+                shadow.invalidate(FIELDS["current_percentage"][0])
+
+    def steps(self) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """
+        Configure the device for each step in turn. The device is configured
+        when the step is yielded.
+
+        :return: Iterator of step indexes and parameters.
+        """
+        buffer = memoryview(self.__buffer)
+        offsets = self.__offsets
+        counts = self.__counts
+        transfer = self.pdm.link.transfer
+        try:
+            for index, point in enumerate(self.points):
+                results = transfer(
+                    buffer[offsets[index] : offsets[index + 1]], counts[index]
+                )
+                for result in results:
+                    if isinstance(result, Exception):
+                        raise result
+                yield index, point
+        finally:
+            self.__invalidate()
+
+    def __iter__(self) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        return self.steps()
+
+    def run(
+        self,
+        pre_step: Optional[StepCallback] = None,
+        post_step: Optional[StepCallback] = None,
+    ):
+        """
+        Run all the steps.
+
+        :param pre_step: Called with the step index and parameters before the
+            device is configured for the step.
+        :param post_step: Called with the step index and parameters once the
+            device is configured for the step, typically to trigger the
+            target.
+        """
+        steps = self.steps()
+        try:
+            for index, point in enumerate(self.points):
+                if pre_step is not None:
+                    pre_step(index, point)
+                next(steps)
+                if post_step is not None:
+                    post_step(index, point)
+        finally:
+            steps.close()
@@ -0,0 +1,270 @@
+# This file is part of PyPDM
+#
+# PyPDM is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+#
+# Copyright 2018-2019 Olivier Hériveaux, Ledger SAS
+
+from array import array
+import math
+import struct
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from .pdm import PDM, Command, Instruction, INSTRUCTION_IDS
+
+# Callback signature for thresholds: field name, value, timestamp.
+ThresholdCallback = Callable[[str, float, float], None]
+
+
+class TelemetrySampler:
+    """
+    Polls telemetry fields of a PDM device at a fixed rate from a background
+    thread, and stores timestamped samples in preallocated ring buffers.
+    Memory usage does not grow with time: once :attr:`capacity` samples have
+    been recorded, the oldest ones are overwritten.
+
+    All the selected fields are read in a single burst at each period.
+    Available fields are ``temperature``, ``interlock_status`` (0: closed,
+    1: open) and ``mode`` (0: pulsed, 1: continuous). Failed samples are
+    stored as NaN and counted in :attr:`errors`.
+
+    .. code-block:: python
+
+        sampler = TelemetrySampler(pdm, rate=10, capacity=36000)
+        sampler.on_threshold('temperature', 40, alarm)
+        sampler.start()
+        ...
+        older, newer = sampler.segments('temperature')
+
+    If the link is also used by other threads, it must be a
+    :class:`pypdm.ThreadedLink`.
+    """
+
+    FIELDS = ("temperature", "interlock_status", "mode")
+
+    def __init__(
+        self,
+        pdm: PDM,
+        fields: Iterable[str] = FIELDS,
+        rate: float = 10.0,
+        capacity: int = 36000,
+    ):
+        """
+        :param pdm: Sampled device.
+        :param fields: Names of the sampled fields.
+        :param rate: Sampling rate, in Hz.
+        :param capacity: Number of samples kept in the ring buffers.
+        """
+        fields = tuple(fields)
+        for name in fields:
+            if name not in self.FIELDS:
+                raise ValueError(f"Unknown telemetry field {name}")
+        if rate <= 0:
+            raise ValueError("Rate must be positive.")
+        if capacity <= 0:
+            raise ValueError("Capacity must be positive.")
+        self.pdm = pdm
+        self.fields = fields
+        self.period = 1 / rate
+        self.capacity = capacity
+        self.errors = 0
+        # Requests are built once and reused for every sample.
+        self.__requests: List[Tuple[int, Command, bytes]] = []
+        for name in fields:
+            if name == "mode":
+                self.__requests.append((pdm.address, Command.READ_CW_PULSE, bytes()))
+            else:
+                instruction = Instruction[name.upper()]
+                self.__requests.append(
+                    (
+                        pdm.address,
+                        Command.READ_INSTRUCTION,
+                        INSTRUCTION_IDS[instruction],
+                    )
+                )
+        # Minimum response lengths: status byte and value.
+        self.__sizes = tuple(5 if name == "temperature" else 2 for name in fields)
+        # Timestamps (time.monotonic) and values of the samples.
+        self.__times = array("d", bytes(8 * capacity))
+        self.__values = {name: array("d", bytes(8 * capacity)) for name in fields}
+        # Total number of recorded samples.
+        self.__count = 0
+        self.__lock = threading.Lock()
+        self.__thresholds: List[Tuple[str, float, bool, ThresholdCallback]] = []
+        self.__stop = threading.Event()
+        self.__thread: Optional[threading.Thread] = None
+
+    def on_threshold(
+        self,
+        field: str,
+        threshold: float,
+        callback: ThresholdCallback,
+        rising: bool = True,
+    ):
+        """
+        Register a callback called from the sampling thread when a field
+        crosses a threshold.
+
+        :param field: Field name.
+        :param threshold: Threshold value.
+        :param callback: Called with the field name, the value and the
+            timestamp of the sample.
+        :param rising: If True, the callback is called when the value goes
+            above the threshold. Otherwise, when it goes below.
+        """
+        if field not in self.fields:
+            raise ValueError(f"Field {field} is not sampled")
+        self.__thresholds.append((field, threshold, rising, callback))
+
+    def sample(self):
+        """
+        Read all the fields once and record the sample. Called periodically by
+        the sampling thread, and may be called directly when the thread is not
+        running.
+        """
+        results = self.pdm.link.command_many(self.__requests)
+        timestamp = time.monotonic()
+        with self.__lock:
+            index = self.__count % self.capacity
+            previous = (self.__count - 1) % self.capacity
+            first = self.__count == 0
+            self.__times[index] = timestamp
+            for name, size, res in zip(self.fields, self.__sizes, results):
+                values = self.__values[name]
+                if isinstance(res, Exception) or len(res) < size:
+                    self.errors += 1
+                    values[index] = math.nan
+                elif name == "temperature":
+                    values[index] = struct.unpack_from(">f", res, 1)[0]
+                else:
+                    values[index] = res[1]
+            self.__count += 1
+        if first:
+            return
+        for name, threshold, rising, callback in self.__thresholds:
+            values = self.__values[name]
+            before, after = values[previous], values[index]
+            if rising and before <= threshold < after:
+                callback(name, after, timestamp)
+            elif not rising and before >= threshold > after:
+                callback(name, after, timestamp)
+
+    def __run(self):
+        """Sampling thread loop."""
+        deadline = time.monotonic()
+        while not self.__stop.is_set():
+            try:
+                self.sample()
+            except Exception:
+                # Link failure. Keep sampling, following periods may succeed.
+                with self.__lock:
+                    self.errors += 1
+            deadline += self.period
+            delay = deadline - time.monotonic()
+            if delay < 0:
+                # Too late: skip missed periods instead of bursting.
+                deadline -= delay
+                delay = 0
+            self.__stop.wait(delay)
+
+    def start(self):
+        """Start the sampling thread."""
+        if self.__thread is not None:
+            raise RuntimeError("Sampler already started.")
+        self.__stop.clear()
+        self.__thread = threading.Thread(
+            target=self.__run, name="pypdm-telemetry", daemon=True
+        )
+        self.__thread.start()
+
+    def stop(self):
+        """Stop the sampling thread and wait for its termination."""
+        if self.__thread is None:
+            return
+        self.__stop.set()
+        self.__thread.join()
+        self.__thread = None
+
+    def __enter__(self) -> "TelemetrySampler":
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    @property
+    def count(self) -> int:
+        """Number of samples currently held in the ring buffers."""
+        return min(self.__count, self.capacity)
+
+    @property
+    def total(self) -> int:
+        """Number of samples recorded since creation."""
+        return self.__count
+
+    def buffer(self, name: str) -> memoryview:
+        """
+        Zero-copy view of the whole ring buffer of a field, or of the
+        timestamps if `name` is ``time``. Samples are not ordered, see
+        :meth:`segments`. The view is updated in place by the sampling thread.
+
+        :param name: Field name, or ``time``.
+        :return: A memoryview of doubles, of :attr:`capacity` length.
+        """
+        if name == "time":
+            return memoryview(self.__times)
+        return memoryview(self.__values[name])
+
+    def segments(self, name: str) -> Tuple[memoryview, memoryview]:
+        """
+        Zero-copy views of the recorded samples of a field (or ``time``), from
+        oldest to newest. Samples are split in two views because of the ring
+        buffer wrapping.
+
+        :param name: Field name, or ``time``.
+        :return: Older and newer views. The older view may be empty.
+        """
+        view = self.buffer(name)
+        with self.__lock:
+            if self.__count <= self.capacity:
+                return view[:0], view[: self.__count]
+            index = self.__count % self.capacity
+        return view[index:], view[:index]
+
+    def latest(self) -> Optional[Dict[str, float]]:
+        """
+        :return: Last recorded sample, with its ``time``, or None if no sample
+            has been recorded yet.
+        """
+        with self.__lock:
+            if self.__count == 0:
+                return None
+            index = (self.__count - 1) % self.capacity
+            sample = {"time": self.__times[index]}
+            for name in self.fields:
+                sample[name] = self.__values[name][index]
+            return sample
+
+    def as_numpy(self, name: str):
+        """
+        Zero-copy NumPy array view of the ring buffer of a field, or of the
+        timestamps. Requires NumPy. See :meth:`buffer`.
+
+        :param name: Field name, or ``time``.
+        :return: A float64 NumPy array.
+        """
+        import numpy
+
+        return numpy.frombuffer(self.buffer(name), dtype=numpy.float64)
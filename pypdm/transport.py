@@ -0,0 +1,316 @@
+# This file is part of PyPDM
+#
+# PyPDM is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+#
+# Copyright 2018-2019 Olivier Hériveaux, Ledger SAS
+
+import socket
+import struct
+from typing import Any, Callable, Dict, Iterable, Optional
+from urllib.parse import parse_qs, urlsplit
+import serial
+
+# Baudrate of the PDM serial interface.
+BAUDRATE = 125000
+
+# Transport factory signature: URL, read timeout and write timeout.
+TransportFactory = Callable[[str, Optional[float], Optional[float]], Any]
+
+
+class Transport:
+    """
+    Base class of the byte streams used by :class:`pypdm.Link`.
+
+    A transport must provide ``read(n)`` and ``write(data)`` with the same
+    semantics as :class:`serial.Serial`, and ``timeout`` and ``write_timeout``
+    attributes in seconds. ``readinto(buffer)``, ``in_waiting`` and
+    ``reset_input_buffer()`` are optional and make reception faster and
+    resynchronization more reliable. :class:`serial.Serial` instances are
+    valid transports.
+
+    This base class provides default implementations of the optional
+    methods, on top of :meth:`read`.
+    """
+
+    #: Transport name, used as the link port name.
+    port = ""
+
+    def __init__(
+        self, timeout: Optional[float] = None, write_timeout: Optional[float] = None
+    ):
+        self.timeout = timeout
+        self.write_timeout = write_timeout
+
+    def read(self, n: int) -> bytes:
+        """
+        Receive bytes.
+
+        :param n: Maximum number of bytes.
+        :return: Received bytes. Empty if the timeout expired.
+        """
+        raise NotImplementedError()
+
+    def readinto(self, buffer: memoryview) -> int:
+        """
+        Receive bytes into a buffer.
+
+        :param buffer: Destination.
+        :return: Number of received bytes. 0 if the timeout expired.
+        """
+        data = self.read(len(buffer))
+        buffer[: len(data)] = data
+        return len(data)
+
+    def write(self, data: bytes) -> Optional[int]:
+        """
+        Transmit bytes.
+
+        :param data: Bytes to be transmitted.
+        """
+        raise NotImplementedError()
+
+    @property
+    def in_waiting(self) -> int:
+        """Number of bytes which can be received without waiting."""
+        return 0
+
+    def reset_input_buffer(self):
+        """Discard the received bytes which have not been read yet."""
+        pass
+
+    def close(self):
+        """Release the transport."""
+        pass
+
+
+class TcpTransport(Transport):
+    """
+    Transport to a serial-over-TCP bridge, transmitting raw bytes. Nagle's
+    algorithm is disabled, so that each burst of frames written by the link
+    is sent immediately in a single segment.
+
+    URL: ``tcp://host:port``.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        timeout: Optional[float] = None,
+        write_timeout: Optional[float] = None,
+        connect_timeout: float = 5.0,
+    ):
+        """
+        :param host: Bridge host name or address.
+        :param port: Bridge TCP port.
+        :param timeout: Read timeout in seconds. None to wait forever.
+        :param write_timeout: Write timeout in seconds. None to wait forever.
+        :param connect_timeout: Connection timeout in seconds.
+        """
+        self.socket = socket.create_connection((host, port), timeout=connect_timeout)
+        self.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.port = f"tcp://{host}:{port}"
+        super().__init__(timeout, write_timeout)
+
+    def readinto(self, buffer: memoryview) -> int:
+        self.socket.settimeout(self.timeout)
+        try:
+            received = self.socket.recv_into(buffer)
+        except socket.timeout:
+            return 0
+        if received == 0 and len(buffer):
+            raise ConnectionResetError("Connection closed by the bridge.")
+        return received
+
+    def read(self, n: int) -> bytes:
+        buffer = bytearray(n)
+        received = self.readinto(memoryview(buffer))
+        return bytes(buffer[:received])
+
+    def write(self, data: bytes) -> Optional[int]:
+        self.socket.settimeout(self.write_timeout)
+        self.socket.sendall(data)
+        return len(data)
+
+    @property
+    def in_waiting(self) -> int:
+        try:
+            import fcntl
+            import termios
+
+            result = fcntl.ioctl(self.socket, termios.FIONREAD, b"\0\0\0\0")
+            return struct.unpack("i", result)[0]
+        except (ImportError, OSError):
+            return 0
+
+    def reset_input_buffer(self):
+        self.socket.setblocking(False)
+        try:
+            while self.socket.recv(4096):
+                pass
+        except (BlockingIOError, InterruptedError):
+            pass
+        finally:
+            self.socket.settimeout(self.timeout)
+
+    def close(self):
+        self.socket.close()
+
+
+class MemoryTransport(Transport):
+    """
+    In-memory transport, for tests and benchmarks. Written bytes are passed
+    to a function which returns the bytes to be received in response.
+
+    URL: ``sim://1,2?version=3.7`` connects to a
+    :class:`pypdm.simulator.SimulatedBus` of devices 1 and 2. Options are
+    ``version``, ``latency`` (ignored, responses are immediate),
+    ``corruption``, ``loss`` and ``seed``.
+    """
+
+    def __init__(
+        self,
+        respond: Callable[[bytes], Iterable[bytes]],
+        name: str = "memory",
+        timeout: Optional[float] = None,
+        write_timeout: Optional[float] = None,
+    ):
+        """
+        :param respond: Called with the written bytes. Returns the received
+            byte chunks.
+        :param name: Transport name.
+        :param timeout: Ignored, reads never wait.
+        :param write_timeout: Ignored, writes never wait.
+        """
+        self.respond = respond
+        self.port = name
+        self.__rx = bytearray()
+        super().__init__(timeout, write_timeout)
+
+    def write(self, data: bytes) -> Optional[int]:
+        for chunk in self.respond(bytes(data)):
+            self.__rx += chunk
+        return len(data)
+
+    def readinto(self, buffer: memoryview) -> int:
+        n = min(len(buffer), len(self.__rx))
+        buffer[:n] = self.__rx[:n]
+        del self.__rx[:n]
+        return n
+
+    def read(self, n: int) -> bytes:
+        data = bytes(self.__rx[:n])
+        del self.__rx[:n]
+        return data
+
+    @property
+    def in_waiting(self) -> int:
+        return len(self.__rx)
+
+    def reset_input_buffer(self):
+        self.__rx.clear()
+
+
+def _open_serial(url: str, timeout: Optional[float], write_timeout: Optional[float]):
+    if url.startswith("serial://"):
+        url = url[len("serial://") :]
+    if "://" in url:
+        # Other pyserial URL handlers, for instance rfc2217:// or socket://.
+        return serial.serial_for_url(
+            url, BAUDRATE, timeout=timeout, write_timeout=write_timeout
+        )
+    return serial.Serial(url, BAUDRATE, timeout=timeout, write_timeout=write_timeout)
+
+
+def _open_tcp(url: str, timeout: Optional[float], write_timeout: Optional[float]):
+    parts = urlsplit(url)
+    if parts.hostname is None or parts.port is None:
+        raise ValueError(f"Invalid TCP transport URL {url}")
+    return TcpTransport(parts.hostname, parts.port, timeout, write_timeout)
+
+
+def _open_simulator(url: str, timeout: Optional[float], write_timeout: Optional[float]):
+    from .simulator import SimulatedBus, SimulatedPDM
+
+    parts = urlsplit(url)
+    options = {k: v[-1] for k, v in parse_qs(parts.query).items()}
+    version = options.pop("version", "3.7")
+    kwargs: Dict[str, Any] = {}
+    for name, kind in (("corruption", float), ("loss", float), ("seed", int)):
+        if name in options:
+            kwargs[name] = kind(options.pop(name))
+    options.pop("latency", None)
+    if options:
+        raise ValueError("Unknown simulator options {0}".format(", ".join(options)))
+    addresses = [int(a) for a in parts.netloc.split(",") if a] or [1]
+    bus = SimulatedBus((SimulatedPDM(a, version) for a in addresses), **kwargs)
+    transport = MemoryTransport(bus.receive, url, timeout, write_timeout)
+    transport.bus = bus  # type: ignore
+    return transport
+
+
+def _open_remote(url: str, timeout: Optional[float], write_timeout: Optional[float]):
+    from .server import open_remote
+
+    return open_remote(url, timeout, write_timeout)
+
+
+# Transport factories, by URL scheme. An empty scheme is a serial port path.
+TRANSPORTS: Dict[str, TransportFactory] = {
+    "": _open_serial,
+    "serial": _open_serial,
+    "tcp": _open_tcp,
+    "sim": _open_simulator,
+    "pdmd": _open_remote,
+}
+
+
+def register_transport(scheme: str, factory: TransportFactory):
+    """
+    Make :func:`open_transport` support a new URL scheme.
+
+    :param scheme: URL scheme, for instance 'tcp'.
+    :param factory: Called with the URL, the read timeout and the write
+        timeout. Returns a transport.
+    """
+    TRANSPORTS[scheme] = factory
+
+
+def open_transport(
+    url: str, timeout: Optional[float] = None, write_timeout: Optional[float] = None
+):
+    """
+    Open a transport from its URL.
+
+    - A path without scheme, or ``serial://path``, opens a serial port, for
+      instance '/dev/ttyUSB0', 'COM3', or a pseudo-terminal of
+      :class:`pypdm.simulator.PtySimulator`.
+    - ``tcp://host:port`` connects to a serial-over-TCP bridge, see
+      :class:`TcpTransport`.
+    - ``sim://addresses`` creates in-memory simulated devices, see
+      :class:`MemoryTransport`.
+    - ``pdmd:///socket/path`` connects to a link shared by a
+      :class:`pypdm.server.PDMServer`.
+    - Other URL schemes are handled by registered factories (see
+      :func:`register_transport`), then by :func:`serial.serial_for_url`.
+
+    :param url: Transport URL.
+    :param timeout: Read timeout in seconds. None to wait forever.
+    :param write_timeout: Write timeout in seconds. None to wait forever.
+    :return: Opened transport.
+    """
+    scheme = url.split("://", 1)[0] if "://" in url else ""
+    factory = TRANSPORTS.get(scheme, _open_serial)
+    return factory(url, timeout, write_timeout)
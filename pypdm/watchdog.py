@@ -0,0 +1,379 @@
+# This file is part of PyPDM
+#
+# PyPDM is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+#
+# Copyright 2018-2019 Olivier Hériveaux, Ledger SAS
+
+import queue
+import threading
+import time
+import weakref
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple, Union
+from .pdm import (
+    PDM,
+    Link,
+    Command,
+    ErrorFlags,
+    Instruction,
+    InterlockStatus,
+    INSTRUCTION_IDS,
+    decode_error_code,
+)
+
+# Event kinds.
+INTERLOCK = "interlock"
+ERROR = "error"
+
+
+class WatchdogEvent(NamedTuple):
+    """A transition of a watched value, reported by :class:`Watchdog`."""
+
+    #: Device address.
+    address: int
+    #: :data:`INTERLOCK` or :data:`ERROR`.
+    kind: str
+    #: New value: :class:`pypdm.InterlockStatus`, or :class:`pypdm.ErrorFlags`.
+    value: Any
+    #: Previous value.
+    previous: Any
+    #: Time of the poll which confirmed the transition, as returned by
+    #: :func:`time.monotonic`.
+    time: float
+
+
+# Event callback signature.
+EventCallback = Callable[[WatchdogEvent], None]
+
+
+class Watcher:
+    """
+    Registration of a device in a :class:`Watchdog`, returned by
+    :meth:`Watchdog.watch`. Events are passed to the callback if any, and
+    queued in :attr:`events` otherwise.
+
+    :ivar interlock: Debounced interlock status. None until first read.
+    :ivar error_code: Debounced error flags. None until first read.
+    :ivar active: True if the laser activation instruction was set at the
+        last poll.
+    """
+
+    def __init__(
+        self, watchdog: "Watchdog", address: int, callback: Optional[EventCallback]
+    ):
+        self.watchdog = watchdog
+        self.address = address
+        self.callback = callback
+        self.events: "queue.Queue[WatchdogEvent]" = queue.Queue()
+        self.interlock: Optional[InterlockStatus] = None
+        self.error_code: Optional[ErrorFlags] = None
+        self.active = False
+        # Value differing from the debounced state of each kind, and the
+        # number of consecutive polls it has been read.
+        self.__candidates: Dict[str, Tuple[Any, int]] = {}
+
+    def update(
+        self, kind: str, value: Any, debounce: int, timestamp: float
+    ) -> Optional[WatchdogEvent]:
+        """
+        Process a reading.
+
+        :param kind: :data:`INTERLOCK` or :data:`ERROR`.
+        :param value: Read value.
+        :param debounce: Number of consecutive polls a new value must be read
+            before the transition is confirmed.
+        :param timestamp: Poll time.
+        :return: The confirmed transition, if any.
+        """
+        attribute = "interlock" if kind == INTERLOCK else "error_code"
+        state = getattr(self, attribute)
+        if state is None:
+            # Initial state, not a transition.
+            setattr(self, attribute, value)
+            return None
+        if value == state:
+            self.__candidates.pop(kind, None)
+            return None
+        candidate, count = self.__candidates.get(kind, (None, 0))
+        count = count + 1 if candidate == value else 1
+        if count < debounce:
+            self.__candidates[kind] = (value, count)
+            return None
+        self.__candidates.pop(kind, None)
+        setattr(self, attribute, value)
+        return WatchdogEvent(self.address, kind, value, state, timestamp)
+
+    def dispatch(self, event: WatchdogEvent):
+        """Pass an event to the callback, or queue it."""
+        if self.callback is not None:
+            self.callback(event)
+        else:
+            self.events.put(event)
+
+    def close(self):
+        """Stop watching the device."""
+        self.watchdog.unwatch(self)
+
+
+class Watchdog:
+    """
+    Watches the interlock status and the error code of devices, and reports
+    their transitions. A single thread polls all the watched devices of a
+    link, in one burst per poll; several watchers of the same device share
+    the same readings.
+
+    Polling is fast while the laser of any watched device is activated, and
+    slow otherwise. A new value must be read at `debounce` consecutive polls
+    to be reported, so that glitches are ignored.
+
+    .. code-block:: python
+
+        watchdog = Watchdog.for_link(pdm.link)
+        watchdog.watch(pdm, lambda event: print(event))
+        ...
+        watchdog.stop()
+
+    If the link is also used by other threads, it must be a
+    :class:`pypdm.ThreadedLink`.
+    """
+
+    # Shared watchdogs, by link.
+    __instances: "weakref.WeakKeyDictionary[Link, Watchdog]" = (
+        weakref.WeakKeyDictionary()
+    )
+    __instances_lock = threading.Lock()
+
+    def __init__(
+        self,
+        link: Link,
+        active_period: float = 0.01,
+        idle_period: float = 0.25,
+        debounce: int = 2,
+    ):
+        """
+        :param link: Link of the watched devices.
+        :param active_period: Polling period in seconds while a laser is
+            activated.
+        :param idle_period: Polling period in seconds otherwise.
+        :param debounce: Number of consecutive polls a new value must be read
+            to be reported. 1 reports transitions immediately.
+        """
+        if active_period <= 0 or idle_period <= 0:
+            raise ValueError("Periods must be positive.")
+        if debounce < 1:
+            raise ValueError("Debounce must be at least 1.")
+        # The link is not kept alive by the watchdog, so that the watchdogs
+        # shared by for_link() are released with their link.
+        self.__link = weakref.ref(link)
+        self.active_period = active_period
+        self.idle_period = idle_period
+        self.debounce = debounce
+        #: Number of polls.
+        self.polls = 0
+        #: Number of failed readings and callbacks.
+        self.errors = 0
+        self.__watchers: List[Watcher] = []
+        self.__lock = threading.Lock()
+        self.__active = False
+        self.__stop = threading.Event()
+        self.__wake = threading.Event()
+        self.__thread: Optional[threading.Thread] = None
+
+    @property
+    def link(self) -> Optional[Link]:
+        """Link of the watched devices, or None once it has been deleted."""
+        return self.__link()
+
+    @classmethod
+    def for_link(cls, link: Link, **kwargs: Any) -> "Watchdog":
+        """
+        :param link: Link of the watched devices.
+        :param kwargs: Constructor arguments, when the watchdog is created.
+            When it already exists, they must match its settings.
+        :return: The watchdog shared by all the users of the link.
+        """
+        with cls.__instances_lock:
+            watchdog = cls.__instances.get(link)
+            if watchdog is None:
+                watchdog = cls.__instances[link] = cls(link, **kwargs)
+            elif any(getattr(watchdog, k) != v for k, v in kwargs.items()):
+                raise ValueError("Link watchdog already exists with other settings.")
+            return watchdog
+
+    @property
+    def period(self) -> float:
+        """Current polling period, in seconds."""
+        return self.active_period if self.__active else self.idle_period
+
+    def watch(
+        self,
+        device: Union[PDM, int],
+        callback: Optional[EventCallback] = None,
+        start: bool = True,
+    ) -> Watcher:
+        """
+        Start watching a device.
+
+        :param device: Device, or its address.
+        :param callback: Called from the polling thread with each
+            :class:`WatchdogEvent`. If None, events are queued in
+            :attr:`Watcher.events`.
+        :param start: If True, start the polling thread if not running.
+        :return: Registration, to be closed when done.
+        """
+        address = device.address if isinstance(device, PDM) else device
+        watcher = Watcher(self, address, callback)
+        with self.__lock:
+            self.__watchers.append(watcher)
+            if start and self.__thread is None:
+                self.__start()
+        # Poll the new device without waiting for the idle period.
+        self.__wake.set()
+        return watcher
+
+    def unwatch(self, watcher: Watcher):
+        """
+        Stop watching a device.
+
+        :param watcher: Registration returned by :meth:`watch`.
+        """
+        with self.__lock:
+            if watcher in self.__watchers:
+                self.__watchers.remove(watcher)
+
+    def poll(self) -> List[WatchdogEvent]:
+        """
+        Read all the watched devices once, and dispatch the confirmed
+        transitions. Called periodically by the polling thread, and may be
+        called directly when the thread is not running.
+
+        :return: Dispatched events.
+        """
+        with self.__lock:
+            watchers = list(self.__watchers)
+        addresses = sorted({watcher.address for watcher in watchers})
+        if not addresses:
+            return []
+        requests = []
+        for address in addresses:
+            requests += [
+                (
+                    address,
+                    Command.READ_INSTRUCTION,
+                    INSTRUCTION_IDS[Instruction.INTERLOCK_STATUS],
+                ),
+                (address, Command.READ_ERROR_CODE, bytes()),
+                (
+                    address,
+                    Command.READ_INSTRUCTION,
+                    INSTRUCTION_IDS[Instruction.LASER_ACTIVATION],
+                ),
+            ]
+        link = self.__link()
+        if link is None:
+            raise ReferenceError("Watched link has been deleted.")
+        results = link.command_many(requests)
+        timestamp = time.monotonic()
+        self.polls += 1
+        # Readings of each device: interlock, error code and activation. None
+        # when failed.
+        readings: Dict[int, Tuple[Any, Any, Any]] = {}
+        for i, address in enumerate(addresses):
+            values: List[Any] = []
+            for j, res in enumerate(results[3 * i : 3 * i + 3]):
+                try:
+                    if isinstance(res, Exception) or len(res) < 2:
+                        raise ValueError()
+                    if j == 0:
+                        values.append(InterlockStatus(res[1]))
+                    elif j == 1:
+                        values.append(decode_error_code(res[1:]))
+                    else:
+                        values.append(bool(res[1]))
+                except ValueError:
+                    self.errors += 1
+                    values.append(None)
+            readings[address] = (values[0], values[1], values[2])
+        events = []
+        active = False
+        for watcher in watchers:
+            interlock, error_code, activation = readings[watcher.address]
+            if activation is not None:
+                watcher.active = activation
+            active = active or watcher.active
+            for kind, value in ((INTERLOCK, interlock), (ERROR, error_code)):
+                if value is None:
+                    continue
+                event = watcher.update(kind, value, self.debounce, timestamp)
+                if event is None:
+                    continue
+                events.append(event)
+                try:
+                    watcher.dispatch(event)
+                except Exception:
+                    self.errors += 1
+        self.__active = active
+        return events
+
+    def __run(self, stop: threading.Event):
+        """Polling thread loop."""
+        while not stop.is_set():
+            if self.__link() is None:
+                # Nothing left to watch.
+                break
+            try:
+                self.poll()
+            except Exception:
+                # Link failure. Keep polling, following polls may succeed.
+                self.errors += 1
+            self.__wake.wait(self.period)
+            self.__wake.clear()
+
+    def __start(self):
+        """Start the polling thread. Called with the lock held."""
+        # Each thread has its own stop event, so that a thread being stopped
+        # is not resumed by a restart.
+        self.__stop = threading.Event()
+        self.__thread = threading.Thread(
+            target=self.__run, args=(self.__stop,), name="pypdm-watchdog", daemon=True
+        )
+        self.__thread.start()
+
+    def start(self):
+        """Start the polling thread."""
+        with self.__lock:
+            if self.__thread is not None:
+                raise RuntimeError("Watchdog already started.")
+            self.__start()
+
+    def stop(self):
+        """Stop the polling thread and wait for its termination."""
+        with self.__lock:
+            thread, self.__thread = self.__thread, None
+            if thread is None:
+                return
+            self.__stop.set()
+        self.__wake.set()
+        # Not joined with the lock held, polls need it.
+        if thread is not threading.current_thread():
+            thread.join()
+
+    def __enter__(self) -> "Watchdog":
+        with self.__lock:
+            if self.__thread is None:
+                self.__start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
@@ -5,6 +5,7 @@ from typing import Optional, Iterable, List
 from serial.serialutil import SerialException
 from serial import Serial
 import pypdm.pdm as pdm_mod
+from pypdm.simulator import SimulatedBus
 
 
 def calc_chk(bytes_iterable: Iterable[int]) -> int:
@@ -68,6 +69,27 @@ class FakeSerial:
         return len(b)
 
 
+class BusSerial:
+    """Serial port connected to a simulated bus."""
+
+    def __init__(self, bus: SimulatedBus) -> None:
+        self.bus = bus
+        self._rx_buffer = bytearray()
+
+    def write(self, b: bytes) -> int:
+        for response in self.bus.receive(bytes(b)):
+            self._rx_buffer += response
+        return len(b)
+
+    def read(self, n: int) -> bytes:
+        data = self._rx_buffer[:n]
+        del self._rx_buffer[:n]
+        return bytes(data)
+
+    def close(self) -> None:
+        pass
+
+
 @pytest.fixture
 def fake_serial_factory(monkeypatch: pytest.MonkeyPatch) -> types.SimpleNamespace:
     """
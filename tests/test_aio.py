@@ -0,0 +1,62 @@
+import asyncio
+import types
+from typing import cast
+
+from pypdm.pdm import Command, Status, SyncSource
+from pypdm.aio import AsyncLink, AsyncPDM
+from conftest import FakeSerial
+
+
+def test_async_pdm_get_and_set(fake_serial_factory: types.SimpleNamespace) -> None:
+    async def main() -> None:
+        link = AsyncLink("/dev/ttyFAKE")
+        fs = cast(FakeSerial, link.link.serial)
+        fs.queue_response(
+            fake_serial_factory.make_response(Status.OK.value, bytes([3, 4]))
+        )
+        pdm = await AsyncPDM.open(1, link)
+        assert pdm.version == "3.4"
+
+        fs.queue_response(
+            fake_serial_factory.make_response(Status.OK.value, (250).to_bytes(4, "big"))
+        )
+        assert await pdm.get_delay() == 250
+
+        fs.queue_response(fake_serial_factory.OK_RESP)
+        fs.queue_response(fake_serial_factory.OK_RESP)
+        await pdm.configure(sync_source=SyncSource.INTERNAL)
+        assert fs.writes[-1][2] == Command.WRITE_INSTRUCTION.value
+
+        # __del__ will disable the laser -> provide a two last OK responses
+        fs.queue_response(fake_serial_factory.OK_RESP)
+        fs.queue_response(fake_serial_factory.OK_RESP)
+        link.close()
+
+    asyncio.run(main())
+
+
+def test_requests_are_serialized_per_link(
+    fake_serial_factory: types.SimpleNamespace,
+) -> None:
+    async def main() -> None:
+        links = [AsyncLink("/dev/ttyFAKE0"), AsyncLink("/dev/ttyFAKE1")]
+        for i, link in enumerate(links):
+            fs = cast(FakeSerial, link.link.serial)
+            for j in range(10):
+                fs.queue_response(
+                    fake_serial_factory.make_response(Status.OK.value, bytes([i, j]))
+                )
+        results = await asyncio.gather(
+            *(
+                link.command(1, Command.READ_PROTOCOL_VERSION)
+                for _ in range(10)
+                for link in links
+            )
+        )
+        # Responses are received in submission order on each link
+        assert results[0::2] == [bytes([0, 0, j]) for j in range(10)]
+        assert results[1::2] == [bytes([0, 1, j]) for j in range(10)]
+        for link in links:
+            link.close()
+
+    asyncio.run(main())
@@ -0,0 +1,124 @@
+import types
+from typing import Callable, cast
+import pytest
+
+from pypdm.pdm import (
+    PDM,
+    Link,
+    Batch,
+    BatchError,
+    Command,
+    Instruction,
+    Status,
+    StatusError,
+    SyncSource,
+)
+from conftest import FakeSerial
+
+
+def version_resp(
+    v_major: int, v_minor: int, make_response: Callable[[int, bytes], bytes]
+) -> bytes:
+    return make_response(Status.OK.value, bytes([v_major, v_minor]))
+
+
+def test_command_many_single_write(fake_serial_factory: types.SimpleNamespace) -> None:
+    link = Link("/dev/ttyFAKE")
+    fs = cast(FakeSerial, link.serial)
+    fs.queue_response(fake_serial_factory.make_response(Status.OK.value, bytes([3, 4])))
+    fs.queue_response(fake_serial_factory.make_response(Status.QUERY_ERROR.value))
+    fs.queue_response(fake_serial_factory.OK_RESP)
+    results = link.command_many(
+        [
+            (1, Command.READ_PROTOCOL_VERSION, b""),
+            (2, Command.READ_PROTOCOL_VERSION, b""),
+            (3, Command.APPLY_ALL_INSTRUCTIONS, b""),
+        ]
+    )
+    # All frames are transmitted in one write
+    assert len(fs.writes) == 1
+    assert len(fs.writes[0]) == 12
+    assert results[0] == bytes([0, 3, 4])
+    assert isinstance(results[1], StatusError)
+    assert results[2] == bytes([0])
+
+
+def test_configure_single_burst(fake_serial_factory: types.SimpleNamespace) -> None:
+    link = Link("/dev/ttyFAKE")
+    fs = cast(FakeSerial, link.serial)
+    fs.queue_response(version_resp(3, 4, fake_serial_factory.make_response))
+    pdm = PDM(1, link)
+
+    for _ in range(5):
+        fs.queue_response(fake_serial_factory.OK_RESP)
+    pdm.configure(
+        sync_source=SyncSource.INTERNAL, frequency=10000, delay=100, activation=True
+    )
+    # Version handshake, then one single write for the whole configuration
+    assert len(fs.writes) == 2
+    burst = fs.writes[1]
+    frames = []
+    while burst:
+        frames.append(burst[: burst[0]])
+        burst = burst[burst[0] :]
+    assert [f[2] for f in frames] == [Command.WRITE_INSTRUCTION.value] * 4 + [
+        Command.APPLY_ALL_INSTRUCTIONS.value
+    ]
+    assert frames[1][3:5] == Instruction.FREQUENCY.value.to_bytes(2, "big")
+    assert frames[1][5:-1] == (10000).to_bytes(4, "big")
+
+    # __del__ will disable the laser -> provide a two last OK responses
+    fs.queue_response(fake_serial_factory.OK_RESP)
+    fs.queue_response(fake_serial_factory.OK_RESP)
+
+
+def test_configure_validates_before_sending(
+    fake_serial_factory: types.SimpleNamespace,
+) -> None:
+    link = Link("/dev/ttyFAKE")
+    fs = cast(FakeSerial, link.serial)
+    fs.queue_response(version_resp(3, 4, fake_serial_factory.make_response))
+    pdm = PDM(1, link)
+
+    with pytest.raises(ValueError):
+        pdm.configure(frequency=10000, delay=pdm.MAX_DELAY + 1)
+    with pytest.raises(ValueError):
+        pdm.configure(temperature=20.0)
+    assert len(fs.writes) == 1
+
+    # __del__ will disable the laser -> provide a two last OK responses
+    fs.queue_response(fake_serial_factory.OK_RESP)
+    fs.queue_response(fake_serial_factory.OK_RESP)
+
+
+def test_batch_reports_errors_per_instruction(
+    fake_serial_factory: types.SimpleNamespace,
+) -> None:
+    link = Link("/dev/ttyFAKE")
+    fs = cast(FakeSerial, link.serial)
+    fs.queue_response(version_resp(3, 4, fake_serial_factory.make_response))
+    pdm1 = PDM(1, link)
+    fs.queue_response(version_resp(3, 4, fake_serial_factory.make_response))
+    pdm2 = PDM(2, link)
+
+    fs.queue_response(fake_serial_factory.OK_RESP)
+    fs.queue_response(fake_serial_factory.make_response(Status.QUERY_ERROR.value))
+    fs.queue_response(fake_serial_factory.OK_RESP)
+    batch = Batch(link)
+    with pytest.raises(BatchError) as ei:
+        with batch:
+            with pdm1.batch(batch):
+                pdm1.delay = 10
+            with pdm2.batch(batch):
+                pdm2.delay = 20
+                pdm2.apply()
+    assert len(fs.writes) == 3
+    assert len(ei.value.errors) == 1
+    item = ei.value.errors[0]
+    assert item.address == 2
+    assert item.instruction == Instruction.DELAY
+    assert isinstance(item.error, StatusError)
+
+    # __del__ will disable the laser -> provide OK responses for both devices
+    for _ in range(4):
+        fs.queue_response(fake_serial_factory.OK_RESP)
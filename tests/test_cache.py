@@ -0,0 +1,106 @@
+import struct
+import types
+from typing import Callable, cast
+
+from pypdm.pdm import PDM, Link, Instruction, InterlockStatus, Status
+from conftest import FakeSerial
+
+
+def version_resp(
+    v_major: int, v_minor: int, make_response: Callable[[int, bytes], bytes]
+) -> bytes:
+    return make_response(Status.OK.value, bytes([v_major, v_minor]))
+
+
+def make_pdm(fake_serial_factory: types.SimpleNamespace) -> PDM:
+    link = Link("/dev/ttyFAKE")
+    fs = cast(FakeSerial, link.serial)
+    fs.queue_response(version_resp(3, 4, fake_serial_factory.make_response))
+    return PDM(1, link, cache=True)
+
+
+def test_reads_own_writes_without_traffic(
+    fake_serial_factory: types.SimpleNamespace,
+) -> None:
+    pdm = make_pdm(fake_serial_factory)
+    fs = cast(FakeSerial, pdm.link.serial)
+
+    fs.queue_response(fake_serial_factory.OK_RESP)
+    pdm.frequency = 5000
+    assert len(fs.writes) == 2
+    assert pdm.frequency == 5000
+    assert len(fs.writes) == 2
+    assert pdm.shadow is not None
+    assert pdm.shadow.dirty == {Instruction.FREQUENCY}
+
+    fs.queue_response(fake_serial_factory.OK_RESP)
+    pdm.apply()
+    assert pdm.shadow.dirty == frozenset()
+
+    # __del__ will disable the laser -> provide a two last OK responses
+    fs.queue_response(fake_serial_factory.OK_RESP)
+    fs.queue_response(fake_serial_factory.OK_RESP)
+
+
+def test_first_read_fills_cache_and_invalidate(
+    fake_serial_factory: types.SimpleNamespace,
+) -> None:
+    pdm = make_pdm(fake_serial_factory)
+    fs = cast(FakeSerial, pdm.link.serial)
+
+    fs.queue_response(fake_serial_factory.make_response(0, struct.pack(">f", 40.0)))
+    assert pdm.current_percentage == 40.0
+    assert pdm.current_percentage == 40.0
+    assert len(fs.writes) == 2
+
+    assert pdm.shadow is not None
+    pdm.shadow.invalidate(Instruction.CURRENT)
+    fs.queue_response(fake_serial_factory.make_response(0, struct.pack(">f", 50.0)))
+    assert pdm.current_percentage == 50.0
+    assert len(fs.writes) == 3
+
+    # __del__ will disable the laser -> provide a two last OK responses
+    fs.queue_response(fake_serial_factory.OK_RESP)
+    fs.queue_response(fake_serial_factory.OK_RESP)
+
+
+def test_measurements_expire(fake_serial_factory: types.SimpleNamespace) -> None:
+    pdm = make_pdm(fake_serial_factory)
+    fs = cast(FakeSerial, pdm.link.serial)
+    assert pdm.shadow is not None
+
+    # Default maximum age is 0: measurements are always read again
+    fs.queue_response(fake_serial_factory.make_response(0, bytes([1])))
+    fs.queue_response(fake_serial_factory.make_response(0, bytes([0])))
+    assert pdm.interlock_status == InterlockStatus.OPEN
+    assert pdm.interlock_status == InterlockStatus.CLOSED
+    assert len(fs.writes) == 3
+
+    pdm.shadow.measurement_max_age = 60
+    fs.queue_response(fake_serial_factory.make_response(0, struct.pack(">f", 25.0)))
+    assert pdm.temperature == 25.0
+    assert pdm.temperature == 25.0
+    assert len(fs.writes) == 4
+
+    # __del__ will disable the laser -> provide a two last OK responses
+    fs.queue_response(fake_serial_factory.OK_RESP)
+    fs.queue_response(fake_serial_factory.OK_RESP)
+
+
+def test_batch_updates_cache_on_success(
+    fake_serial_factory: types.SimpleNamespace,
+) -> None:
+    pdm = make_pdm(fake_serial_factory)
+    fs = cast(FakeSerial, pdm.link.serial)
+
+    fs.queue_response(fake_serial_factory.OK_RESP)
+    fs.queue_response(fake_serial_factory.OK_RESP)
+    pdm.configure(delay=300)
+    assert pdm.delay == 300
+    assert pdm.shadow is not None
+    assert pdm.shadow.dirty == frozenset()
+    assert len(fs.writes) == 2
+
+    # __del__ will disable the laser -> provide a two last OK responses
+    fs.queue_response(fake_serial_factory.OK_RESP)
+    fs.queue_response(fake_serial_factory.OK_RESP)
@@ -0,0 +1,54 @@
+import os
+import time
+
+import pytest
+
+import pypdm.pdm as pdm_mod
+from pypdm import Link, PDMFleet, FleetError, ThreadedLink
+from pypdm.simulator import PtySimulator, SimulatedBus, SimulatedPDM
+from conftest import BusSerial
+
+
+@pytest.fixture
+def bus(monkeypatch: pytest.MonkeyPatch) -> SimulatedBus:
+    bus = SimulatedBus(
+        [SimulatedPDM(2, "3.4"), SimulatedPDM(17, "3.7"), SimulatedPDM(200, "3.6")]
+    )
+    monkeypatch.setattr(
+        pdm_mod.serial, "Serial", lambda dev, *args, **kwargs: BusSerial(bus)
+    )
+    return bus
+
+
+def test_discover_pipelined(bus: SimulatedBus) -> None:
+    link = Link("/dev/ttyA")
+    assert link.discover() == {2: "3.4", 17: "3.7", 200: "3.6"}
+    # 16 bursts of address probes, then one burst of version reads.
+    assert bus.frames == 255 + 3
+    assert link.timeout == 1.0
+
+
+def test_discover_sequential(bus: SimulatedBus) -> None:
+    link = ThreadedLink("/dev/ttyA")
+    try:
+        assert link.discover(range(1, 20), pipelined=False) == {2: "3.4", 17: "3.7"}
+        assert bus.frames == 19
+    finally:
+        link.close()
+
+
+@pytest.mark.skipif(os.name != "posix", reason="Requires pseudo-terminals")
+def test_fleet_discover_in_parallel() -> None:
+    buses = [
+        SimulatedBus([SimulatedPDM(1), SimulatedPDM(5)], latency=0.001),
+        SimulatedBus([SimulatedPDM(3, "3.5")], latency=0.001),
+    ]
+    with PtySimulator(buses[0]) as a, PtySimulator(buses[1]) as b:
+        start = time.monotonic()
+        found = PDMFleet.discover([a.path, b.path], addresses=range(1, 33))
+        assert time.monotonic() - start < 2
+        assert found == {(a.path, 1): "3.7", (a.path, 5): "3.7", (b.path, 3): "3.5"}
+        with pytest.raises(FleetError) as e:
+            PDMFleet.discover([a.path, "/dev/pypdm-missing"], addresses=[1])
+        assert e.value.results == {(a.path, 1): "3.7"}
+        assert list(e.value.errors) == [("/dev/pypdm-missing", 0)]
@@ -0,0 +1,141 @@
+import types
+from typing import Callable, cast
+
+import pytest
+
+from pypdm.pdm import PDM, Link, BatchError, Command, ResponseTimeout, Status
+from conftest import FakeSerial
+
+
+def version_resp(
+    v_major: int, v_minor: int, make_response: Callable[[int, bytes], bytes]
+) -> bytes:
+    return make_response(Status.OK.value, bytes([v_major, v_minor]))
+
+
+def make_pdm(fake_serial_factory: types.SimpleNamespace) -> PDM:
+    link = Link("/dev/ttyFAKE")
+    fs = cast(FakeSerial, link.serial)
+    fs.queue_response(version_resp(3, 4, fake_serial_factory.make_response))
+    return PDM(1, link, elide_writes=True)
+
+
+def test_unchanged_writes_are_skipped(
+    fake_serial_factory: types.SimpleNamespace,
+) -> None:
+    pdm = make_pdm(fake_serial_factory)
+    fs = cast(FakeSerial, pdm.link.serial)
+
+    # First apply is always transmitted, volatile memory is unknown
+    fs.queue_response(fake_serial_factory.OK_RESP)
+    fs.queue_response(fake_serial_factory.OK_RESP)
+    pdm.delay = 100
+    pdm.apply()
+    assert len(fs.writes) == 3
+
+    pdm.delay = 100
+    pdm.apply()
+    assert len(fs.writes) == 3
+    assert pdm.elided.writes == 1
+    assert pdm.elided.applies == 1
+    assert pdm.elided.frames == 2
+
+    fs.queue_response(fake_serial_factory.OK_RESP)
+    fs.queue_response(fake_serial_factory.OK_RESP)
+    pdm.delay = 200
+    pdm.apply()
+    assert len(fs.writes) == 5
+    assert pdm.elided.frames == 2
+
+    # __del__ bypasses elision -> provide a two last OK responses
+    fs.queue_response(fake_serial_factory.OK_RESP)
+    fs.queue_response(fake_serial_factory.OK_RESP)
+
+
+def test_elision_in_batch(fake_serial_factory: types.SimpleNamespace) -> None:
+    pdm = make_pdm(fake_serial_factory)
+    fs = cast(FakeSerial, pdm.link.serial)
+
+    for _ in range(3):
+        fs.queue_response(fake_serial_factory.OK_RESP)
+    pdm.configure(delay=100, pulse_width=1000)
+
+    # Only the frequency changes
+    fs.queue_response(fake_serial_factory.OK_RESP)
+    fs.queue_response(fake_serial_factory.OK_RESP)
+    pdm.configure(delay=100, pulse_width=1000, frequency=500)
+    burst = fs.writes[-1]
+    assert burst[0] + burst[burst[0]] == len(burst)
+    assert burst[2] == Command.WRITE_INSTRUCTION.value
+    assert burst[burst[0] + 2] == Command.APPLY_ALL_INSTRUCTIONS.value
+    assert pdm.elided.writes == 2
+
+    # Nothing changes: no transmission at all
+    pdm.configure(delay=100, pulse_width=1000, frequency=500)
+    assert len(fs.writes) == 3
+    assert pdm.elided.frames == 6
+
+    # __del__ bypasses elision -> provide a two last OK responses
+    fs.queue_response(fake_serial_factory.OK_RESP)
+    fs.queue_response(fake_serial_factory.OK_RESP)
+
+
+def test_value_restored_within_batch_is_written(
+    fake_serial_factory: types.SimpleNamespace,
+) -> None:
+    pdm = make_pdm(fake_serial_factory)
+    fs = cast(FakeSerial, pdm.link.serial)
+
+    for _ in range(2):
+        fs.queue_response(fake_serial_factory.OK_RESP)
+    pdm.configure(delay=100)
+
+    for _ in range(3):
+        fs.queue_response(fake_serial_factory.OK_RESP)
+    with pdm.batch():
+        pdm.delay = 200
+        # Device holds 100, but 200 is pending: must be transmitted.
+        pdm.delay = 100
+        pdm.apply()
+    assert pdm.elided.frames == 0
+
+    # __del__ bypasses elision -> provide a two last OK responses
+    fs.queue_response(fake_serial_factory.OK_RESP)
+    fs.queue_response(fake_serial_factory.OK_RESP)
+
+
+def test_failed_write_is_not_elided(
+    fake_serial_factory: types.SimpleNamespace,
+) -> None:
+    pdm = make_pdm(fake_serial_factory)
+    fs = cast(FakeSerial, pdm.link.serial)
+    pdm.link.timeout = 0.01
+
+    for _ in range(2):
+        fs.queue_response(fake_serial_factory.OK_RESP)
+    pdm.configure(delay=100)
+
+    # Timed out: the device may hold 200, or still 100.
+    with pytest.raises(ResponseTimeout):
+        pdm.delay = 200
+    fs.queue_response(fake_serial_factory.OK_RESP)
+    fs.queue_response(fake_serial_factory.OK_RESP)
+    pdm.delay = 100
+    pdm.apply()
+    assert len(fs.writes) == 5
+    assert pdm.elided.frames == 0
+
+    # Failed item of a batch.
+    fs.queue_response(fake_serial_factory.make_response(Status.TIMEOUT.value))
+    with pytest.raises(BatchError):
+        pdm.configure(delay=300, apply=False)
+    fs.queue_response(fake_serial_factory.OK_RESP)
+    fs.queue_response(fake_serial_factory.OK_RESP)
+    pdm.configure(delay=100)
+    assert len(fs.writes) == 7
+    assert fs.writes[-1][2] == Command.WRITE_INSTRUCTION.value
+    assert pdm.elided.frames == 0
+
+    # __del__ bypasses elision -> provide a two last OK responses
+    fs.queue_response(fake_serial_factory.OK_RESP)
+    fs.queue_response(fake_serial_factory.OK_RESP)
@@ -0,0 +1,53 @@
+import pytest
+
+from pypdm import PDM, Batch, ErrorFlags, Link, PDMGroup, ProtocolError
+from pypdm.pdm import decode_error_code
+from pypdm.simulator import SimulatedBus, SimulatedPDM
+from conftest import BusSerial
+
+
+def test_decode() -> None:
+    assert decode_error_code(b"\x00\x00") == 0
+    flags = decode_error_code(b"\x01\x04")
+    assert flags == ErrorFlags.BIT8 | ErrorFlags.BIT2
+    assert flags.bits == [ErrorFlags.BIT2, ErrorFlags.BIT8]
+    with pytest.raises(ProtocolError):
+        decode_error_code(b"")
+
+
+def test_read_errors() -> None:
+    bus = SimulatedBus([SimulatedPDM(1), SimulatedPDM(2)])
+    link = Link(BusSerial(bus), metrics=True)
+    with PDM(1, link, cache=True) as pdm1, PDM(2, link) as pdm2:
+        assert pdm1.error_code == 0
+        bus[1].error_code = 0x0003
+        assert pdm1.read_errors() == ErrorFlags.BIT0 | ErrorFlags.BIT1
+
+        # Queued reads are pipelined with the other commands of the batch.
+        bus[2].error_code = 0x8000
+        results = {}
+        frames = bus.frames
+        with Batch(link) as batch:
+            for pdm in (pdm1, pdm2):
+                with pdm.batch(batch):
+                    pdm.delay = 100
+                    queued = pdm.read_errors(
+                        lambda flags, a=pdm.address: results.__setitem__(a, flags)
+                    )
+                    assert queued is None
+        assert bus.frames == frames + 4
+        assert results == {1: ErrorFlags(3), 2: ErrorFlags.BIT15}
+
+        snapshot = link.metrics.snapshot()  # type: ignore
+        assert snapshot["errors"]["device"] == {"BIT0": 2, "BIT1": 2, "BIT15": 1}
+        assert snapshot["commands"]["READ_ERROR_CODE"]["total"]["count"] == 2
+
+
+def test_group() -> None:
+    bus = SimulatedBus([SimulatedPDM(1), SimulatedPDM(2)])
+    group = PDMGroup(Link(BusSerial(bus)), [1, 2])
+    bus[2].error_code = 0x0010
+    frames = bus.frames
+    assert group.read_errors() == {1: ErrorFlags(0), 2: ErrorFlags.BIT4}
+    assert bus.frames == frames + 2
+    assert group.read("error_code")[2] == ErrorFlags.BIT4
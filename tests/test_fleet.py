@@ -0,0 +1,108 @@
+import struct
+import types
+from typing import List
+import pytest
+
+from pypdm.pdm import BatchError, Command, Instruction, Status, StatusError
+import pypdm.pdm as pdm_mod
+from pypdm.fleet import PDMFleet, FleetError
+from conftest import make_response
+
+
+class RespondingSerial:
+    """
+    Answers every command with OK. Devices report protocol 3.4, a
+    temperature of 10 times their address and a zero delay. Device 9 does not
+    accept delay writes nor reads.
+    """
+
+    def __init__(self, dev: str, baudrate: int = 125000, **kwargs) -> None:
+        self.dev = dev
+        self.writes: List[bytes] = []
+        self._rx_buffer = bytearray()
+        self.closed = False
+
+    def write(self, b: bytes) -> int:
+        self.writes.append(bytes(b))
+        b = bytes(b)
+        while b:
+            self._rx_buffer += self.respond(b[: b[0]])
+            b = b[b[0] :]
+        return len(b)
+
+    def respond(self, frame: bytes) -> bytes:
+        address, command = frame[1], frame[2]
+        if command == Command.READ_PROTOCOL_VERSION.value:
+            return make_response(Status.OK.value, bytes([3, 4]))
+        delay = Instruction.DELAY.value.to_bytes(2, "big")
+        if address == 9 and frame[3:5] == delay:
+            return make_response(Status.QUERY_ERROR.value)
+        if command == Command.READ_INSTRUCTION.value:
+            if frame[3:5] == delay:
+                return make_response(Status.OK.value, struct.pack(">I", 0))
+            assert frame[3:5] == Instruction.TEMPERATURE.value.to_bytes(2, "big")
+            return make_response(Status.OK.value, struct.pack(">f", address * 10))
+        return make_response(Status.OK.value)
+
+    def read(self, n: int) -> bytes:
+        data = self._rx_buffer[:n]
+        del self._rx_buffer[:n]
+        return bytes(data)
+
+    def close(self) -> None:
+        self.closed = True
+
+
+@pytest.fixture
+def responding_serial(monkeypatch: pytest.MonkeyPatch) -> List[RespondingSerial]:
+    created: List[RespondingSerial] = []
+
+    def factory(dev: str, *args, **kwargs) -> RespondingSerial:
+        serial = RespondingSerial(dev, *args, **kwargs)
+        created.append(serial)
+        return serial
+
+    monkeypatch.setattr(pdm_mod.serial, "Serial", factory)
+    return created
+
+
+def test_fleet_operations(responding_serial: List[RespondingSerial]) -> None:
+    with PDMFleet({"/dev/ttyA": [1, 2], "/dev/ttyB": [3]}) as fleet:
+        assert fleet.devices == [("/dev/ttyA", 1), ("/dev/ttyA", 2), ("/dev/ttyB", 3)]
+        fleet.configure(delay=10, activation=True)
+        assert fleet.snapshot(["temperature"]) == {
+            ("/dev/ttyA", 1): {"temperature": 10.0},
+            ("/dev/ttyA", 2): {"temperature": 20.0},
+            ("/dev/ttyB", 3): {"temperature": 30.0},
+        }
+        fleet.safe_off()
+        # Handshakes, then one burst per operation on each port
+        assert [len(s.writes) for s in responding_serial] == [5, 4]
+    # The fleet closes the links it opened.
+    assert all(s.closed for s in responding_serial)
+
+
+def test_fleet_errors_per_device(responding_serial: List[RespondingSerial]) -> None:
+    with PDMFleet({"/dev/ttyA": [1, 9], "/dev/ttyB": [3]}) as fleet:
+        with pytest.raises(FleetError) as ei:
+            fleet.configure(delay=10)
+    assert list(ei.value.errors) == [("/dev/ttyA", 9)]
+    assert isinstance(ei.value.errors[("/dev/ttyA", 9)], StatusError)
+    assert ei.value.results == {("/dev/ttyA", 1): None, ("/dev/ttyB", 3): None}
+
+
+def test_fleet_partial_snapshot(responding_serial: List[RespondingSerial]) -> None:
+    with PDMFleet({"/dev/ttyA": [1, 9], "/dev/ttyB": [3]}) as fleet:
+        with pytest.raises(FleetError) as ei:
+            fleet.snapshot(["temperature", "delay"])
+        # Handshakes, then all the fields in one burst per port.
+        assert [len(s.writes) for s in responding_serial] == [3, 2]
+    assert ei.value.results == {
+        ("/dev/ttyA", 1): {"temperature": 10.0, "delay": 0},
+        ("/dev/ttyA", 9): {"temperature": 90.0},
+        ("/dev/ttyB", 3): {"temperature": 30.0, "delay": 0},
+    }
+    assert list(ei.value.errors) == [("/dev/ttyA", 9)]
+    error = ei.value.errors[("/dev/ttyA", 9)]
+    assert isinstance(error, BatchError)
+    assert [item.instruction for item in error.errors] == [Instruction.DELAY]
@@ -0,0 +1,112 @@
+import struct
+import types
+from typing import cast
+import pytest
+
+from pypdm.pdm import (
+    Link,
+    BatchError,
+    Command,
+    ProtocolError,
+    Status,
+    StatusError,
+    decode_field,
+)
+from pypdm.group import PDMGroup
+from conftest import FakeSerial
+
+
+def split_frames(burst: bytes) -> list:
+    frames = []
+    while burst:
+        frames.append(burst[: burst[0]])
+        burst = burst[burst[0] :]
+    return frames
+
+
+def make_group(fake_serial_factory: types.SimpleNamespace) -> PDMGroup:
+    link = Link("/dev/ttyFAKE")
+    fs = cast(FakeSerial, link.serial)
+    for _ in range(3):
+        fs.queue_response(
+            fake_serial_factory.make_response(Status.OK.value, bytes([3, 4]))
+        )
+    return PDMGroup(link, [1, 2, 3])
+
+
+def queue_del_responses(fake_serial_factory: types.SimpleNamespace, fs: FakeSerial):
+    # __del__ will disable the lasers -> provide two OK responses per device
+    for _ in range(6):
+        fs.queue_response(fake_serial_factory.OK_RESP)
+
+
+def test_group_configure_single_burst(
+    fake_serial_factory: types.SimpleNamespace,
+) -> None:
+    group = make_group(fake_serial_factory)
+    fs = cast(FakeSerial, group.link.serial)
+    for _ in range(6):
+        fs.queue_response(fake_serial_factory.OK_RESP)
+    group.configure(activation=True)
+    assert len(fs.writes) == 4
+    frames = split_frames(fs.writes[-1])
+    assert [(f[1], f[2]) for f in frames] == [
+        (1, Command.WRITE_INSTRUCTION.value),
+        (1, Command.APPLY_ALL_INSTRUCTIONS.value),
+        (2, Command.WRITE_INSTRUCTION.value),
+        (2, Command.APPLY_ALL_INSTRUCTIONS.value),
+        (3, Command.WRITE_INSTRUCTION.value),
+        (3, Command.APPLY_ALL_INSTRUCTIONS.value),
+    ]
+    queue_del_responses(fake_serial_factory, fs)
+
+
+def test_group_read_per_address(fake_serial_factory: types.SimpleNamespace) -> None:
+    group = make_group(fake_serial_factory)
+    fs = cast(FakeSerial, group.link.serial)
+    for t in (20.0, 21.0, 22.0):
+        fs.queue_response(fake_serial_factory.make_response(0, struct.pack(">f", t)))
+    assert group.read("temperature") == {1: 20.0, 2: 21.0, 3: 22.0}
+    assert len(fs.writes) == 4
+    with pytest.raises(ValueError):
+        group.read("mode")
+    queue_del_responses(fake_serial_factory, fs)
+
+
+def test_group_errors_per_address(fake_serial_factory: types.SimpleNamespace) -> None:
+    group = make_group(fake_serial_factory)
+    fs = cast(FakeSerial, group.link.serial)
+    fs.queue_response(fake_serial_factory.OK_RESP)
+    fs.queue_response(fake_serial_factory.make_response(Status.TIMEOUT.value))
+    fs.queue_response(fake_serial_factory.OK_RESP)
+    with pytest.raises(BatchError) as ei:
+        group.apply()
+    assert [item.address for item in ei.value.errors] == [2]
+    assert isinstance(ei.value.errors[0].error, StatusError)
+
+    # Protocol 3.7 instructions are not read from older devices
+    with pytest.raises(BatchError) as ei:
+        group.read("software_control_mode")
+    assert len(ei.value.errors) == 3
+    assert len(fs.writes) == 4
+    queue_del_responses(fake_serial_factory, fs)
+
+
+def test_group_read_rejects_invalid_values(
+    fake_serial_factory: types.SimpleNamespace,
+) -> None:
+    # Same verifications as the PDM properties.
+    assert decode_field("activation", bytes([1])) is True
+    with pytest.raises(ProtocolError):
+        decode_field("activation", bytes([2]))
+    with pytest.raises(ProtocolError):
+        decode_field("offset_current", struct.pack(">f", -1.0))
+    with pytest.raises(ProtocolError):
+        decode_field("current_percentage", struct.pack(">f", 101.0))
+    group = make_group(fake_serial_factory)
+    fs = cast(FakeSerial, group.link.serial)
+    for value in (0, 2, 1):
+        fs.queue_response(fake_serial_factory.make_response(0, bytes([value])))
+    with pytest.raises(ProtocolError):
+        group.read("activation")
+    queue_del_responses(fake_serial_factory, fs)
@@ -0,0 +1,120 @@
+import json
+import os
+import time
+
+import pytest
+
+import pypdm.pdm as pdm_mod
+from pypdm import PDM, Link, ThreadedLink
+from pypdm.identity import DeviceIdentity, IdentityRegistry
+from pypdm.simulator import SimulatedBus, SimulatedPDM
+from conftest import BusSerial
+
+
+@pytest.fixture
+def bus(monkeypatch: pytest.MonkeyPatch) -> SimulatedBus:
+    bus = SimulatedBus([SimulatedPDM(1, version="3.5", maximum_current=1000.0)])
+    monkeypatch.setattr(
+        pdm_mod.serial, "Serial", lambda dev, *args, **kwargs: BusSerial(bus)
+    )
+    return bus
+
+
+def test_identity_persisted_across_links(bus: SimulatedBus, tmp_path) -> None:
+    path = str(tmp_path / "identities.json")
+    pdm = PDM(1, Link("/dev/ttyA", identities=path))
+    assert pdm.maximum_current == 1000.0
+    assert bus.frames == 2
+    del pdm
+    with open(path) as f:
+        (entry,) = json.load(f)["devices"]
+    assert entry["port"] == "/dev/ttyA"
+    assert entry["version"] == "3.5"
+    assert entry["maximum_current"] == 1000.0
+
+    # No handshake anymore.
+    frames = bus.frames
+    pdm = PDM(1, Link("/dev/ttyA", identities=path))
+    assert pdm.version == "3.5"
+    pdm.current = 500
+    assert bus.frames == frames + 1
+    del pdm
+
+    # Other port, unknown device.
+    frames = bus.frames
+    pdm = PDM(1, Link("/dev/ttyB", identities=path))
+    assert bus.frames == frames + 1
+    del pdm
+
+
+def test_identity_expires() -> None:
+    registry = IdentityRegistry(max_age=10)
+    registry.update("/dev/ttyA", 1, version="3.7", maximum_current=10.0)
+    identity = registry.get("/dev/ttyA", 1)
+    assert identity == DeviceIdentity("3.7", 10.0, None, identity.validated)
+    identity.validated = time.time() - 11
+    assert registry.get("/dev/ttyA", 1) is None
+    # Reading a current does not validate the version again.
+    registry.update("/dev/ttyA", 1, maximum_current=20.0)
+    assert registry.get("/dev/ttyA", 1) is None
+    assert registry.get("/dev/ttyA", 1, expired=True).maximum_current == 20.0
+    registry.update("/dev/ttyA", 1, version="3.7")
+    assert registry.get("/dev/ttyA", 1).maximum_current == 20.0
+    # A different version is a different device.
+    registry.update("/dev/ttyA", 1, version="3.4")
+    assert registry.get("/dev/ttyA", 1).maximum_current is None
+    registry.forget("/dev/ttyA")
+    assert len(registry) == 0
+
+
+def test_registry_file_merge_and_corruption(tmp_path) -> None:
+    path = str(tmp_path / "identities.json")
+    first = IdentityRegistry(path)
+    second = IdentityRegistry(path)
+    first.update("/dev/ttyA", 1, version="3.7")
+    second.update("/dev/ttyB", 2, version="3.4")
+    assert len(IdentityRegistry(path)) == 2
+    second.forget(address=2)
+    assert len(IdentityRegistry(path)) == 1
+    with open(path, "w") as f:
+        f.write("{")
+    assert len(IdentityRegistry(path)) == 0
+    assert os.listdir(str(tmp_path)) == ["identities.json"]
+
+
+def test_background_revalidation(bus: SimulatedBus) -> None:
+    registry = IdentityRegistry()
+    # Stale entry: the device has been replaced.
+    registry.update("/dev/ttyA", 1, version="3.5", maximum_current=2000.0)
+    link = ThreadedLink("/dev/ttyA", identities=registry)
+    try:
+        pdm = PDM(1, link)
+        deadline = time.monotonic() + 5
+        while registry.get("/dev/ttyA", 1).maximum_current != 1000.0:
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+        assert pdm.maximum_current == 1000.0
+        del pdm
+    finally:
+        link.close()
+
+
+def test_expired_identity_reads_currents(bus: SimulatedBus, tmp_path) -> None:
+    path = str(tmp_path / "identities.json")
+    registry = IdentityRegistry(path, max_age=10)
+    registry.update("/dev/ttyA", 1, version="3.5", maximum_current=2000.0)
+    registry.get("/dev/ttyA", 1).validated = time.time() - 11
+    frames = bus.frames
+    pdm = PDM(1, Link("/dev/ttyA", identities=registry))
+    # Version and maximum current are both verified.
+    assert bus.frames == frames + 2
+    assert registry.get("/dev/ttyA", 1).maximum_current == 1000.0
+    assert pdm.maximum_current == 1000.0
+    del pdm
+
+    # Confirming a valid identity does not rewrite the file.
+    os.utime(path, ns=(0, 0))
+    registry.update("/dev/ttyA", 1, version="3.5")
+    assert os.stat(path).st_mtime_ns == 0
+    registry.update("/dev/ttyA", 1, maximum_mean_current=500.0)
+    assert os.stat(path).st_mtime_ns != 0
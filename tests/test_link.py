@@ -1,10 +1,21 @@
-
 import pytest
 
-from pypdm.pdm import Link, Command, StatusError, ChecksumError, ProtocolError, Status
+from pypdm.pdm import (
+    Link,
+    Command,
+    StatusError,
+    ChecksumError,
+    ProtocolError,
+    ResponseTimeout,
+    Status,
+    FrameEncoder,
+    FrameParser,
+    checksum,
+)
+import time
 import types
-from typing import cast
-from conftest import FakeSerial
+from typing import List, Optional, cast
+from conftest import FakeSerial, OK_RESP, calc_chk
 
 
 def test_send_frame_and_checksum(fake_serial_factory: types.SimpleNamespace) -> None:
@@ -48,7 +59,9 @@ def test_checksum_error_detected(fake_serial_factory: types.SimpleNamespace) ->
         link.command(1, Command.READ_PROTOCOL_VERSION, b"")
 
 
-def test_protocol_error_on_short_length(fake_serial_factory: types.SimpleNamespace) -> None:
+def test_protocol_error_on_short_length(
+    fake_serial_factory: types.SimpleNamespace,
+) -> None:
     link = Link("/dev/ttyFAKE")
     fs = cast(FakeSerial, link.serial)
     # LEN=2 (less than 3) -> ProtocolError
@@ -58,3 +71,140 @@ def test_protocol_error_on_short_length(fake_serial_factory: types.SimpleNamespa
         link.command(1, Command.READ_PROTOCOL_VERSION, b"")
 
 
+def test_encoder_matches_checksum_and_caches() -> None:
+    encoder = FrameEncoder()
+    data = bytes([0, 14, 0, 0, 1, 44])
+    frame = encoder.encode(3, Command.WRITE_INSTRUCTION, data)
+    assert frame[:3] == bytes([10, 3, Command.WRITE_INSTRUCTION.value])
+    assert frame[3:-1] == data
+    assert frame[-1] == calc_chk(frame[:-1]) == checksum(frame[:-1])
+    assert encoder.encode(3, Command.WRITE_INSTRUCTION, bytearray(data)) is frame
+    assert len(encoder) == 1
+    with pytest.raises(ValueError):
+        encoder.encode(1, Command.WRITE_INSTRUCTION, bytes(252))
+
+
+def test_frame_parser_incremental_and_pipelined(
+    fake_serial_factory: types.SimpleNamespace,
+) -> None:
+    make_response = fake_serial_factory.make_response
+    parser = FrameParser(size=256)
+    first = make_response(Status.OK.value, bytes([3, 4]))
+    parser.feed(first[:2])
+    assert parser.next_frame() is None
+    assert parser.needed() == len(first) - 2
+    parser.feed(first[2:] + make_response(Status.OK.value) + first[:1])
+    frames = [bytes(f) for f in parser.frames()]
+    assert frames == [first, make_response(Status.OK.value)]
+    assert parser.pending == 1
+
+    # Bad checksum: frame is consumed and following ones are still parsed
+    parser.reset()
+    bad = bytearray(first)
+    bad[-1] ^= 0xFF
+    parser.feed(bytes(bad) + first)
+    with pytest.raises(ChecksumError):
+        parser.next_frame()
+    assert parser.next_frame() == first
+
+    # Buffer is compacted when reaching its end
+    for _ in range(100):
+        parser.feed(first[:3])
+        parser.feed(first[3:])
+        assert parser.next_frame() == first
+
+
+def test_frame_parser_reads_waiting_bytes_at_once() -> None:
+    class Stream:
+        def __init__(self, data: bytes) -> None:
+            self.data = bytearray(data)
+            self.calls = 0
+
+        @property
+        def in_waiting(self) -> int:
+            return len(self.data)
+
+        def readinto(self, b: memoryview) -> int:
+            self.calls += 1
+            n = min(len(b), len(self.data))
+            b[:n] = self.data[:n]
+            del self.data[:n]
+            return n
+
+    stream = Stream(OK_RESP * 10)
+    parser = FrameParser()
+    assert parser.fill(stream) == 30
+    assert len(list(parser.frames())) == 10
+    assert stream.calls == 1
+
+
+def test_response_timeout(fake_serial_factory: types.SimpleNamespace) -> None:
+    link = Link("/dev/ttyFAKE", timeout=0.05)
+    fs = cast(FakeSerial, link.serial)
+    assert fs.timeout == 0.05
+    # Nothing queued: the read returns nothing once the timeout expired.
+    with pytest.raises(ResponseTimeout):
+        link.command(1, Command.READ_PROTOCOL_VERSION, b"")
+    link.timeout = 0.2
+    assert fs.timeout == 0.2
+
+
+def test_read_retried_after_checksum_error(
+    fake_serial_factory: types.SimpleNamespace,
+) -> None:
+    link = Link("/dev/ttyFAKE", retries=2, backoff=0)
+    fs = cast(FakeSerial, link.serial)
+    bad = bytearray(fake_serial_factory.make_response(Status.OK.value, b"\x07"))
+    bad[-1] ^= 0xFF
+    fs.queue_response(bytes(bad))
+    fs.queue_response(fake_serial_factory.make_response(Status.OK.value, b"\x05"))
+    assert link.command(1, Command.READ_ADDRESS, b"") == b"\x00\x05"
+    assert len(fs.writes) == 2
+    assert fs.writes[0] == fs.writes[1]
+
+
+def test_retryable_status_and_writes_not_retried(
+    fake_serial_factory: types.SimpleNamespace,
+) -> None:
+    link = Link("/dev/ttyFAKE", retries=1, backoff=0)
+    fs = cast(FakeSerial, link.serial)
+    fs.queue_response(fake_serial_factory.make_response(Status.CHECKSUM_ERROR.value))
+    fs.queue_response(fake_serial_factory.OK_RESP)
+    link.command(1, Command.READ_PROTOCOL_VERSION, b"")
+    assert len(fs.writes) == 2
+    # State changing commands are transmitted once.
+    fs.queue_response(fake_serial_factory.make_response(Status.TIMEOUT.value))
+    with pytest.raises(StatusError):
+        link.command(1, Command.APPLY_ALL_INSTRUCTIONS, b"")
+    assert len(fs.writes) == 3
+
+
+class TricklingSerial:
+    """Receives the first byte of a response, then nothing."""
+
+    def __init__(self) -> None:
+        self.timeout: Optional[float] = None
+        self.write_timeout: Optional[float] = None
+        self.timeouts: List[Optional[float]] = []
+
+    def write(self, b: bytes) -> int:
+        return len(b)
+
+    def read(self, n: int) -> bytes:
+        self.timeouts.append(self.timeout)
+        if len(self.timeouts) == 1:
+            time.sleep(0.02)
+            return bytes([5])
+        return b""
+
+
+def test_response_timeout_includes_partial_reads() -> None:
+    serial = TricklingSerial()
+    link = Link(serial, timeout=0.5)  # type: ignore
+    with pytest.raises(ResponseTimeout):
+        link.command(1, Command.READ_PROTOCOL_VERSION, b"")
+    # The second read only waits for the remaining time.
+    first, second = serial.timeouts[:2]
+    assert first == 0.5
+    assert second is not None and second < 0.49
+    assert serial.timeout == 0.5
@@ -0,0 +1,98 @@
+import json
+import types
+from typing import cast
+
+import pytest
+
+from pypdm.pdm import (
+    Command,
+    INSTRUCTION_IDS,
+    Instruction,
+    LatencyHistogram,
+    Link,
+    LinkMetrics,
+    ChecksumError,
+    ResponseTimeout,
+    Status,
+    StatusError,
+)
+from conftest import FakeSerial
+
+
+def test_histogram_buckets_and_percentiles() -> None:
+    h = LatencyHistogram()
+    for _ in range(90):
+        h.record(1500)
+    for _ in range(10):
+        h.record(100_000_000)
+    assert h.count == 100
+    assert h.buckets[1] == 90
+    assert h.min == pytest.approx(1.5e-6)
+    assert h.max == pytest.approx(0.1)
+    assert h.total == pytest.approx(1.000135)
+    assert h.percentile(50) == pytest.approx(2e-6)
+    assert h.percentile(99) == pytest.approx(0.1)
+    h.record(100_000_000_000)
+    assert h.buckets[-1] == 1
+    assert h.percentile(100) == pytest.approx(100.0)
+    h.reset()
+    assert h.count == 0
+    assert sum(h.buckets) == 0
+    assert h.snapshot()["min"] == 0.0
+
+
+def test_link_metrics_disabled_by_default(
+    fake_serial_factory: types.SimpleNamespace,
+) -> None:
+    link = Link("/dev/ttyFAKE")
+    assert link.metrics is None
+
+
+def test_link_records_latencies_per_instruction(
+    fake_serial_factory: types.SimpleNamespace,
+) -> None:
+    link = Link("/dev/ttyFAKE", metrics=True)
+    fs = cast(FakeSerial, link.serial)
+    fs.queue_response(fake_serial_factory.OK_RESP)
+    fs.queue_response(fake_serial_factory.OK_RESP)
+    fs.queue_response(fake_serial_factory.OK_RESP)
+    ids = INSTRUCTION_IDS[Instruction.TEMPERATURE]
+    link.command(1, Command.READ_INSTRUCTION, ids)
+    link.command(1, Command.READ_INSTRUCTION, ids)
+    link.command(1, Command.APPLY_ALL_INSTRUCTIONS)
+    metrics = link.metrics
+    assert metrics is not None
+    stats = metrics.commands[(Command.READ_INSTRUCTION, Instruction.TEMPERATURE)]
+    assert stats.total.count == 2
+    assert stats.first_byte.count == 2
+    assert metrics.commands[(Command.APPLY_ALL_INSTRUCTIONS, None)].total.count == 1
+    snapshot = metrics.snapshot()
+    json.dumps(snapshot)
+    assert snapshot["commands"]["READ_INSTRUCTION:TEMPERATURE"]["total"]["count"] == 2
+    metrics.reset()
+    assert stats.total.count == 0
+
+
+def test_link_counts_errors(fake_serial_factory: types.SimpleNamespace) -> None:
+    link = Link("/dev/ttyFAKE", timeout=0.01, metrics=True)
+    fs = cast(FakeSerial, link.serial)
+    fs.queue_response(fake_serial_factory.make_response(Status.TIMEOUT.value))
+    with pytest.raises(StatusError):
+        link.command(1, Command.READ_ADDRESS)
+    bad = bytearray(fake_serial_factory.OK_RESP)
+    bad[-1] ^= 0xFF
+    fs.queue_response(bytes(bad))
+    with pytest.raises(ChecksumError):
+        link.command(1, Command.READ_ADDRESS)
+    with pytest.raises(ResponseTimeout):
+        link.command(1, Command.READ_ADDRESS)
+    fs.queue_response(fake_serial_factory.make_response(Status.TIMEOUT.value))
+    link.transfer(link.encode(1, Command.READ_ADDRESS), 1)
+    metrics = link.metrics
+    assert isinstance(metrics, LinkMetrics)
+    assert metrics.status_errors == {Status.TIMEOUT.value: 2}
+    assert metrics.checksum_errors == 1
+    assert metrics.timeouts == 1
+    assert metrics.snapshot()["errors"]["status"] == {"TIMEOUT": 2}
+    # Failed commands are not part of the latency statistics.
+    assert metrics.commands == {}
@@ -0,0 +1,124 @@
+import time
+
+import pytest
+
+from pypdm import PDM, Link
+from pypdm.pdm import Command
+from pypdm.recording import (
+    RX,
+    TX,
+    Recorder,
+    RecordingReader,
+    ReplayMismatch,
+    ReplaySerial,
+)
+from pypdm.simulator import SimulatedBus, SimulatedPDM
+from conftest import BusSerial
+
+
+class ClosingBusSerial(BusSerial):
+    """Remembers being closed."""
+
+    port = "/dev/ttyREC"
+    closed = False
+
+    def close(self) -> None:
+        self.closed = True
+
+
+class SlowBusSerial(BusSerial):
+    """Answers after some delay."""
+
+    def read(self, n: int) -> bytes:
+        time.sleep(0.01)
+        return super().read(n)
+
+
+def record(path: str, serial: BusSerial) -> None:
+    serial.port = "/dev/ttyREC"  # type: ignore
+    link = Link(serial)
+    with Recorder(link, path):
+        pdm = PDM(1, link)
+        pdm.configure(delay=100, activation=True)
+        assert pdm.temperature == 25.0
+        assert pdm.delay == 100
+        del pdm
+
+
+def test_record_and_replay(tmp_path) -> None:
+    path = str(tmp_path / "session.pdmrec")
+    record(path, BusSerial(SimulatedBus([SimulatedPDM(1)])))
+    with RecordingReader(path) as reader:
+        assert reader.port == "/dev/ttyREC"
+        records = list(reader)
+    assert records[0].direction == TX
+    assert {r.direction for r in records} == {TX, RX}
+    assert all(a.time <= b.time for a, b in zip(records, records[1:]))
+
+    serial = ReplaySerial(path)
+    link = Link(serial)
+    assert link.port == "/dev/ttyREC"
+    pdm = PDM(1, link)
+    pdm.configure(delay=100, activation=True)
+    assert pdm.temperature == 25.0
+    assert pdm.delay == 100
+    del pdm
+    assert serial.exhausted
+
+    serial = ReplaySerial(path)
+    pdm = PDM(1, Link(serial))
+    with pytest.raises(ReplayMismatch):
+        pdm.configure(delay=200)
+    serial.strict = False
+    del pdm
+
+
+def test_replay_timing_and_truncation(tmp_path) -> None:
+    path = str(tmp_path / "session.pdmrec")
+    record(path, SlowBusSerial(SimulatedBus([SimulatedPDM(1)])))
+    link = Link(ReplaySerial(path, timing=True, strict=False))
+    start = time.perf_counter()
+    assert PDM(1, link).version == "3.7"
+    assert time.perf_counter() - start >= 0.009
+
+    # Appended sessions continue the timeline.
+    record(path, BusSerial(SimulatedBus([SimulatedPDM(1)])))
+    with RecordingReader(path) as reader:
+        records = list(reader)
+    assert all(a.time <= b.time for a, b in zip(records, records[1:]))
+    with open(path, "ab") as f:
+        f.write(b"\0\0")
+    with RecordingReader(path) as reader:
+        assert len(list(reader)) == len(records)
+
+
+def test_recording_passthrough(tmp_path) -> None:
+    path = str(tmp_path / "session.pdmrec")
+    serial = ClosingBusSerial(SimulatedBus([SimulatedPDM(1)]))
+    link = Link(serial)
+    recorder = Recorder(link, path)
+    recorder.start()
+    assert link.serial.port == "/dev/ttyREC"
+    assert link.serial.bus is serial.bus
+    link.close()
+    assert serial.closed
+    recorder.stop()
+
+
+def test_replay_keeps_unread_bytes(tmp_path) -> None:
+    path = str(tmp_path / "session.pdmrec")
+    serial = BusSerial(SimulatedBus([SimulatedPDM(1)]))
+    with Recorder(Link(serial), path) as recorder:
+        recording = recorder.link.serial
+        version = recorder.link.encode(1, Command.READ_PROTOCOL_VERSION)
+        recording.write(version)
+        first = recording.read(5)
+        recording.write(version)
+        second = recording.read(5)
+
+    # The first response is still unread at the second write.
+    replay = ReplaySerial(path)
+    replay.write(version)
+    replay.write(version)
+    assert replay.read(10) == first + second
+    assert replay.exhausted
@@ -0,0 +1,76 @@
+from array import array
+
+import pytest
+
+from pypdm import PDM, Link, ProtocolVersionNotSupported, SyncSource
+from pypdm.pdm import Instruction
+from pypdm.simulator import SimulatedBus, SimulatedPDM
+from conftest import BusSerial
+
+
+@pytest.fixture
+def bus() -> SimulatedBus:
+    return SimulatedBus([SimulatedPDM(1), SimulatedPDM(2, version="3.4")])
+
+
+def test_raw_access(bus: SimulatedBus) -> None:
+    with PDM(1, Link(BusSerial(bus)), cache=True) as pdm:
+        registers = pdm.registers
+        registers.write(Instruction.DELAY, 1200)
+        registers.write(Instruction.SYNC_SOURCE, SyncSource.INTERNAL.value)
+        registers.write_bytes(Instruction.OFFSET_CURRENT, b"\x41\x20\x00\x00")
+        assert pdm.delay == 1200
+        assert bus[1].value(Instruction.DELAY, applied=False) == 1200
+        assert bus[1].value(Instruction.OFFSET_CURRENT, applied=False) == 10.0
+        frames = bus.frames
+        registers.write_many({Instruction.FREQUENCY: 500, Instruction.CURRENT: 12.5})
+        assert bus.frames == frames + 2
+        assert registers.read(Instruction.FREQUENCY) == 500
+        assert registers.read_bytes(Instruction.SYNC_SOURCE) == b"\x02"
+        assert registers.read_many([Instruction.CURRENT, Instruction.TEMPERATURE]) == [
+            12.5,
+            25.0,
+        ]
+
+
+def test_register_array(bus: SimulatedBus) -> None:
+    with PDM(1, Link(BusSerial(bus)), cache=True) as pdm:
+        registers = pdm.registers
+        delays = registers.array(Instruction.DELAY, range(0, 1000, 100), apply=True)
+        assert len(delays) == 10
+        frames = bus.frames
+        delays.write(3)
+        assert bus.frames == frames + 2
+        assert bus[1].value(Instruction.DELAY) == 300
+        assert pdm.delay == 300
+        assert pdm.shadow is not None and pdm.shadow.clean
+        with pytest.raises(IndexError):
+            delays.write(10)
+
+        currents = registers.array(Instruction.CURRENT, array("d", [10, 20.5]))
+        currents.write(1)
+        assert bus[1].value(Instruction.CURRENT, applied=False) == 20.5
+        assert bus[1].value(Instruction.CURRENT) == 0
+
+
+def test_validation(bus: SimulatedBus) -> None:
+    link = Link(BusSerial(bus))
+    with PDM(1, link) as pdm, PDM(2, link) as old:
+        registers = pdm.registers
+        assert registers.validate(Instruction.DELAY, [0, 15000]) == bytes(
+            [0, 0, 0, 0, 0, 0, 0x3A, 0x98]
+        )
+        with pytest.raises(ValueError):
+            registers.validate(Instruction.DELAY, [0, 15001])
+        with pytest.raises(ValueError):
+            registers.validate(Instruction.DELAY, [-1])
+        with pytest.raises(ValueError):
+            registers.validate(Instruction.FREQUENCY, [1.5])
+        with pytest.raises(ValueError):
+            registers.validate(Instruction.SYNC_SOURCE, [3])
+        with pytest.raises(ValueError):
+            registers.validate(Instruction.CURRENT, [50, 100.5])
+        with pytest.raises(ValueError):
+            registers.array(Instruction.TEMPERATURE, [20.0])
+        with pytest.raises(ProtocolVersionNotSupported):
+            old.registers.validate(Instruction.SOFTWARE_CONTROL_MODE, [1])
@@ -0,0 +1,179 @@
+import math
+import socket
+import threading
+import time
+
+import pytest
+
+from pypdm import PDM, Link, ConnectionFailure, Mode
+from pypdm.pdm import Command, Instruction, INSTRUCTION_IDS, ResponseTimeout
+from pypdm.server import PDMServer, RemoteLink
+from pypdm.simulator import SimulatedBus, SimulatedPDM
+from conftest import BusSerial
+
+
+@pytest.fixture
+def server(tmp_path):
+    link = Link("sim://1,2")
+    with PDMServer(str(tmp_path / "pdm.sock"), [link]) as server:
+        yield server
+
+
+def test_remote_pdm(server: PDMServer) -> None:
+    link1 = RemoteLink(server.path)
+    link2 = Link(f"pdmd://{server.path}?port=sim://1,2")
+    assert link1.port == link2.port == "sim://1,2"
+    pdm1 = PDM(1, link1)
+    pdm2 = PDM(2, link2)
+    pdm1.configure(frequency=1000, delay=10)
+    pdm2.configure(frequency=2000, software_control_mode=Mode.CONTINUOUS)
+    assert pdm1.frequency == 1000
+    assert pdm2.frequency == 2000
+    assert pdm2.software_control_mode == Mode.CONTINUOUS
+    # Pipelined requests, with an error in the middle.
+    results = link1.command_many(
+        [
+            (1, Command.READ_INSTRUCTION, INSTRUCTION_IDS[Instruction.DELAY]),
+            (1, Command.READ_INSTRUCTION, bytes([0xFF, 0xFF])),
+            (2, Command.READ_PROTOCOL_VERSION, bytes()),
+        ]
+    )
+    assert results[0][0] == 0 and results[0][-1] == 10
+    assert isinstance(results[1], Exception)
+    assert results[2] == b"\x00\x03\x07"
+    del pdm1, pdm2
+
+
+def test_concurrent_clients(server: PDMServer) -> None:
+    errors = []
+
+    def write(address: int) -> None:
+        try:
+            pdm = PDM(address, RemoteLink(server.path))
+            for i in range(50):
+                pdm.delay = i
+                assert pdm.delay == i
+            del pdm
+        except Exception as e:
+            errors.append(e)
+
+    def read(address: int) -> None:
+        try:
+            link = RemoteLink(server.path)
+            for i in range(50):
+                assert link.command(address, Command.READ_PROTOCOL_VERSION)
+            link.close()
+        except Exception as e:
+            errors.append(e)
+
+    threads = [
+        threading.Thread(target=function, args=(address,))
+        for function in (write, read)
+        for address in (1, 2)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+
+
+def test_shared_telemetry(tmp_path) -> None:
+    link = Link("sim://1")
+    bus = link.serial.bus  # type: ignore
+    with PDMServer(str(tmp_path / "pdm.sock"), [link]) as server:
+        link1 = RemoteLink(server.path)
+        link2 = RemoteLink(server.path)
+        frames = bus.frames
+        sample = link1.telemetry(1, max_age=10)
+        assert sample["temperature"] == 25.0
+        assert sample["interlock_status"] == 0
+        assert sample["mode"] == 0
+        assert bus.frames == frames + 3
+        shared = link2.telemetry(1, max_age=10)
+        assert bus.frames == frames + 3
+        assert shared["temperature"] == 25.0
+        assert shared["age"] >= sample["age"]
+        link2.telemetry(1, max_age=0)
+        assert bus.frames == frames + 6
+        missing = link2.telemetry(9, max_age=0)
+        assert math.isnan(missing["temperature"])
+        link1.close()
+        link2.close()
+
+
+def test_unknown_port(server: PDMServer) -> None:
+    with pytest.raises(ConnectionFailure):
+        RemoteLink(server.path, "/dev/ttyNONE")
+    with pytest.raises(ConnectionFailure):
+        RemoteLink(server.path + ".missing")
+
+
+def test_probe_does_not_fail_other_clients(tmp_path) -> None:
+    link = Link("sim://1", timeout=0.05)
+    with PDMServer(str(tmp_path / "pdm.sock"), [link]) as server:
+        prober = RemoteLink(server.path)
+        pdm = PDM(1, RemoteLink(server.path))
+        probes = []
+
+        def probe() -> None:
+            for _ in range(5):
+                probes.extend(
+                    prober.command_many([(9, Command.READ_PROTOCOL_VERSION, bytes())])
+                )
+
+        thread = threading.Thread(target=probe)
+        thread.start()
+        for i in range(20):
+            pdm.delay = i
+            assert pdm.delay == i
+        thread.join()
+        assert len(probes) == 5
+        assert all(isinstance(result, Exception) for result in probes)
+        prober.close()
+        del pdm
+
+
+def test_socket_path(tmp_path) -> None:
+    path = str(tmp_path / "pdm.sock")
+    # Left by a server which did not stop cleanly.
+    stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    stale.bind(path)
+    stale.close()
+    with PDMServer(path, [Link("sim://1")]):
+        # A live server is not replaced.
+        with pytest.raises(OSError):
+            PDMServer(path, [Link("sim://1")]).start()
+        assert RemoteLink(path).port == "sim://1"
+    with open(path, "w"):
+        pass
+    with pytest.raises(FileExistsError):
+        PDMServer(path, [Link("sim://1")]).start()
+
+
+class SlowBusSerial(BusSerial):
+    """Waits for the whole timeout when a device does not answer."""
+
+    timeout = None
+
+    def read(self, n: int) -> bytes:
+        if not self._rx_buffer and self.timeout:
+            time.sleep(self.timeout)
+        return super().read(n)
+
+
+def test_late_response_discarded(tmp_path) -> None:
+    link = Link(SlowBusSerial(SimulatedBus([SimulatedPDM(1)])), timeout=0.3)
+    with PDMServer(str(tmp_path / "pdm.sock"), [link]) as server:
+        remote = RemoteLink(server.path, timeout=0.2, retries=0)
+        pdm = PDM(1, remote)
+        pdm.configure(delay=1234, pulse_width=5555)
+        # The server answers after the client gave up.
+        with pytest.raises(ResponseTimeout):
+            remote.command(9, Command.READ_PROTOCOL_VERSION)
+        assert pdm.delay == 1234
+        assert pdm.pulse_width == 5555
+        assert pdm.delay == 1234
+        # Only present devices are switched off when the server stops.
+        assert link.addresses == {1}
+        del pdm
@@ -0,0 +1,179 @@
+import threading
+import time
+from typing import List, Set
+
+from pypdm import PDM, Link, ThreadedLink, emergency_off_all
+from pypdm.pdm import Command, Instruction, INSTRUCTION_IDS
+from pypdm.simulator import SimulatedBus, SimulatedPDM
+from conftest import BusSerial
+
+
+class CountingSerial(BusSerial):
+    """Counts writes, and waits for the timeout when nothing is received."""
+
+    def __init__(self, bus: SimulatedBus) -> None:
+        super().__init__(bus)
+        self.writes = 0
+        self.timeout = None
+        self.closed = False
+
+    def write(self, b: bytes) -> int:
+        self.writes += 1
+        return super().write(b)
+
+    def read(self, n: int) -> bytes:
+        if not self._rx_buffer:
+            time.sleep(self.timeout or 0)
+        return super().read(n)
+
+    def close(self) -> None:
+        self.closed = True
+
+
+def activated(bus: SimulatedBus, address: int) -> bool:
+    return bool(bus[address].value(Instruction.LASER_ACTIVATION))
+
+
+def test_emergency_off() -> None:
+    bus = SimulatedBus([SimulatedPDM(a) for a in (1, 2, 3)])
+    serial = CountingSerial(bus)
+    link = Link(serial, timeout=5.0)
+    pdms = [PDM(a, link) for a in (1, 2, 3)]
+    assert link.addresses == {1, 2, 3}
+    for pdm in pdms:
+        pdm.configure(activation=True)
+    assert all(activated(bus, a) for a in (1, 2, 3))
+    writes = serial.writes
+    assert link.emergency_off() == {1, 2, 3}
+    assert serial.writes == writes + 1
+    assert not any(activated(bus, a) for a in (1, 2, 3))
+    assert link.timeout == 5.0
+
+    # Missing devices cost the deadline once, not a link timeout each.
+    pdms[0].configure(activation=True)
+    start = time.perf_counter()
+    assert link.emergency_off([1, 7, 8, 9], deadline=0.05) == {1}
+    assert time.perf_counter() - start < 0.5
+    assert not activated(bus, 1)
+    assert pdms[1].activation is False
+    for pdm in pdms:
+        pdm.close()
+
+
+class SlowSerial(CountingSerial):
+    """Takes some time for each received response."""
+
+    def read(self, n: int) -> bytes:
+        if self._rx_buffer:
+            time.sleep(0.05)
+        return super().read(n)
+
+
+def test_emergency_off_deadline() -> None:
+    bus = SimulatedBus([SimulatedPDM(1)])
+    link = Link(SlowSerial(bus), timeout=5.0)
+    start = time.perf_counter()
+    # The missing device only waits for the time left.
+    assert link.emergency_off([1, 2], deadline=0.3) == {1}
+    assert time.perf_counter() - start < 0.38
+    assert link.timeout == 5.0
+
+
+def test_threaded_emergency_off_cancels_writes() -> None:
+    bus = SimulatedBus([SimulatedPDM(1), SimulatedPDM(2)])
+    serial = CountingSerial(bus)
+    link = ThreadedLink(serial)
+    entered = threading.Event()
+    release = threading.Event()
+    write = serial.write
+
+    def blocking_write(b: bytes) -> int:
+        entered.set()
+        release.wait()
+        return write(b)
+
+    serial.write = blocking_write  # type: ignore
+    busy = link.submit(1, Command.READ_PROTOCOL_VERSION)
+    assert entered.wait(5)
+    on = INSTRUCTION_IDS[Instruction.LASER_ACTIVATION] + bytes([1])
+    read = link.submit(1, Command.READ_PROTOCOL_VERSION)
+    switch_on = link.submit(1, Command.WRITE_INSTRUCTION, on)
+    other = link.submit(2, Command.WRITE_INSTRUCTION, on)
+    confirmed: List[Set[int]] = []
+    thread = threading.Thread(target=lambda: confirmed.append(link.emergency_off([1])))
+    thread.start()
+    for _ in range(100):
+        if switch_on.cancelled():
+            break
+        time.sleep(0.01)
+    release.set()
+    thread.join()
+    assert confirmed == [{1}]
+    assert switch_on.cancelled()
+    # Reads and writes to other devices are still transmitted.
+    assert busy.result() == read.result() == b"\x00\x03\x07"
+    assert other.result() == b"\x00"
+    assert not activated(bus, 1)
+    link.close()
+
+
+def test_context_managers() -> None:
+    bus = SimulatedBus([SimulatedPDM(1), SimulatedPDM(2)])
+    with Link(BusSerial(bus)) as link:
+        with PDM(1, link) as pdm:
+            pdm.configure(activation=True)
+            assert activated(bus, 1)
+        assert not activated(bus, 1)
+        assert link.addresses == set()
+        frames = bus.frames
+        del pdm
+        assert bus.frames == frames
+        pdm2 = PDM(2, link)
+        pdm2.configure(activation=True)
+    assert link.closed
+    assert not activated(bus, 2)
+    # The link is gone, deleting the device is silent.
+    del pdm2
+
+
+def test_emergency_off_all() -> None:
+    buses = [SimulatedBus([SimulatedPDM(1)]), SimulatedBus([SimulatedPDM(4)])]
+    links = [Link(BusSerial(buses[0])), ThreadedLink(BusSerial(buses[1]))]
+    pdms = [PDM(1, links[0]), PDM(4, links[1])]
+    for pdm in pdms:
+        pdm.configure(activation=True)
+    results = emergency_off_all()
+    assert results[links[0].port] == {1}
+    assert results[links[1].port] == {4}
+    assert not activated(buses[0], 1)
+    assert not activated(buses[1], 4)
+    for link in links:
+        link.close()
+    del pdms
+
+
+def test_close_from_io_thread() -> None:
+    bus = SimulatedBus([SimulatedPDM(1)])
+    serial = CountingSerial(bus)
+    link = ThreadedLink(serial)
+    link.addresses.add(1)
+    write = serial.write
+
+    def write_and_close(b: bytes) -> int:
+        # Called from the I/O thread.
+        link.close()
+        return write(b)
+
+    serial.write = write_and_close  # type: ignore
+    assert link.submit(1, Command.READ_PROTOCOL_VERSION).result() == b"\x00\x03\x07"
+    for _ in range(100):
+        if serial.closed:
+            break
+        time.sleep(0.01)
+    assert serial.closed and link.closed
+    # Nothing is written on a closed link.
+    serial.write = write  # type: ignore
+    writes = serial.writes
+    assert link.emergency_off() == set()
+    assert Link.emergency_off(link) == set()
+    assert serial.writes == writes
@@ -0,0 +1,101 @@
+import os
+import struct
+
+import pytest
+
+from pypdm import PDM, Link, Mode, ControlMode, StatusError, ResponseTimeout
+from pypdm.pdm import Command, Instruction, INSTRUCTION_IDS, Status, checksum
+from pypdm.simulator import PtySimulator, SimulatedBus, SimulatedPDM
+
+
+def frame(address: int, command: Command, data: bytes = bytes()) -> bytes:
+    body = bytes([4 + len(data), address, command.value]) + data
+    return body + bytes([checksum(body)])
+
+
+def test_volatile_applied_and_saved_registers() -> None:
+    device = SimulatedPDM(1)
+    bus = SimulatedBus([device])
+    delay = INSTRUCTION_IDS[Instruction.DELAY]
+    (resp,) = bus.receive(frame(1, Command.WRITE_INSTRUCTION, delay + b"\0\0\0\x10"))
+    assert resp[1] == Status.OK.value
+    assert device.value(Instruction.DELAY, applied=False) == 16
+    assert device.value(Instruction.DELAY) == 0
+    (resp,) = bus.receive(frame(1, Command.READ_INSTRUCTION, delay))
+    assert resp[2:-1] == b"\0\0\0\x10"
+    bus.receive(frame(1, Command.APPLY_ALL_INSTRUCTIONS))
+    assert device.value(Instruction.DELAY) == 16
+    device.power_cycle()
+    assert device.value(Instruction.DELAY) == 0
+    bus.receive(frame(1, Command.WRITE_INSTRUCTION, delay + b"\0\0\0\x20"))
+    bus.receive(frame(1, Command.APPLY_ALL_INSTRUCTIONS))
+    bus.receive(frame(1, Command.SAVE_ALL_INSTRUCTIONS))
+    device.power_cycle()
+    assert device.value(Instruction.DELAY) == 32
+
+
+def test_request_errors() -> None:
+    bus = SimulatedBus([SimulatedPDM(1, version="3.4")])
+    temperature = INSTRUCTION_IDS[Instruction.TEMPERATURE]
+    mode = INSTRUCTION_IDS[Instruction.SOFTWARE_CONTROL_MODE]
+    (resp,) = bus.receive(
+        frame(1, Command.WRITE_INSTRUCTION, temperature + b"\0\0\0\0")
+    )
+    assert resp[1] == Status.QUERY_ERROR.value
+    (resp,) = bus.receive(frame(1, Command.READ_INSTRUCTION, mode))
+    assert resp[1] == Status.QUERY_ERROR.value
+    (resp,) = bus.receive(frame(1, Command.WRITE_INSTRUCTION, temperature[:1]))
+    assert resp[1] == Status.BAD_LENGTH.value
+    bad = bytearray(frame(1, Command.APPLY_ALL_INSTRUCTIONS))
+    bad[-1] ^= 1
+    (resp,) = bus.receive(bytes(bad))
+    assert resp[1] == Status.CHECKSUM_ERROR.value
+    # Nobody answers unknown addresses.
+    assert bus.receive(frame(2, Command.APPLY_ALL_INSTRUCTIONS)) == []
+
+
+def test_daisy_chain_and_partial_frames() -> None:
+    bus = SimulatedBus([SimulatedPDM(3), SimulatedPDM(7)])
+    data = frame(0, Command.READ_ADDRESS) + frame(7, Command.READ_ADDRESS)
+    assert bus.receive(data[:5]) != []
+    (resp,) = bus.receive(data[5:])
+    assert resp[2] == 7
+    assert bus.frames == 2
+
+
+def test_injected_corruption_and_loss() -> None:
+    bus = SimulatedBus([SimulatedPDM(1)], corruption=1.0, seed=1)
+    ok = frame(1, Command.APPLY_ALL_INSTRUCTIONS)
+    (resp,) = bus.receive(ok)
+    assert resp != bytes([3, 0, checksum(bytes([3, 0]))])
+    bus = SimulatedBus([SimulatedPDM(1)], loss=1.0)
+    assert bus.receive(ok) == []
+
+
+@pytest.mark.skipif(os.name != "posix", reason="Requires pseudo-terminals")
+def test_pdm_over_pty() -> None:
+    bus = SimulatedBus([SimulatedPDM(1), SimulatedPDM(2, version="3.4")])
+    with PtySimulator(bus) as simulator:
+        link = Link(simulator.path, timeout=0.2)
+        pdm1 = PDM(1, link)
+        pdm2 = PDM(2, link)
+        assert pdm1.version == "3.7"
+        assert pdm2.version == "3.4"
+        assert pdm1.read_address() == 1
+        pdm1.configure(delay=1000, current_percentage=50, activation=True)
+        assert bus[1].value(Instruction.DELAY) == 1000
+        assert bus[1].emitting
+        assert pdm1.current == 1250.0
+        assert pdm1.temperature == 25.0
+        pdm1.control_mode_selection = ControlMode.SOFTWARE
+        pdm1.software_control_mode = Mode.CONTINUOUS
+        pdm1.apply()
+        assert pdm1.mode == Mode.CONTINUOUS
+        res = link.command(1, Command.READ_MEASURE)
+        assert struct.unpack(">f", res[1:])[0] == 1250.0
+        with pytest.raises(StatusError):
+            link.command(1, Command.WRITE_INSTRUCTION, b"\0")
+        with pytest.raises(ResponseTimeout):
+            link.command(9, Command.APPLY_ALL_INSTRUCTIONS)
+        del pdm1, pdm2
+        assert not bus[1].emitting
@@ -0,0 +1,78 @@
+import pickle
+
+import pytest
+
+import pypdm.pdm as pdm_mod
+from pypdm import PDM, Link, PDMState, SyncSource, Mode, ControlMode
+from pypdm.pdm import Instruction
+from pypdm.simulator import SimulatedBus, SimulatedPDM
+from conftest import BusSerial
+
+
+@pytest.fixture
+def bus(monkeypatch: pytest.MonkeyPatch) -> SimulatedBus:
+    bus = SimulatedBus([SimulatedPDM(1), SimulatedPDM(2, version="3.4")])
+    monkeypatch.setattr(
+        pdm_mod.serial, "Serial", lambda dev, *args, **kwargs: BusSerial(bus)
+    )
+    return bus
+
+
+def test_state_value_type() -> None:
+    state = PDMState(
+        sync_source=SyncSource.INTERNAL,
+        frequency=10000,
+        current_percentage=12.5,
+        activation=1,
+        control_mode_selection=ControlMode.SOFTWARE,
+    )
+    assert state.activation is True
+    assert state.delay is None
+    with pytest.raises(AttributeError):
+        state.frequency = 5  # type: ignore
+    with pytest.raises(ValueError):
+        PDMState(temperature=20.0)
+    assert PDMState.from_bytes(state.to_bytes()) == state
+    assert PDMState.from_json(state.to_json()) == state
+    assert pickle.loads(pickle.dumps(state)) == state
+    assert len({state, PDMState.from_bytes(state.to_bytes())}) == 1
+    other = state.replace(frequency=20000, delay=5)
+    assert other.diff(state) == {"frequency": 20000, "delay": 5}
+    assert state.replace() == state
+    with pytest.raises(ValueError):
+        PDMState.from_bytes(state.to_bytes()[:-1])
+
+
+def test_capture_and_restore(bus: SimulatedBus) -> None:
+    link = Link("/dev/ttyA")
+    pdm = PDM(1, link)
+    pdm.configure(frequency=1000, delay=20, software_control_mode=Mode.CONTINUOUS)
+    frames = bus.frames
+    saved = PDMState.capture(pdm)
+    assert bus.frames == frames + 11
+    assert saved.frequency == 1000
+    assert saved.delay == 20
+    assert saved.software_control_mode == Mode.CONTINUOUS
+
+    pdm.configure(frequency=2000, current_percentage=50, activation=True)
+    changed = PDMState.capture(pdm)
+    frames = bus.frames
+    saved.restore(pdm, changed)
+    # Three writes and apply.
+    assert bus.frames == frames + 4
+    assert PDMState.capture(pdm) == saved
+    assert bus[1].value(Instruction.FREQUENCY) == 1000
+    del pdm
+
+
+def test_restore_from_shadow(bus: SimulatedBus) -> None:
+    link = Link("/dev/ttyA")
+    pdm = PDM(2, link, cache=True)
+    saved = PDMState.capture(pdm)
+    assert saved.control_mode_selection is None
+    pdm.delay = 100
+    frames = bus.frames
+    saved.restore(pdm)
+    assert bus.frames == frames + 2
+    assert bus[2].value(Instruction.DELAY) == 0
+    del pdm
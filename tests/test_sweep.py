@@ -0,0 +1,92 @@
+import struct
+import types
+from typing import Any, Dict, List, Tuple, cast
+import pytest
+
+from pypdm.pdm import PDM, Link, Command, Instruction, Status, StatusError
+from pypdm.sweep import Sweep
+from conftest import FakeSerial
+
+
+def make_pdm(fake_serial_factory: types.SimpleNamespace, **kwargs) -> PDM:
+    link = Link("/dev/ttyFAKE")
+    fs = cast(FakeSerial, link.serial)
+    fs.queue_response(fake_serial_factory.make_response(Status.OK.value, bytes([3, 4])))
+    return PDM(1, link, **kwargs)
+
+
+def split_frames(burst: bytes) -> list:
+    frames = []
+    while burst:
+        frames.append(burst[: burst[0]])
+        burst = burst[burst[0] :]
+    return frames
+
+
+def test_grid_sends_only_changes(fake_serial_factory: types.SimpleNamespace) -> None:
+    pdm = make_pdm(fake_serial_factory)
+    fs = cast(FakeSerial, pdm.link.serial)
+    sweep = Sweep.grid(pdm, delay=[100, 200], current_percentage=[10.0, 20.0])
+    assert len(sweep) == 4
+    # 3 + 2 + 3 + 2 frames
+    for _ in range(10):
+        fs.queue_response(fake_serial_factory.OK_RESP)
+    calls: List[Tuple[str, int]] = []
+    sweep.run(
+        pre_step=lambda i, p: calls.append(("pre", i)),
+        post_step=lambda i, p: calls.append(("post", i)),
+    )
+    assert calls == [(k, i) for i in range(4) for k in ("pre", "post")]
+    steps = [split_frames(w) for w in fs.writes[1:]]
+    assert [len(s) for s in steps] == [3, 2, 3, 2]
+    # Second step only changes the current
+    write, apply = steps[1]
+    assert write[3:5] == Instruction.CURRENT.value.to_bytes(2, "big")
+    assert write[5:-1] == struct.pack(">f", 20.0)
+    assert apply[2] == Command.APPLY_ALL_INSTRUCTIONS.value
+    assert b"".join(fs.writes[1:]) == bytes(sweep.frames)
+
+    # __del__ will disable the laser -> provide a two last OK responses
+    fs.queue_response(fake_serial_factory.OK_RESP)
+    fs.queue_response(fake_serial_factory.OK_RESP)
+
+
+def test_points_are_validated_up_front(
+    fake_serial_factory: types.SimpleNamespace,
+) -> None:
+    pdm = make_pdm(fake_serial_factory)
+    fs = cast(FakeSerial, pdm.link.serial)
+    with pytest.raises(ValueError):
+        Sweep.grid(pdm, delay=[100, pdm.MAX_DELAY + 1])
+    with pytest.raises(ValueError):
+        Sweep(pdm, [{"delay": 1}, {"pulse_width": 1}])
+    assert len(fs.writes) == 1
+
+    # __del__ will disable the laser -> provide a two last OK responses
+    fs.queue_response(fake_serial_factory.OK_RESP)
+    fs.queue_response(fake_serial_factory.OK_RESP)
+
+
+def test_step_error_and_cache_invalidation(
+    fake_serial_factory: types.SimpleNamespace,
+) -> None:
+    pdm = make_pdm(fake_serial_factory, elide_writes=True)
+    fs = cast(FakeSerial, pdm.link.serial)
+    fs.queue_response(fake_serial_factory.OK_RESP)
+    pdm.delay = 100
+    points: List[Dict[str, Any]] = [{"delay": 100}, {"delay": 200}]
+    # Elision must not drop the first point, which the device already holds
+    sweep = Sweep(pdm, points)
+    fs.queue_response(fake_serial_factory.OK_RESP)
+    fs.queue_response(fake_serial_factory.OK_RESP)
+    fs.queue_response(fake_serial_factory.make_response(Status.QUERY_ERROR.value))
+    fs.queue_response(fake_serial_factory.OK_RESP)
+    with pytest.raises(StatusError):
+        for _ in sweep:
+            pass
+    assert pdm.shadow is not None
+    assert pdm.shadow.get(Instruction.DELAY) is None
+
+    # __del__ will disable the laser -> provide a two last OK responses
+    fs.queue_response(fake_serial_factory.OK_RESP)
+    fs.queue_response(fake_serial_factory.OK_RESP)
@@ -0,0 +1,83 @@
+import math
+import struct
+import types
+from typing import List, Tuple, cast
+
+from pypdm.pdm import PDM, Link, Status
+from pypdm.telemetry import TelemetrySampler
+from conftest import FakeSerial
+
+
+def make_pdm(fake_serial_factory: types.SimpleNamespace) -> PDM:
+    link = Link("/dev/ttyFAKE")
+    fs = cast(FakeSerial, link.serial)
+    fs.queue_response(fake_serial_factory.make_response(Status.OK.value, bytes([3, 4])))
+    return PDM(1, link)
+
+
+def queue_sample(
+    fake_serial_factory: types.SimpleNamespace,
+    fs: FakeSerial,
+    temperature: float,
+    interlock: int,
+) -> None:
+    fs.queue_response(
+        fake_serial_factory.make_response(0, struct.pack(">f", temperature))
+    )
+    fs.queue_response(fake_serial_factory.make_response(0, bytes([interlock])))
+
+
+def test_ring_buffer_wraps(fake_serial_factory: types.SimpleNamespace) -> None:
+    pdm = make_pdm(fake_serial_factory)
+    fs = cast(FakeSerial, pdm.link.serial)
+    sampler = TelemetrySampler(pdm, ["temperature", "interlock_status"], capacity=4)
+    for i in range(6):
+        queue_sample(fake_serial_factory, fs, 20.0 + i, i % 2)
+        sampler.sample()
+    # One burst per sample
+    assert len(fs.writes) == 7
+    assert sampler.count == 4
+    assert sampler.total == 6
+    older, newer = sampler.segments("temperature")
+    assert list(older) + list(newer) == [22.0, 23.0, 24.0, 25.0]
+    times = sampler.segments("time")
+    assert list(times[0]) + list(times[1]) == sorted(list(times[0]) + list(times[1]))
+    latest = sampler.latest()
+    assert latest is not None
+    assert latest["temperature"] == 25.0
+    assert latest["interlock_status"] == 1.0
+
+    # __del__ will disable the laser -> provide a two last OK responses
+    fs.queue_response(fake_serial_factory.OK_RESP)
+    fs.queue_response(fake_serial_factory.OK_RESP)
+
+
+def test_threshold_and_errors(fake_serial_factory: types.SimpleNamespace) -> None:
+    pdm = make_pdm(fake_serial_factory)
+    fs = cast(FakeSerial, pdm.link.serial)
+    sampler = TelemetrySampler(pdm, ["temperature"], capacity=8)
+    crossings: List[Tuple[str, float]] = []
+    sampler.on_threshold("temperature", 30, lambda n, v, t: crossings.append((n, v)))
+    sampler.on_threshold(
+        "temperature", 25, lambda n, v, t: crossings.append(("low", v)), rising=False
+    )
+    for t in (20.0, 31.0, 32.0, 24.0):
+        fs.queue_response(fake_serial_factory.make_response(0, struct.pack(">f", t)))
+        sampler.sample()
+    assert crossings == [("temperature", 31.0), ("low", 24.0)]
+
+    fs.queue_response(fake_serial_factory.make_response(Status.TIMEOUT.value))
+    sampler.sample()
+    assert sampler.errors == 1
+    assert math.isnan(sampler.buffer("temperature")[4])
+
+    # Truncated temperature
+    fs.queue_response(fake_serial_factory.make_response(0, bytes([1, 2])))
+    sampler.sample()
+    assert sampler.errors == 2
+    assert sampler.total == 6
+    assert math.isnan(sampler.buffer("temperature")[5])
+
+    # __del__ will disable the laser -> provide a two last OK responses
+    fs.queue_response(fake_serial_factory.OK_RESP)
+    fs.queue_response(fake_serial_factory.OK_RESP)
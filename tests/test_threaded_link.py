@@ -0,0 +1,79 @@
+import threading
+import types
+from typing import List
+
+from pypdm.pdm import Command, Status, ThreadedLink
+
+
+class EchoSerial:
+    """
+    Answers each received frame with its destination address as data. The
+    first write blocks until `release` is set.
+    """
+
+    def __init__(self, make_response) -> None:
+        self.make_response = make_response
+        self.entered = threading.Event()
+        self.release = threading.Event()
+        self.writes: List[bytes] = []
+        self._rx_buffer = bytearray()
+
+    def write(self, b: bytes) -> int:
+        if not self.writes:
+            self.entered.set()
+            self.release.wait()
+        self.writes.append(bytes(b))
+        b = bytes(b)
+        while b:
+            self._rx_buffer += self.make_response(Status.OK.value, bytes([b[1]]))
+            b = b[b[0] :]
+        return len(b)
+
+    def read(self, n: int) -> bytes:
+        data = self._rx_buffer[:n]
+        del self._rx_buffer[:n]
+        return bytes(data)
+
+
+def test_threads_get_their_own_responses(
+    fake_serial_factory: types.SimpleNamespace,
+) -> None:
+    link = ThreadedLink("/dev/ttyFAKE")
+    echo = EchoSerial(fake_serial_factory.make_response)
+    echo.release.set()
+    link.serial = echo
+    errors = []
+
+    def poll(address: int) -> None:
+        for _ in range(100):
+            if link.command(address, Command.READ_ADDRESS) != bytes([0, address]):
+                errors.append(address)
+
+    threads = [threading.Thread(target=poll, args=(a,)) for a in range(1, 5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    link.close()
+    assert errors == []
+    assert len(echo.writes) == 400
+
+
+def test_addresses_are_served_in_turn(
+    fake_serial_factory: types.SimpleNamespace,
+) -> None:
+    link = ThreadedLink("/dev/ttyFAKE")
+    echo = EchoSerial(fake_serial_factory.make_response)
+    link.serial = echo
+    # The I/O thread blocks on this first request
+    first = link.submit(1, Command.READ_ADDRESS)
+    echo.entered.wait()
+    futures = [link.submit(1, Command.READ_ADDRESS) for _ in range(3)]
+    futures.append(link.submit(2, Command.READ_ADDRESS))
+    burst = link.submit_many([(3, Command.READ_ADDRESS, b"")] * 2)
+    echo.release.set()
+    assert first.result() == bytes([0, 1])
+    assert [f.result() for f in futures] == [bytes([0, 1])] * 3 + [bytes([0, 2])]
+    assert burst.result() == [bytes([0, 3])] * 2
+    link.close()
+    assert [w[1] for w in echo.writes] == [1, 1, 2, 3, 1, 1]
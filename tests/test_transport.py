@@ -0,0 +1,99 @@
+import socket
+import threading
+
+import pytest
+
+from pypdm import PDM, Link, ConnectionFailure
+from pypdm.pdm import Command, Instruction
+from pypdm.simulator import SimulatedBus, SimulatedPDM
+from pypdm.transport import (
+    TRANSPORTS,
+    MemoryTransport,
+    TcpTransport,
+    Transport,
+    open_transport,
+    register_transport,
+)
+
+
+class BridgeServer:
+    """Serial-over-TCP bridge to a simulated bus, serving one client."""
+
+    def __init__(self, bus: SimulatedBus):
+        self.bus = bus
+        self.listener = socket.create_server(("127.0.0.1", 0))
+        self.port = self.listener.getsockname()[1]
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        connection, _ = self.listener.accept()
+        with connection:
+            while True:
+                data = connection.recv(4096)
+                if not data:
+                    return
+                for chunk in self.bus.receive(data):
+                    connection.sendall(chunk)
+
+    def close(self):
+        self.listener.close()
+
+
+def test_memory_transport() -> None:
+    link = Link("sim://1,2?version=3.4")
+    assert isinstance(link.serial, MemoryTransport)
+    assert link.port == "sim://1,2?version=3.4"
+    bus = link.serial.bus  # type: ignore
+    pdm = PDM(2, link)
+    assert pdm.version == "3.4"
+    pdm.delay = 42
+    assert bus[2].value(Instruction.DELAY, applied=False) == 42
+    del pdm
+    with pytest.raises(ValueError):
+        open_transport("sim://1?speed=2")
+
+
+def test_tcp_transport() -> None:
+    server = BridgeServer(SimulatedBus([SimulatedPDM(1)]))
+    try:
+        link = Link(f"tcp://127.0.0.1:{server.port}", timeout=0.5)
+        assert isinstance(link.serial, TcpTransport)
+        pdm = PDM(1, link)
+        assert pdm.version == "3.7"
+        assert link.serial.socket.getsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY)
+        pdm.configure(frequency=1000, delay=10)
+        assert pdm.frequency == 1000
+        del pdm
+        link.serial.close()
+        server.thread.join(1)
+    finally:
+        server.close()
+    with pytest.raises(ConnectionFailure):
+        Link(f"tcp://127.0.0.1:{server.port}")
+
+
+def test_registered_transport() -> None:
+    class Echo(Transport):
+        port = "echo"
+
+        def __init__(self):
+            super().__init__()
+            self.data = b""
+
+        def write(self, data):
+            self.data += data
+
+        def read(self, n):
+            data, self.data = self.data[:n], self.data[n:]
+            return data
+
+    register_transport("echo", lambda url, timeout, write_timeout: Echo())
+    try:
+        link = Link("echo://")
+        assert link.port == "echo"
+        assert link.timeout == 1.0
+        # A request to address 0 reads back as a response with status OK.
+        assert link.command(0, Command.READ_ADDRESS) == bytes([0, 1])
+    finally:
+        del TRANSPORTS["echo"]
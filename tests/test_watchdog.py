@@ -0,0 +1,114 @@
+import gc
+import threading
+import time
+import weakref
+
+import pytest
+
+from pypdm import PDM, InterlockStatus, Link, ThreadedLink
+from pypdm.simulator import SimulatedBus, SimulatedPDM
+from pypdm.watchdog import ERROR, INTERLOCK, Watchdog, WatchdogEvent
+from conftest import BusSerial
+
+
+def test_transitions_and_debounce() -> None:
+    bus = SimulatedBus([SimulatedPDM(1), SimulatedPDM(2)])
+    link = Link(BusSerial(bus))
+    with PDM(1, link) as pdm1, PDM(2, link) as pdm2:
+        watchdog = Watchdog(link, debounce=2)
+        received = []
+        first = watchdog.watch(pdm1, received.append, start=False)
+        second = watchdog.watch(pdm1, start=False)
+        other = watchdog.watch(pdm2, start=False)
+        frames = bus.frames
+        assert watchdog.poll() == []
+        # Readings are shared by the watchers of the same device.
+        assert bus.frames == frames + 6
+        assert first.interlock == InterlockStatus.CLOSED
+        assert first.error_code == 0
+        assert watchdog.period == watchdog.idle_period
+
+        bus[1].interlock_status = InterlockStatus.OPEN
+        assert watchdog.poll() == []
+        # Glitch: back to closed before being confirmed.
+        bus[1].interlock_status = InterlockStatus.CLOSED
+        assert watchdog.poll() == []
+        bus[1].interlock_status = InterlockStatus.OPEN
+        watchdog.poll()
+        events = watchdog.poll()
+        assert len(events) == 2
+        event = events[0]
+        assert event.address == 1
+        assert event.kind == INTERLOCK
+        assert event.value == InterlockStatus.OPEN
+        assert event.previous == InterlockStatus.CLOSED
+        assert received == [event]
+        assert second.events.get_nowait() == events[1]
+        assert other.events.empty()
+
+        bus[2].error_code = 0x0104
+        pdm2.configure(activation=True)
+        watchdog.poll()
+        assert watchdog.period == watchdog.active_period
+        (event,) = watchdog.poll()
+        assert event == WatchdogEvent(2, ERROR, 0x0104, 0, event.time)
+
+        other.close()
+        first.close()
+        second.close()
+        assert watchdog.poll() == []
+
+
+def test_polling_thread() -> None:
+    bus = SimulatedBus([SimulatedPDM(1)])
+    link = ThreadedLink(BusSerial(bus))
+    with PDM(1, link) as pdm:
+        watchdog = Watchdog.for_link(link, active_period=0.001, debounce=1)
+        assert Watchdog.for_link(link) is watchdog
+        with watchdog:
+            watcher = watchdog.watch(pdm)
+            pdm.configure(activation=True)
+            # Transitions are reported after the initial reading.
+            while watcher.interlock is None:
+                time.sleep(0.001)
+            bus[1].interlock_status = InterlockStatus.OPEN
+            event = watcher.events.get(timeout=2)
+            assert event.value == InterlockStatus.OPEN
+            assert watchdog.polls > 0
+    link.close()
+
+
+def test_shared_watchdog_lifetime() -> None:
+    bus = SimulatedBus([SimulatedPDM(1)])
+    link = Link(BusSerial(bus))
+    watchdog = Watchdog.for_link(link, idle_period=0.001)
+    assert Watchdog.for_link(link, idle_period=0.001) is watchdog
+    with pytest.raises(ValueError):
+        Watchdog.for_link(link, idle_period=1.0)
+
+    # Concurrent watchers start a single polling thread.
+    errors = []
+
+    def watch() -> None:
+        try:
+            watchdog.watch(1)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=watch) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+
+    # Deleting the link releases the watchdog and ends its thread.
+    released = weakref.ref(watchdog)
+    link.close()
+    del link, watchdog, threads
+    for _ in range(100):
+        gc.collect()
+        if released() is None:
+            break
+        threading.Event().wait(0.01)
+    assert released() is None